@@ -8,6 +8,25 @@ from typing import Dict, List, Tuple
 from datetime import datetime
 import hashlib
 
+import score_stats
+from assessment_cache import AssessmentCache
+from defi_snapshot import defi_snapshot
+
+MODEL_VERSION = '2.0.0'
+FEATURE_COUNT = 19
+
+def _weighted_sum(features: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """Row-wise weighted sum, accumulated column by column.
+
+    Summation order is fixed so a wallet scores the same whether it is
+    assessed alone or as one row of a large batch.
+    """
+    total = np.zeros(features.shape[0])
+    for column, weight in enumerate(weights):
+        total += features[:, column] * weight
+    return total
+
+
 class CreditRiskClassifier:
     """Binary classifier: Low/Medium/High risk"""
     
@@ -24,14 +43,18 @@ class CreditRiskClassifier:
     
     def predict(self, features: np.ndarray) -> Tuple[str, float]:
         """Predict risk category and confidence"""
-        score = np.dot(features, self.weights)
+        categories, scores = self.predict_batch(features[np.newaxis, :])
+        return str(categories[0]), scores[0]
+    
+    def predict_batch(self, features: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Predict risk categories and scores for an (N, 19) feature matrix"""
+        scores = _weighted_sum(features, self.weights)
         
-        if score >= self.thresholds['low']:
-            return 'low', score
-        elif score >= self.thresholds['medium']:
-            return 'medium', score
-        else:
-            return 'high', score
+        categories = np.where(
+            scores >= self.thresholds['low'], 'low',
+            np.where(scores >= self.thresholds['medium'], 'medium', 'high')
+        )
+        return categories, scores
 
 
 class DefaultPredictor:
@@ -44,11 +67,15 @@ class DefaultPredictor:
     
     def predict(self, features: np.ndarray) -> float:
         """Return default probability (0-100)"""
+        return self.predict_batch(features[np.newaxis, :])[0]
+    
+    def predict_batch(self, features: np.ndarray) -> np.ndarray:
+        """Return default probabilities (0-100) for an (N, 19) feature matrix"""
         # Use only first 5 features
-        selected_features = features[self.feature_indices]
-        trust_score = np.dot(selected_features, self.weights)
+        selected_features = features[:, self.feature_indices]
+        trust_score = _weighted_sum(selected_features, self.weights)
         default_prob = (1 - trust_score) * 100
-        return max(0, min(100, default_prob))
+        return np.clip(default_prob, 0, 100)
 
 
 class FraudDetector:
@@ -64,29 +91,43 @@ class FraudDetector:
     
     def predict(self, features: Dict) -> Tuple[bool, float, List[str]]:
         """Return (is_fraud, likelihood, anomalies)"""
-        anomalies = []
-        anomaly_score = 0
-        
-        # Check transaction velocity
-        tx_vel = features.get('tx_velocity', 0.5)
-        if tx_vel > self.normal_ranges['tx_velocity'][1]:
-            anomalies.append('Unusually high transaction velocity')
-            anomaly_score += 0.4
-        
-        # Check score volatility
-        score_vol = features.get('score_volatility', 0.1)
-        if score_vol > self.normal_ranges['score_volatility'][1]:
-            anomalies.append('High credit score volatility')
-            anomaly_score += 0.3
-        
-        # Check activity pattern
-        activity = features.get('activity_pattern', 0.5)
-        if activity < self.normal_ranges['activity_pattern'][0]:
-            anomalies.append('Suspicious activity pattern')
-            anomaly_score += 0.3
+        is_fraud, likelihood, anomalies = self.predict_batch(
+            np.array([features.get('tx_velocity', 0.5)]),
+            np.array([features.get('score_volatility', 0.1)]),
+            np.array([features.get('activity_pattern', 0.5)])
+        )
+        return bool(is_fraud[0]), likelihood[0], anomalies[0]
+    
+    def predict_batch(
+        self,
+        tx_velocity: np.ndarray,
+        score_volatility: np.ndarray,
+        activity_pattern: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, List[List[str]]]:
+        """Return (is_fraud, likelihood, anomalies) for N wallets at once"""
+        # Check transaction velocity, score volatility and activity pattern
+        high_velocity = tx_velocity > self.normal_ranges['tx_velocity'][1]
+        high_volatility = score_volatility > self.normal_ranges['score_volatility'][1]
+        low_activity = activity_pattern < self.normal_ranges['activity_pattern'][0]
+        
+        anomaly_score = np.zeros(len(tx_velocity))
+        anomaly_score += np.where(high_velocity, 0.4, 0.0)
+        anomaly_score += np.where(high_volatility, 0.3, 0.0)
+        anomaly_score += np.where(low_activity, 0.3, 0.0)
         
         is_fraud = anomaly_score > 0.5
-        likelihood = min(100, anomaly_score * 100)
+        likelihood = np.minimum(100, anomaly_score * 100)
+        
+        # Anomaly descriptions are only built for the (rare) flagged rows
+        anomalies = [[] for _ in range(len(tx_velocity))]
+        checks = [
+            (high_velocity, 'Unusually high transaction velocity'),
+            (high_volatility, 'High credit score volatility'),
+            (low_activity, 'Suspicious activity pattern')
+        ]
+        for mask, description in checks:
+            for row in np.flatnonzero(mask):
+                anomalies[row].append(description)
         
         return is_fraud, likelihood, anomalies
 
@@ -100,31 +141,41 @@ class TermsRecommender:
     
     def recommend(self, risk_score: float, loan_amount: float) -> Dict:
         """Recommend interest rate, LTV, duration"""
+        return self.recommend_batch(
+            np.array([risk_score], dtype=np.float64),
+            np.array([loan_amount], dtype=np.float64)
+        )[0]
+    
+    def recommend_batch(self, risk_scores: np.ndarray, loan_amounts: np.ndarray) -> List[Dict]:
+        """Recommend interest rate, LTV, duration for N wallets at once"""
         
         # Interest rate increases with risk
-        interest_rate = self.base_rate + (risk_score / 10)
+        interest_rate = np.round(self.base_rate + (risk_scores / 10), 2)
         
         # LTV decreases with risk
-        ltv = self.base_ltv - (risk_score / 200)
+        ltv = self.base_ltv - (risk_scores / 200)
         
         # Duration based on risk
-        if risk_score < 30:
-            duration_days = 90
-            max_amount = loan_amount * 1.5
-        elif risk_score < 60:
-            duration_days = 60
-            max_amount = loan_amount
-        else:
-            duration_days = 30
-            max_amount = loan_amount * 0.5
+        low = risk_scores < 30
+        medium = ~low & (risk_scores < 60)
+        duration_days = np.where(low, 90, np.where(medium, 60, 30))
+        max_amount = np.round(
+            np.where(low, loan_amounts * 1.5, np.where(medium, loan_amounts, loan_amounts * 0.5)),
+            2
+        )
+        collateral_ratio = np.round(1 / ltv, 2)
+        ltv = np.round(ltv, 2)
         
-        return {
-            'interest_rate': round(interest_rate, 2),
-            'max_ltv': round(ltv, 2),
-            'duration_days': duration_days,
-            'max_loan_amount': round(max_amount, 2),
-            'collateral_ratio': round(1 / ltv, 2)
-        }
+        return [
+            {
+                'interest_rate': float(interest_rate[i]),
+                'max_ltv': float(ltv[i]),
+                'duration_days': int(duration_days[i]),
+                'max_loan_amount': float(max_amount[i]),
+                'collateral_ratio': float(collateral_ratio[i])
+            }
+            for i in range(len(risk_scores))
+        ]
 
 
 class AIRiskOracleV2:
@@ -135,9 +186,69 @@ class AIRiskOracleV2:
         self.default_predictor = DefaultPredictor()
         self.fraud_detector = FraudDetector()
         self.terms_recommender = TermsRecommender()
+        self.cache = AssessmentCache()
     
     def extract_features(self, user_data: Dict) -> np.ndarray:
         """Extract 19 features from user data"""
+        return np.array(self._feature_values(user_data))
+    
+    def extract_feature_matrix(self, users_data: List[Dict]) -> np.ndarray:
+        """Extract an (N, 19) feature matrix, one row per user"""
+        features = np.empty((len(users_data), FEATURE_COUNT), dtype=np.float64)
+        for row, user_data in enumerate(users_data):
+            features[row] = self._feature_values(user_data)
+        return features
+    
+    def feature_matrix_from_columns(self, columns: Dict[str, np.ndarray]) -> np.ndarray:
+        """Build an (N, 19) feature matrix from raw per-field column arrays
+        
+        Columns are keyed like the user_data fields of extract_features, except
+        that score history arrives pre-reduced as 'score_volatility' and
+        'score_trend'. Missing columns take the same defaults as extract_features.
+        """
+        count = len(next(iter(columns.values()))) if columns else 0
+        
+        def column(name, default=0.0):
+            values = columns.get(name)
+            if values is None:
+                return np.full(count, default, dtype=np.float64)
+            return np.asarray(values, dtype=np.float64)
+        
+        features = np.empty((count, FEATURE_COUNT), dtype=np.float64)
+        
+        # Passport features (7)
+        features[:, 0] = column('credit_score') / 1000
+        features[:, 1] = column('poh_score') / 100
+        features[:, 2] = np.minimum(column('badge_count') / 10, 1.0)
+        features[:, 3] = np.minimum(column('onchain_activity') / 100, 1.0)
+        features[:, 4] = np.minimum(column('account_age_days') / 365, 1.0)
+        features[:, 5] = column('reputation_score') / 100
+        features[:, 6] = column('is_verified')
+        
+        # Transaction features (4)
+        features[:, 7] = np.minimum(column('tx_count') / 500, 1.0)
+        features[:, 8] = np.minimum(column('tx_volume_usd') / 100000, 1.0)
+        features[:, 9] = column('tx_velocity', 0.5)
+        features[:, 10] = np.minimum(column('unique_contracts') / 20, 1.0)
+        
+        # DeFi features (4)
+        features[:, 11] = np.minimum(column('total_borrowed') / 50000, 1.0)
+        features[:, 12] = np.minimum(column('total_supplied') / 75000, 1.0)
+        features[:, 13] = column('repayment_rate', 100) / 100
+        features[:, 14] = np.maximum(0, 1 - column('liquidation_count') / 5)
+        
+        # Social features (2)
+        features[:, 15] = column('github_score') / 100
+        features[:, 16] = column('twitter_score') / 100
+        
+        # Market features (2)
+        features[:, 17] = column('score_volatility')
+        features[:, 18] = column('score_trend', 0.5)
+        
+        return features
+    
+    def _feature_values(self, user_data: Dict) -> List[float]:
+        """Normalized values of the 19 model features, in model order"""
         
         # Passport features (7)
         credit_score = user_data.get('credit_score', 0) / 1000
@@ -164,18 +275,23 @@ class AIRiskOracleV2:
         github_score = user_data.get('github_score', 0) / 100
         twitter_score = user_data.get('twitter_score', 0) / 100
         
-        # Market features (2)
-        score_history = user_data.get('score_history', [500])
-        score_volatility = self._calculate_volatility(score_history)
-        score_trend = self._calculate_trend(score_history)
+        # Market features (2) - running stats when the passport carries them
+        stats = user_data.get('score_stats')
+        if stats:
+            score_volatility = score_stats.volatility(stats)
+            score_trend = score_stats.trend(stats)
+        else:
+            score_history = user_data.get('score_history', [500])
+            score_volatility = self._calculate_volatility(score_history)
+            score_trend = self._calculate_trend(score_history)
         
-        return np.array([
+        return [
             credit_score, poh_score, badge_count, onchain_activity,
             account_age, reputation, verification, tx_count,
             tx_volume, tx_velocity, unique_contracts, borrowed,
             supplied, repayment_rate, liquidation_count, github_score,
             twitter_score, score_volatility, score_trend
-        ])
+        ]
     
     def _calculate_volatility(self, score_history: List[float]) -> float:
         """Calculate score volatility (0-1)"""
@@ -196,59 +312,113 @@ class AIRiskOracleV2:
         return max(0, min(1, trend))
     
     def assess_risk(self, user_data: Dict, wallet_address: str = None) -> Dict:
-        """Complete risk assessment using all 4 models with REAL DeFi data"""
+        """Complete risk assessment using all 4 models with REAL DeFi data
+        
+        With wallet_address the DeFi positions are read over RPC (blocking):
+        async callers go through run_web3.
+        """
         
         # Get REAL DeFi data if wallet provided
         if wallet_address:
-            user_data = self._enrich_with_defi_data(user_data, wallet_address)
+            with defi_snapshot():
+                user_data = self._enrich_with_defi_data(user_data, wallet_address)
         
         # Extract features
         features = self.extract_features(user_data)
         
+        return self.assess_matrix(
+            features[np.newaxis, :],
+            [user_data.get('wallet_address', '')],
+            [user_data.get('requested_loan_amount', 10000)]
+        )[0]
+    
+    def assess_matrix(
+        self,
+        features: np.ndarray,
+        wallet_addresses: List[str],
+        loan_amounts=10000
+    ) -> List[Dict]:
+        """Run all 4 models over an (N, 19) feature matrix
+        
+        loan_amounts may be a single amount or one amount per row. Rows whose
+        quantized features were assessed recently are served from the
+        assessment cache; only their proof is regenerated.
+        """
+        loan_amounts = np.broadcast_to(
+            np.asarray(loan_amounts, dtype=np.float64), (features.shape[0],)
+        )
+        
+        keys = self.cache.fingerprints(features, loan_amounts, MODEL_VERSION)
+        outputs = [self.cache.get(key) for key in keys]
+        
+        miss_rows = [i for i, output in enumerate(outputs) if output is None]
+        if miss_rows:
+            computed = self._run_models(features[miss_rows], loan_amounts[miss_rows])
+            for row, output in zip(miss_rows, computed):
+                outputs[row] = output
+                self.cache.set(keys[row], output)
+        
+        timestamp = datetime.utcnow().isoformat()
+        
+        results = []
+        for wallet_address, output in zip(wallet_addresses, outputs):
+            fields, raw_risk_score = output
+            
+            # Generate proof
+            proof = self._generate_proof(wallet_address, raw_risk_score, timestamp)
+            
+            results.append({
+                **fields,
+                'fraud_anomalies': list(fields['fraud_anomalies']),
+                'recommended_terms': dict(fields['recommended_terms']),
+                'proof': proof,
+                'timestamp': timestamp,
+                'model_version': MODEL_VERSION
+            })
+        
+        return results
+    
+    def _run_models(self, features: np.ndarray, loan_amounts: np.ndarray) -> List[Tuple[Dict, float]]:
+        """Model outputs per row, paired with the unrounded risk score"""
+        
         # Model 1: Credit Risk Classification
-        risk_category, risk_score = self.credit_classifier.predict(features)
-        risk_score_normalized = (1 - risk_score) * 100  # Convert to 0-100 risk scale
+        risk_categories, risk_scores = self.credit_classifier.predict_batch(features)
+        risk_scores_normalized = (1 - risk_scores) * 100  # Convert to 0-100 risk scale
         
         # Model 2: Default Prediction
-        default_probability = self.default_predictor.predict(features)
+        default_probabilities = self.default_predictor.predict_batch(features)
         
-        # Model 3: Fraud Detection
-        fraud_features = {
-            'tx_velocity': features[9],
-            'score_volatility': features[17],
-            'activity_pattern': features[3]
-        }
-        is_fraud, fraud_likelihood, anomalies = self.fraud_detector.predict(fraud_features)
+        # Model 3: Fraud Detection (tx_velocity, score_volatility, activity_pattern)
+        is_fraud, fraud_likelihood, anomalies = self.fraud_detector.predict_batch(
+            features[:, 9], features[:, 17], features[:, 3]
+        )
         
         # Model 4: Terms Recommendation
-        loan_amount = user_data.get('requested_loan_amount', 10000)
-        terms = self.terms_recommender.recommend(risk_score_normalized, loan_amount)
-        
-        # Generate proof
-        proof = self._generate_proof(user_data, risk_score_normalized)
+        terms = self.terms_recommender.recommend_batch(risk_scores_normalized, loan_amounts)
         
-        return {
-            'risk_category': risk_category,
-            'risk_score': round(risk_score_normalized, 2),
-            'default_probability': round(default_probability, 2),
-            'fraud_detected': is_fraud,
-            'fraud_likelihood': round(fraud_likelihood, 2),
-            'fraud_anomalies': anomalies,
-            'recommended_terms': terms,
-            'proof': proof,
-            'timestamp': datetime.utcnow().isoformat(),
-            'model_version': '2.0.0'
-        }
+        return [
+            ({
+                'risk_category': str(risk_categories[i]),
+                'risk_score': round(float(risk_scores_normalized[i]), 2),
+                'default_probability': round(float(default_probabilities[i]), 2),
+                'fraud_detected': bool(is_fraud[i]),
+                'fraud_likelihood': round(float(fraud_likelihood[i]), 2),
+                'fraud_anomalies': anomalies[i],
+                'recommended_terms': terms[i]
+            }, float(risk_scores_normalized[i]))
+            for i in range(features.shape[0])
+        ]
     
-    def _generate_proof(self, user_data: Dict, risk_score: float) -> Dict:
+    def _generate_proof(self, wallet_address: str, risk_score: float, timestamp: str = None) -> Dict:
         """Generate cryptographic proof of assessment"""
         
         # Create proof hash
-        proof_data = f"{user_data.get('wallet_address', '')}{risk_score}{datetime.utcnow().isoformat()}"
+        timestamp = timestamp or datetime.utcnow().isoformat()
+        proof_data = f"{wallet_address}{risk_score}{timestamp}"
         proof_hash = hashlib.sha256(proof_data.encode()).hexdigest()
         
         # Create nullifier (for privacy)
-        nullifier_data = f"{proof_hash}{user_data.get('wallet_address', '')}"
+        nullifier_data = f"{proof_hash}{wallet_address}"
         nullifier = hashlib.sha256(nullifier_data.encode()).hexdigest()
         
         return {
@@ -292,8 +462,16 @@ class AIRiskOracleV2:
         return user_data
     
     def batch_assess(self, users_data: List[Dict]) -> List[Dict]:
-        """Batch assessment for multiple users"""
-        return [self.assess_risk(user) for user in users_data]
+        """Batch assessment for multiple users (one vectorized pass)"""
+        if not users_data:
+            return []
+        
+        features = self.extract_feature_matrix(users_data)
+        return self.assess_matrix(
+            features,
+            [user.get('wallet_address', '') for user in users_data],
+            [user.get('requested_loan_amount', 10000) for user in users_data]
+        )
 
 
 # Singleton instance
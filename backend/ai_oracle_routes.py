@@ -4,19 +4,32 @@ Endpoints for AI-powered risk assessment
 """
 
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, Dict, List
+from web3 import Web3
+from typing import Optional, Dict, List, AsyncIterator
 from datetime import datetime
+import json
+import logging
 
-from ai_models import ai_oracle_v2
-from oracle_service import get_oracle_service
+from ai_models import ai_oracle_v2, MODEL_VERSION
+from oracle_service import get_oracle_service, running_oracle_service
+from oracle_events import demand_publisher
 from api_key_auth import verify_api_key
+from passport_loader import iter_passport_columns
+from percentile_index import credit_rank_value, population_index
+from web3_pool import run_web3
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/ai-oracle", tags=["AI Risk Oracle"])
 
 # Global db reference
 _db = None
 
+# Wallets resolved per $in query / scored per chunk when streaming
+STREAM_CHUNK_SIZE = 500
+
 def set_db(db):
     global _db
     _db = db
@@ -69,7 +82,8 @@ async def assess_risk(
             'reputation_score': passport.get('reputation_score', 0),
             'is_verified': passport.get('is_verified', False),
             'requested_loan_amount': request.requested_loan_amount,
-            'score_history': passport.get('score_history', [])
+            'score_history': passport.get('score_history', []),
+            'score_stats': passport.get('score_stats')
         }
         
         # Get data sources if available
@@ -85,8 +99,15 @@ async def assess_risk(
             'liquidation_count': data_sources.get('defi', {}).get('liquidations', 0)
         })
         
-        # Run AI assessment with REAL DeFi data
-        assessment = ai_oracle_v2.assess_risk(user_data, wallet_address=request.wallet_address)
+        # Run AI assessment with REAL DeFi data (blocking RPC: off the event loop)
+        assessment = await run_web3(ai_oracle_v2.assess_risk, user_data, wallet_address=request.wallet_address)
+        
+        # Partner demand raises the wallet's refresh priority on the worker
+        # owning its shard (this process may run no oracle at all)
+        if not await demand_publisher.publish(request.wallet_address):
+            oracle = running_oracle_service()
+            if oracle:
+                oracle.scheduler.record_demand(request.wallet_address)
         
         # Update API key usage
         await _db.api_keys.update_one(
@@ -115,52 +136,169 @@ async def batch_assess_risk(
     """Batch risk assessment for multiple wallets"""
     
     try:
+        loan_amount = request.requested_loan_amount if request.requested_loan_amount is not None else 10000
+        
+        # Chunked $in queries into column blocks, scored a chunk at a time
         results = []
+        for i in range(0, len(request.wallet_addresses), STREAM_CHUNK_SIZE):
+            chunk = request.wallet_addresses[i:i + STREAM_CHUNK_SIZE]
+            results.extend(await _assess_wallet_chunk(chunk, loan_amount))
         
-        for wallet_address in request.wallet_addresses:
-            passport = await _db.passports.find_one({
-                'owner': wallet_address
-            })
-            
-            if not passport:
-                results.append({
-                    'wallet_address': wallet_address,
-                    'success': False,
-                    'error': 'Passport not found'
-                })
-                continue
-            
-            # Prepare user data
-            user_data = {
-                'wallet_address': wallet_address,
-                'credit_score': passport.get('credit_score', 0),
-                'poh_score': passport.get('pohScore', 0),
-                'badge_count': passport.get('badgeCount', 0),
-                'requested_loan_amount': request.requested_loan_amount
-            }
-            
-            # Run assessment
-            assessment = ai_oracle_v2.assess_risk(user_data)
-            
+        # Update API key usage
+        await _db.api_keys.update_one(
+            {'api_key': api_key_info['api_key']},
+            {'$inc': {'requests_used': len(request.wallet_addresses)}}
+        )
+        
+        return {
+            'success': True,
+            'total': len(request.wallet_addresses),
+            'results': results,
+            'timestamp': datetime.utcnow().isoformat()
+        }
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/batch-assess/stream")
+async def batch_assess_stream(
+    request: BatchAssessmentRequest,
+    api_key_info: Dict = Depends(verify_api_key)
+):
+    """
+    Streaming batch risk assessment (NDJSON)
+    
+    Wallets are resolved with chunked $in queries and scored one chunk at a
+    time; each result is written as one JSON line as soon as its chunk is done.
+    """
+    
+    # Update API key usage
+    await _db.api_keys.update_one(
+        {'api_key': api_key_info['api_key']},
+        {'$inc': {'requests_used': len(request.wallet_addresses)}}
+    )
+    
+    return StreamingResponse(
+        _stream_assessments(
+            request.wallet_addresses,
+            request.requested_loan_amount if request.requested_loan_amount is not None else 10000
+        ),
+        media_type="application/x-ndjson"
+    )
+
+
+async def _stream_assessments(wallet_addresses: List[str], loan_amount: float) -> AsyncIterator[str]:
+    """Yield one NDJSON line per requested wallet, chunk by chunk"""
+    try:
+        for i in range(0, len(wallet_addresses), STREAM_CHUNK_SIZE):
+            chunk = wallet_addresses[i:i + STREAM_CHUNK_SIZE]
+            results = await _assess_wallet_chunk(chunk, loan_amount)
+            yield "".join(json.dumps(result) + "\n" for result in results)
+    except Exception as e:
+        logger.error(f"❌ Streaming batch assessment failed: {e}")
+        yield json.dumps({'success': False, 'error': str(e)}) + "\n"
+
+
+async def _assess_wallet_chunk(wallets: List[str], loan_amount: float) -> List[Dict]:
+    """Fetch a chunk of passports with one query and score them together
+    
+    A passport may be stored under owner or wallet_address, in any case,
+    so results are keyed by whichever of its addresses was requested.
+    """
+    variants = _address_variants(wallets)
+    query = {'$or': [
+        {'owner': {'$in': variants}},
+        {'wallet_address': {'$in': variants}}
+    ]}
+    
+    requested = {wallet.lower() for wallet in wallets}
+    assessments = {}
+    async for block in iter_passport_columns(_db, query, chunk_size=len(wallets)):
+        scored = ai_oracle_v2.assess_matrix(block.feature_matrix(), block.wallets, loan_amount)
+        for addresses, assessment in zip(block.addresses, scored):
+            for address in addresses:
+                if address and address.lower() in requested:
+                    assessments.setdefault(address.lower(), assessment)
+    
+    results = []
+    for wallet in wallets:
+        assessment = assessments.get(wallet.lower())
+        if assessment is not None:
             results.append({
-                'wallet_address': wallet_address,
+                'wallet_address': wallet,
                 'success': True,
                 'assessment': assessment
             })
+        else:
+            results.append({
+                'wallet_address': wallet,
+                'success': False,
+                'error': 'Passport not found'
+            })
+    return results
+
+
+def _address_variants(wallets: List[str]) -> List[str]:
+    """Requested wallets as given, lowercased and checksummed (Mongo matches exactly)"""
+    variants = set()
+    for wallet in wallets:
+        variants.update((wallet, wallet.lower()))
+        if Web3.is_address(wallet):
+            variants.add(Web3.to_checksum_address(wallet))
+    return sorted(variants)
+
+
+@router.get("/percentile/{wallet_address}")
+async def get_percentile(
+    wallet_address: str,
+    api_key_info: Dict = Depends(verify_api_key)
+):
+    """
+    Where a wallet ranks across all Aura passports
+    
+    Returns percentile (share of passports ranked below), rank and
+    top_percent for both credit_score (on the 0-1000 scale) and oracle
+    risk_score.
+    """
+    
+    try:
+        await population_index.ensure_built(_db)
+        
+        ranking = population_index.lookup(wallet_address)
+        if ranking['credit_score'] is None and ranking['risk_score'] is None:
+            # Passport created since the index was built
+            passport = await _db.passports.find_one({'$or': [
+                {'owner': wallet_address},
+                {'wallet_address': wallet_address}
+            ]})
+            
+            if not passport:
+                raise HTTPException(status_code=404, detail="Passport not found")
+            
+            population_index.update(
+                wallet_address,
+                credit_score=credit_rank_value(passport.get('credit_score'), passport.get('risk_score')),
+                risk_score=passport.get('risk_score')
+            )
+            ranking = population_index.lookup(wallet_address)
         
         # Update API key usage
         await _db.api_keys.update_one(
             {'api_key': api_key_info['api_key']},
-            {'$inc': {'requests_used': len(request.wallet_addresses)}}
+            {'$inc': {'requests_used': 1}}
         )
         
         return {
             'success': True,
-            'total': len(request.wallet_addresses),
-            'results': results,
+            'wallet_address': wallet_address,
+            'credit_score': ranking['credit_score'],
+            'risk_score': ranking['risk_score'],
             'timestamp': datetime.utcnow().isoformat()
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -234,7 +372,7 @@ async def get_oracle_stats():
             'total_assessments': total_assessments,
             'risk_distribution': risk_dist,
             'fraud_detected': fraud_detected,
-            'model_version': '2.0.0',
+            'model_version': MODEL_VERSION,
             'uptime': '99.9%'
         }
         
@@ -242,13 +380,24 @@ async def get_oracle_stats():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/cache-stats")
+async def get_cache_stats():
+    """Get assessment cache hit/miss statistics"""
+    return {
+        'success': True,
+        'cache': ai_oracle_v2.cache.stats(),
+        'model_version': MODEL_VERSION,
+        'timestamp': datetime.utcnow().isoformat()
+    }
+
+
 @router.get("/health")
 async def health_check():
     """Health check for AI Oracle service"""
     return {
         'status': 'healthy',
         'service': 'AI Risk Oracle',
-        'version': '2.0.0',
+        'version': MODEL_VERSION,
         'timestamp': datetime.utcnow().isoformat()
     }
 
@@ -266,7 +415,20 @@ async def get_service_status():
         
         return {
             'running': oracle.running if oracle else False,
-            'update_interval': '5 minutes',
+            'update_interval': 'priority-scheduled',
+            'sweep_interval': oracle.update_interval if oracle else None,
+            'scheduler': oracle.scheduler.stats() if oracle else None,
+            'pipeline': oracle.pipeline.stats() if oracle else None,
+            'current_cycle': oracle.cycle_counters if oracle else None,
+            'last_cycle': oracle.last_cycle if oracle else None,
+            'force_refresh': oracle.refresh_flight.stats() if oracle else None,
+            'data_sources': oracle.source_stats() if oracle else None,
+            'shards': oracle.leases.stats() if (oracle and oracle.leases) else None,
+            'events': oracle.events.stats() if oracle else None,
+            'bulk_writes': {
+                'passports': oracle.passport_writer.stats(),
+                'events': oracle.event_writer.stats()
+            } if oracle else None,
             'recent_updates': len(recent_events),
             'last_update': recent_events[0]['timestamp'].isoformat() if recent_events else None,
             'status': 'active' if (oracle and oracle.running) else 'inactive'
@@ -7,6 +7,9 @@ import numpy as np
 from typing import Dict, List
 from datetime import datetime
 
+import score_stats
+from defi_snapshot import defi_snapshot
+
 class AIRiskOracle:
     """AI-powered risk assessment oracle"""
     
@@ -28,6 +31,9 @@ class AIRiskOracle:
         """
         Predict risk score using AI model
         
+        With wallet_address the DeFi positions are read over RPC (blocking):
+        async callers go through run_web3.
+        
         Args:
             user_data: {
                 'poh_score': 0-100,
@@ -35,7 +41,8 @@ class AIRiskOracle:
                 'onchain_activity': int,
                 'credit_score': 0-1000,
                 'account_age_days': int,
-                'score_history': [scores]
+                'score_history': [scores],
+                'score_stats': running stats (optional, preferred over history)
             }
         
         Returns:
@@ -53,16 +60,18 @@ class AIRiskOracle:
         onchain_activity = user_data.get('onchain_activity', 0)
         account_age_days = user_data.get('account_age_days', 0)
         score_history = user_data.get('score_history', [])
+        stats = user_data.get('score_stats')
         
         # Get REAL DeFi data if wallet provided
         defi_features = {}
         if wallet_address:
-            defi_features = self._get_defi_features(wallet_address)
+            with defi_snapshot():
+                defi_features = self._get_defi_features(wallet_address)
         
         # Feature engineering
         features = self._extract_features(
             poh_score, badge_count, onchain_activity, 
-            account_age_days, score_history
+            account_age_days, score_history, stats
         )
         
         # Merge DeFi features
@@ -91,7 +100,7 @@ class AIRiskOracle:
         }
     
     def _extract_features(self, poh_score, badge_count, onchain_activity, 
-                         account_age_days, score_history) -> Dict:
+                         account_age_days, score_history, stats=None) -> Dict:
         """Extract and normalize features with REAL DeFi data"""
         
         # Normalize features to 0-1 scale
@@ -102,7 +111,9 @@ class AIRiskOracle:
         
         # Calculate score velocity
         velocity = 0.5
-        if len(score_history) >= 2:
+        if stats:
+            velocity = score_stats.trend(stats)
+        elif len(score_history) >= 2:
             recent_change = score_history[-1] - score_history[0]
             velocity = 0.5 + (recent_change / 1000)
             velocity = max(0, min(1, velocity))
@@ -236,7 +247,7 @@ class AIRiskOracle:
     def _get_defi_features(self, wallet_address: str) -> Dict:
         """Extract features from REAL DeFi data"""
         try:
-            from defi_indexer import fetch_defi_data, get_defi_risk_score
+            from defi_indexer import fetch_defi_data
             
             # Fetch real DeFi data
             defi_data = fetch_defi_data(wallet_address)
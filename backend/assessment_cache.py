@@ -0,0 +1,103 @@
+"""
+Assessment Result Cache
+Bounded LRU cache of AI Risk Oracle model outputs, keyed by a fingerprint
+of the quantized feature vector and the model version
+"""
+
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+DEFAULT_MAX_ENTRIES = int(os.getenv("ASSESSMENT_CACHE_SIZE", "100000"))
+DEFAULT_TTL = int(os.getenv("ASSESSMENT_CACHE_TTL", "600"))  # 10 minutes
+DEFAULT_DECIMALS = int(os.getenv("ASSESSMENT_CACHE_DECIMALS", "6"))
+
+
+class AssessmentCache:
+    """In-process LRU cache with per-entry TTL and hit/miss counters"""
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        ttl: int = DEFAULT_TTL,
+        decimals: int = DEFAULT_DECIMALS
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.decimals = decimals
+        self._entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def fingerprints(self, features: np.ndarray, loan_amounts: np.ndarray, model_version: str) -> List[str]:
+        """One key per row of an (N, 19) feature matrix"""
+        quantized = np.round(features, self.decimals)
+        # -0.0 and 0.0 must hash alike
+        quantized += 0.0
+        loans = np.asarray(loan_amounts, dtype=np.float64)
+        prefix = model_version.encode()
+
+        return [
+            hashlib.blake2b(
+                prefix + quantized[i].tobytes() + loans[i].tobytes(),
+                digest_size=16
+            ).hexdigest()
+            for i in range(len(quantized))
+        ]
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Cached entry, or None on miss/expiry"""
+        if not self.enabled:
+            return None
+
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: Dict):
+        """Store an entry, evicting the least recently used past capacity"""
+        if not self.enabled:
+            return
+
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict:
+        """Hit/miss counters for the API"""
+        lookups = self.hits + self.misses
+        return {
+            'enabled': self.enabled,
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'ttl_seconds': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+        }
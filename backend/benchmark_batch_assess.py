@@ -0,0 +1,67 @@
+"""
+Benchmark AI Risk Oracle batch scoring
+Compares per-wallet assess_risk against the vectorized batch_assess path
+"""
+
+import random
+import sys
+import time
+
+from ai_models import AIRiskOracleV2
+from assessment_cache import AssessmentCache
+
+SIZES = [1_000, 10_000, 100_000]
+
+
+def make_users(count: int, seed: int = 7) -> list:
+    """Generate synthetic passport data"""
+    rng = random.Random(seed)
+    return [
+        {
+            'wallet_address': f"0x{i:040x}",
+            'credit_score': rng.uniform(300, 900),
+            'poh_score': rng.uniform(0, 100),
+            'badge_count': rng.randint(0, 10),
+            'onchain_activity': rng.randint(0, 100),
+            'account_age_days': rng.randint(0, 730),
+            'tx_count': rng.randint(0, 500),
+            'tx_velocity': rng.random(),
+            'total_borrowed': rng.uniform(0, 50000),
+            'total_supplied': rng.uniform(0, 75000),
+            'score_history': [rng.uniform(300, 900) for _ in range(5)]
+        }
+        for i in range(count)
+    ]
+
+
+def run_benchmark(sizes=SIZES):
+    oracle = AIRiskOracleV2()
+    oracle.cache = AssessmentCache(max_entries=0)  # measure the models, not the cache
+    
+    print("⏱️  AI Risk Oracle batch scoring benchmark\n")
+    print(f"{'wallets':>10} {'per-wallet':>14} {'batch':>14} {'speedup':>9}")
+    print("-" * 50)
+    
+    for size in sizes:
+        users = make_users(size)
+        
+        start = time.perf_counter()
+        for user in users:
+            oracle.assess_risk(user)
+        per_wallet_secs = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        oracle.batch_assess(users)
+        batch_secs = time.perf_counter() - start
+        
+        print(
+            f"{size:>10,} "
+            f"{size / per_wallet_secs:>10,.0f} w/s "
+            f"{size / batch_secs:>10,.0f} w/s "
+            f"{per_wallet_secs / batch_secs:>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or SIZES
+    run_benchmark(sizes)
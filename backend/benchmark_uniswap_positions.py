@@ -0,0 +1,239 @@
+"""
+Benchmark Uniswap V3 position enumeration
+Compares one-call-per-read enumeration against the batched multicall path
+in DeFiIndexer.get_uniswap_data, replaying recorded RPC responses with a
+simulated round-trip latency.
+
+    python benchmark_uniswap_positions.py                 # synthetic chain
+    python benchmark_uniswap_positions.py --record 0xWALLET out.json
+    python benchmark_uniswap_positions.py out.json        # replay a recording
+"""
+
+import math
+import random
+import sys
+import time
+
+from eth_abi import encode, decode
+from web3 import Web3
+from web3.providers.base import BaseProvider
+
+from defi_indexer import (
+    DeFiIndexer, POLYGON_RPC, BALANCE_OF_SELECTOR, AAVE_ORACLE, UNISWAP_V3_FACTORY, UNISWAP_V3_POSITIONS,
+    TOKEN_OF_OWNER_SELECTOR, POSITIONS_SELECTOR, POSITION_OUTPUTS, GET_POOL_SELECTOR,
+    SLOT0_SELECTOR, SLOT0_OUTPUTS, DECIMALS_SELECTOR, ASSET_PRICE_SELECTOR, AGGREGATE3_SELECTOR
+)
+from position_cache import PositionCache
+from rpc_recording import RecordingProvider, ReplayProvider
+
+SIZES = [10, 100, 500]
+LATENCY = 0.04  # simulated RPC round trip (seconds)
+BLOCK = 60_000_000
+
+# (address, decimals, USD price or None when the price oracle doesn't list it)
+TOKENS = {
+    'USDC': ("0x2791Bca1f2de4661ED88A30C99A7a9449Aa84174", 6, 1.0),
+    'WETH': ("0x7ceB23fD6bC0adD59E62ac25578270cFf1b9f619", 18, 3000.0),
+    'WMATIC': ("0x0d500B1d8E8eF31E21C99d1Db9A6444d3ADf1270", 18, 0.5),
+    'XYZ': ("0x00000000000000000000000000000000000a11ce", 18, None),
+}
+# (token a, token b, fee, price of a in b)
+POOLS = [('USDC', 'WETH', 500, 1 / 3000), ('WMATIC', 'USDC', 3000, 0.5), ('WETH', 'XYZ', 10000, 1500.0)]
+
+
+class SimulatedUniswapChain(BaseProvider):
+    """Answers the eth_calls the indexer makes, directly or inside aggregate3"""
+
+    def __init__(self, owner: str, position_count: int, seed: int = 11):
+        super().__init__()
+        rng = random.Random(seed)
+        self.owner = Web3.to_checksum_address(owner)
+        self.decimals = {Web3.to_checksum_address(a): d for a, d, _ in TOKENS.values()}
+        self.prices = {Web3.to_checksum_address(a): p for a, _, p in TOKENS.values()}
+        self.pools = {}
+        self.slot0 = {}
+
+        pool_list = []
+        for i, (a, b, fee, price) in enumerate(POOLS):
+            token_a, token_b = (Web3.to_checksum_address(TOKENS[t][0]) for t in (a, b))
+            if int(token_a, 16) > int(token_b, 16):
+                token_a, token_b, price = token_b, token_a, 1 / price
+            raw_price = price * 10 ** (self.decimals[token_b] - self.decimals[token_a])
+            sqrt_price_x96 = int(math.sqrt(raw_price) * 2 ** 96)
+            tick = math.floor(math.log(raw_price, 1.0001))
+            pool = Web3.to_checksum_address(f"0x{0xb00100 + i:040x}")
+            self.pools[(token_a, token_b, fee)] = pool
+            self.slot0[pool] = (sqrt_price_x96, tick, 0, 1, 1, 0, True)
+            pool_list.append((token_a, token_b, fee, tick))
+
+        self.token_ids = []
+        self.positions = {}
+        for index in range(position_count):
+            token0, token1, fee, tick = pool_list[index % len(pool_list)]
+            spacing = {500: 10, 3000: 60, 10000: 200}[fee]
+            lower = (tick // spacing - rng.randint(-20, 60)) * spacing
+            upper = lower + rng.randint(1, 80) * spacing
+            liquidity = 0 if index % 7 == 6 else rng.randint(10 ** 12, 10 ** 18)
+            token_id = 100_000 + index
+            self.token_ids.append(token_id)
+            self.positions[token_id] = (0, "0x" + "00" * 20, token0, token1, fee, lower, upper, liquidity, 0, 0, 0, 0)
+
+    def _call(self, to: str, data: bytes) -> bytes:
+        to = Web3.to_checksum_address(to)
+        selector, args = data[:4], data[4:]
+        if selector == BALANCE_OF_SELECTOR:
+            return encode(["uint256"], [len(self.token_ids)])
+        if selector == TOKEN_OF_OWNER_SELECTOR:
+            owner, index = decode(["address", "uint256"], args)
+            return encode(["uint256"], [self.token_ids[index]])
+        if selector == POSITIONS_SELECTOR:
+            (token_id,) = decode(["uint256"], args)
+            return encode(POSITION_OUTPUTS, self.positions[token_id])
+        if selector == GET_POOL_SELECTOR:
+            token0, token1, fee = decode(["address", "address", "uint24"], args)
+            key = (Web3.to_checksum_address(token0), Web3.to_checksum_address(token1), fee)
+            return encode(["address"], [self.pools.get(key, "0x" + "00" * 20)])
+        if selector == SLOT0_SELECTOR:
+            return encode(SLOT0_OUTPUTS, self.slot0[to])
+        if selector == DECIMALS_SELECTOR:
+            return encode(["uint8"], [self.decimals[to]])
+        if selector == ASSET_PRICE_SELECTOR:
+            (token,) = decode(["address"], args)
+            price = self.prices[Web3.to_checksum_address(token)]
+            if price is None:
+                raise ValueError("asset not listed")
+            return encode(["uint256"], [int(price * 1e8)])
+        if selector == AGGREGATE3_SELECTOR:
+            (calls,) = decode(["(address,bool,bytes)[]"], args)
+            results = []
+            for target, _, call_data in calls:
+                try:
+                    results.append((True, self._call(target, call_data)))
+                except Exception:
+                    results.append((False, b""))
+            return encode(["(bool,bytes)[]"], [results])
+        raise ValueError(f"unexpected call {selector.hex()}")
+
+    def make_request(self, method, params):
+        if method == 'eth_chainId':
+            return {'jsonrpc': '2.0', 'id': 1, 'result': '0x89'}
+        if method == 'eth_blockNumber':
+            return {'jsonrpc': '2.0', 'id': 1, 'result': hex(BLOCK)}
+        if method == 'eth_call':
+            try:
+                result = self._call(params[0]['to'], bytes.fromhex(params[0]['data'][2:]))
+            except Exception as e:
+                return {'jsonrpc': '2.0', 'id': 1, 'error': {'code': 3, 'message': f"execution reverted: {e}"}}
+            return {'jsonrpc': '2.0', 'id': 1, 'result': '0x' + result.hex()}
+        raise ValueError(f"unexpected method {method}")
+
+    def is_connected(self, show_traceback=False):
+        return True
+
+
+def naive_enumerate(w3: Web3, wallet_address: str) -> int:
+    """One eth_call per read, as a client without multicall would do it"""
+    block = w3.eth.block_number
+
+    def call(to, data):
+        try:
+            return w3.eth.call({'to': to, 'data': data}, block)
+        except Exception:
+            return None
+
+    owner = Web3.to_checksum_address(wallet_address)
+    count = decode(["uint256"], call(UNISWAP_V3_POSITIONS, BALANCE_OF_SELECTOR + encode(["address"], [owner])))[0]
+    seen_pools, seen_tokens = set(), set()
+    for index in range(count):
+        token_id = decode(["uint256"], call(
+            UNISWAP_V3_POSITIONS, TOKEN_OF_OWNER_SELECTOR + encode(["address", "uint256"], [owner, index])
+        ))[0]
+        fields = decode(POSITION_OUTPUTS, call(UNISWAP_V3_POSITIONS, POSITIONS_SELECTOR + encode(["uint256"], [token_id])))
+        if fields[7] == 0:
+            continue
+        key = (fields[2], fields[3], fields[4])
+        if key not in seen_pools:
+            seen_pools.add(key)
+            pool = decode(["address"], call(UNISWAP_V3_FACTORY, GET_POOL_SELECTOR + encode(["address", "address", "uint24"], list(key))))[0]
+            call(pool, SLOT0_SELECTOR)
+        for token in key[:2]:
+            if token not in seen_tokens:
+                seen_tokens.add(token)
+                call(token, DECIMALS_SELECTOR)
+                call(AAVE_ORACLE, ASSET_PRICE_SELECTOR + encode(["address"], [token]))
+    return count
+
+
+def batched_enumerate(w3: Web3, wallet_address: str) -> dict:
+    indexer = DeFiIndexer(w3=w3)
+    indexer.positions = PositionCache(cache=_NoCache())  # measure the RPC path, not the cache
+    return indexer.get_uniswap_data(wallet_address)
+
+
+class _NoCache:
+    enabled = False
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl=300):
+        return False
+
+
+def record_synthetic(owner: str, position_count: int) -> dict:
+    recorder = RecordingProvider(SimulatedUniswapChain(owner, position_count))
+    w3 = Web3(recorder)
+    naive_enumerate(w3, owner)
+    batched_enumerate(w3, owner)
+    return recorder.recording
+
+
+def time_replay(recording: dict, owner: str, enumerate_fn):
+    provider = ReplayProvider(recording, latency=LATENCY)
+    start = time.perf_counter()
+    enumerate_fn(Web3(provider), owner)
+    return time.perf_counter() - start, provider.requests
+
+
+def run_benchmark(sizes=SIZES, recording_path: str = None):
+    owner = "0x000000000000000000000000000000000000beef"
+    print(f"⏱️  Uniswap V3 enumeration benchmark ({LATENCY * 1000:.0f} ms simulated RPC latency)\n")
+    print(f"{'positions':>10} {'naive':>18} {'batched':>18} {'speedup':>9}")
+    print("-" * 60)
+
+    runs = []
+    if recording_path:
+        replay = ReplayProvider.load(recording_path)
+        runs.append(("recorded", replay.recording, replay.recording.get("__owner__", owner)))
+    else:
+        runs = [(size, record_synthetic(owner, size), owner) for size in sizes]
+
+    for label, recording, wallet in runs:
+        naive_secs, naive_requests = time_replay(recording, wallet, naive_enumerate)
+        batched_secs, batched_requests = time_replay(recording, wallet, batched_enumerate)
+        print(
+            f"{label:>10} "
+            f"{naive_secs:>8.2f}s {naive_requests:>5} rpc "
+            f"{batched_secs:>8.2f}s {batched_requests:>5} rpc "
+            f"{naive_secs / batched_secs:>8.1f}x"
+        )
+
+
+def record_live(wallet_address: str, path: str):
+    """Record a live wallet's responses for later replay"""
+    recorder = RecordingProvider(Web3.HTTPProvider(POLYGON_RPC))
+    w3 = Web3(recorder)
+    naive_enumerate(w3, wallet_address)
+    batched_enumerate(w3, wallet_address)
+    recorder.recording["__owner__"] = wallet_address
+    recorder.save(path)
+    print(f"💾 Recorded {len(recorder.recording) - 1} responses to {path}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "--record":
+        record_live(sys.argv[2], sys.argv[3])
+    elif len(sys.argv) == 2 and not sys.argv[1].isdigit():
+        run_benchmark(recording_path=sys.argv[1])
+    else:
+        run_benchmark([int(arg) for arg in sys.argv[1:]] or SIZES)
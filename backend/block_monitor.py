@@ -1,4 +1,3 @@
-from web3 import Web3
 try:
     from web3.middleware import geth_poa_middleware
 except ImportError:
@@ -7,11 +6,16 @@ import asyncio
 import logging
 from datetime import datetime
 
+from chain_client import chain_web3
+from web3_pool import run_web3
+
 logger = logging.getLogger(__name__)
 
+CATCH_UP_BATCH = 20  # blocks fetched together (one JSON-RPC batch) when behind
+
 class BlockMonitor:
     def __init__(self, rpc_url, ws_manager, contract_addresses):
-        self.w3 = Web3(Web3.HTTPProvider(rpc_url))
+        self.w3 = chain_web3(rpc_url)
         # Inject POA middleware for Polygon Amoy
         self.w3.middleware_onion.inject(geth_poa_middleware, layer=0)
         self.ws_manager = ws_manager
@@ -25,21 +29,31 @@ class BlockMonitor:
         
         while self.running:
             try:
-                current_block = self.w3.eth.block_number
+                current_block = await run_web3(lambda: self.w3.eth.block_number)
                 
-                if current_block > self.last_block:
-                    for block_num in range(self.last_block + 1, current_block + 1):
-                        await self.process_block(block_num)
-                    self.last_block = current_block
+                while self.last_block < current_block:
+                    numbers = range(self.last_block + 1, min(current_block, self.last_block + CATCH_UP_BATCH) + 1)
+                    blocks = await asyncio.gather(*[self.fetch_block(n) for n in numbers])
+                    for block_num, block in zip(numbers, blocks):
+                        await self.process_block(block_num, block)
+                    self.last_block = numbers[-1]
                 
                 await asyncio.sleep(2)
             except Exception as e:
                 logger.error(f"Block monitor error: {e}")
                 await asyncio.sleep(5)
     
-    async def process_block(self, block_number):
+    async def fetch_block(self, block_number):
+        try:
+            return await run_web3(self.w3.eth.get_block, block_number, full_transactions=True)
+        except Exception as e:
+            logger.error(f"Error fetching block {block_number}: {e}")
+            return None
+    
+    async def process_block(self, block_number, block=None):
         try:
-            block = self.w3.eth.get_block(block_number, full_transactions=True)
+            if block is None:
+                block = await run_web3(self.w3.eth.get_block, block_number, full_transactions=True)
             
             block_data = {
                 'number': block.number,
@@ -51,10 +65,11 @@ class BlockMonitor:
             
             await self.ws_manager.broadcast_block(block_data)
             
-            # Process transactions
-            for tx in block.transactions:
-                if tx['to'] and tx['to'].lower() in self.contract_addresses:
-                    await self.process_transaction(tx)
+            # Process transactions (receipts are read together)
+            await asyncio.gather(*[
+                self.process_transaction(tx) for tx in block.transactions
+                if tx['to'] and tx['to'].lower() in self.contract_addresses
+            ])
             
         except Exception as e:
             logger.error(f"Error processing block {block_number}: {e}")
@@ -73,7 +88,7 @@ class BlockMonitor:
         
         # Check if it's a badge mint
         try:
-            receipt = self.w3.eth.get_transaction_receipt(tx['hash'])
+            receipt = await run_web3(self.w3.eth.get_transaction_receipt, tx['hash'])
             if receipt.status == 1:
                 for log in receipt.logs:
                     if log.address.lower() in self.contract_addresses:
@@ -1,12 +1,20 @@
 from web3 import Web3
+from web3.exceptions import TransactionNotFound
 from eth_account import Account
+import asyncio
 import json
 import os
-from typing import Dict, Any, Optional
+import time
+from typing import Dict, Any, List, Optional, Tuple
 import logging
 from dotenv import load_dotenv
 from pathlib import Path
 
+from chain_client import chain_web3
+from fee_oracle import DEFAULT_URGENCY, FeeOracle
+from nonce_manager import NonceManager, create_nonce_store
+from web3_pool import run_web3
+
 # Load environment variables
 load_dotenv(Path(__file__).parent / '.env')
 
@@ -14,9 +22,10 @@ logger = logging.getLogger(__name__)
 
 class PolygonIntegration:
     def __init__(self):
-        # Polygon Amoy testnet RPC
-        self.rpc_url = "https://rpc-amoy.polygon.technology"
-        self.w3 = Web3(Web3.HTTPProvider(self.rpc_url))
+        # Polygon Amoy testnet RPC (comma-separated for an endpoint pool)
+        self.rpc_url = os.getenv("POLYGON_AMOY_RPC_URL", "https://rpc-amoy.polygon.technology")
+        self.w3 = chain_web3(self.rpc_url)
+        self.fees = FeeOracle(self.w3)
         
         # Contract addresses (deployed on Polygon Amoy)
         self.contracts = {
@@ -29,9 +38,17 @@ class PolygonIntegration:
         self.private_key = os.getenv("POLYGON_PRIVATE_KEY", "").strip('"')
         if self.private_key and self.private_key != "your_private_key_here":
             self.account = Account.from_key(self.private_key)
+            # Stuck transactions are re-sent at no less than the high tier; the
+            # nonce counter is shared with every other process using this key
+            # (Redis is contacted on the first send, not at import)
+            self.nonces = NonceManager(
+                self.w3, self.account.address, self._sign, reprice=lambda: self.fees.fees('high'),
+                store=create_nonce_store(self.account.address)
+            )
         else:
             logger.warning("No private key found. Blockchain operations will be read-only.")
             self.account = None
+            self.nonces = None
     
     def load_contract_addresses(self, deployment_file: str = "deployment.json"):
         """Load contract addresses from deployment file"""
@@ -96,22 +113,17 @@ class PolygonIntegration:
                 abi=contract_abi
             )
             
-            # Build transaction
-            transaction = contract.functions.issueBadge(
-                recipient,
-                badge_type,
-                zk_proof_hash,
-                metadata_uri
-            ).build_transaction({
-                'from': self.account.address,
-                'gas': 200000,
-                'gasPrice': self.w3.to_wei('20', 'gwei'),
-                'nonce': self.w3.eth.get_transaction_count(self.account.address)
-            })
-            
-            # Sign and send transaction
-            signed_txn = self.w3.eth.account.sign_transaction(transaction, self.private_key)
-            tx_hash = self.w3.eth.send_raw_transaction(signed_txn.rawTransaction)
+            # Build, sign and send on the web3 pool
+            tx_hash = await run_web3(
+                self._send_transaction,
+                contract.functions.issueBadge(
+                    recipient,
+                    badge_type,
+                    zk_proof_hash,
+                    metadata_uri
+                ),
+                gas=200000
+            )
             
             logger.info(f"ZK Badge issued. Transaction hash: {tx_hash.hex()}")
             return tx_hash.hex()
@@ -120,6 +132,77 @@ class PolygonIntegration:
             logger.error(f"Error issuing ZK Badge: {str(e)}")
             return None
     
+    def _sign(self, transaction: Dict):
+        return self.w3.eth.account.sign_transaction(transaction, self.private_key)
+    
+    def _send_transaction(self, contract_function, gas: int, urgency: str = DEFAULT_URGENCY):
+        """Build, sign and broadcast a contract call (blocking; run on the web3 pool)
+        
+        The nonce comes from the local nonce manager and the EIP-1559 fees
+        from the cached fee oracle, so concurrent calls never collide and
+        need no get_transaction_count or fee round trip.
+        """
+        transaction = contract_function.build_transaction({
+            'from': self.account.address,
+            'gas': gas,
+            **self.fees.fees(urgency),
+            'nonce': 0  # assigned by the nonce manager
+        })
+        return self.nonces.send(transaction)
+    
+    async def _poll_receipt(self, tx_hash):
+        try:
+            return await run_web3(self.w3.eth.get_transaction_receipt, tx_hash)
+        except TransactionNotFound:
+            return None
+    
+    async def wait_for_receipt(self, tx_hash, timeout: float = 120, poll_interval: float = 2.0):
+        """Poll for a transaction receipt, sleeping asynchronously between polls
+        
+        Follows replacements: a transaction stuck in the mempool is re-sent
+        with bumped fees, and whichever version is mined is returned.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            receipt = (await self.fetch_receipts([tx_hash])).get(tx_hash)
+            if receipt is not None:
+                return receipt
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"Transaction {Web3.to_hex(tx_hash)} not mined after {timeout}s")
+            if self.nonces:
+                await run_web3(self.nonces.replace_if_stuck, tx_hash)
+            await asyncio.sleep(poll_interval)
+    
+    async def fetch_receipts(self, tx_hashes) -> Dict[Any, Any]:
+        """Receipts of the mined transactions among tx_hashes, keyed by the given hash
+        
+        Replacements sent for a hash's nonce are checked too. All lookups are
+        issued concurrently, so they share one JSON-RPC batch.
+        """
+        lookups = [
+            (tx_hash, candidate)
+            for tx_hash in tx_hashes
+            for candidate in (self.nonces.hashes_for(tx_hash) if self.nonces else [tx_hash])
+        ]
+        receipts = await asyncio.gather(*[self._poll_receipt(candidate) for _, candidate in lookups])
+        
+        found = {}
+        for (tx_hash, _), receipt in zip(lookups, receipts):
+            if receipt is not None and tx_hash not in found:
+                found[tx_hash] = receipt
+                if self.nonces:
+                    self.nonces.confirmed(tx_hash)
+        return found
+    
+    async def replace_stuck(self):
+        """Re-send every transaction stuck in the mempool with bumped fees
+        
+        Returns {first hash: replacement hash} for the transactions re-sent.
+        """
+        if self.nonces:
+            return await run_web3(self.nonces.replace_stuck)
+        return {}
+    
     async def verify_civic_proof(self, user_address: str, proof_hash: str) -> bool:
         """Verify Civic proof and issue badge"""
         try:
@@ -168,6 +251,78 @@ class PolygonIntegration:
             logger.error(f"Error verifying Worldcoin proof: {str(e)}")
             return False
     
+    # SimpleZKBadge contract and its issueBadge / issueBadgeBatch functions
+    MINT_CONTRACT = "0x9e6343BB504Af8a39DB516d61c4Aa0aF36c54678"
+    MINT_ABI = [{
+        "inputs": [
+            {"name": "recipient", "type": "address"},
+            {"name": "badgeType", "type": "string"},
+            {"name": "zkProofHash", "type": "string"}
+        ],
+        "name": "issueBadge",
+        "outputs": [{"name": "", "type": "uint256"}],
+        "stateMutability": "nonpayable",
+        "type": "function"
+    }, {
+        "inputs": [
+            {"name": "recipients", "type": "address[]"},
+            {"name": "badgeTypes", "type": "string[]"},
+            {"name": "zkProofHashes", "type": "string[]"}
+        ],
+        "name": "issueBadgeBatch",
+        "outputs": [{"name": "tokenIds", "type": "uint256[]"}],
+        "stateMutability": "nonpayable",
+        "type": "function"
+    }]
+    
+    async def submit_badge_mint(
+        self, recipient: str, badge_type: str, zk_proof_hash: str, urgency: str = DEFAULT_URGENCY,
+        contract_address: Optional[str] = None
+    ):
+        """Broadcast a badge mint and return its tx hash without waiting for it
+        
+        Nonces are allocated locally, so any number of mints can be in
+        flight at once. contract_address overrides MINT_CONTRACT (the batch
+        deployment mints its lone and retried badges itself).
+        """
+        contract = self.w3.eth.contract(
+            address=Web3.to_checksum_address(contract_address or self.MINT_CONTRACT),
+            abi=self.MINT_ABI
+        )
+        
+        # Build, sign and send on the web3 pool
+        return await run_web3(
+            self._send_transaction,
+            contract.functions.issueBadge(
+                Web3.to_checksum_address(recipient),
+                badge_type,
+                zk_proof_hash
+            ),
+            gas=300000,
+            urgency=urgency
+        )
+    
+    async def submit_badge_batch(
+        self, contract_address: str, mints: List[Tuple[str, str, str]], gas: int, urgency: str = DEFAULT_URGENCY
+    ):
+        """Broadcast one issueBadgeBatch call for (recipient, badge_type, zk_proof_hash) mints"""
+        contract = self.w3.eth.contract(
+            address=Web3.to_checksum_address(contract_address),
+            abi=self.MINT_ABI
+        )
+        recipients, badge_types, proof_hashes = zip(*mints)
+        
+        return await run_web3(
+            self._send_transaction,
+            contract.functions.issueBadgeBatch(
+                [Web3.to_checksum_address(r) for r in recipients],
+                list(badge_types),
+                list(proof_hashes)
+            ),
+            gas=gas,
+            urgency=urgency
+        )
+    
     async def mint_badge(self, recipient: str, badge_type: str, zk_proof_hash: str) -> Optional[str]:
         """Mint badge using backend wallet (protocol-controlled)"""
         if not self.account:
@@ -175,52 +330,11 @@ class PolygonIntegration:
             return None
         
         try:
-            # Load SimpleZKBadge contract
-            contract_address = "0x9e6343BB504Af8a39DB516d61c4Aa0aF36c54678"
-            
-            # SimpleZKBadge ABI for issueBadge function
-            contract_abi = [{
-                "inputs": [
-                    {"name": "recipient", "type": "address"},
-                    {"name": "badgeType", "type": "string"},
-                    {"name": "zkProofHash", "type": "string"}
-                ],
-                "name": "issueBadge",
-                "outputs": [{"name": "", "type": "uint256"}],
-                "stateMutability": "nonpayable",
-                "type": "function"
-            }]
-            
-            contract = self.w3.eth.contract(
-                address=Web3.to_checksum_address(contract_address),
-                abi=contract_abi
-            )
-            
-            # Build transaction
-            transaction = contract.functions.issueBadge(
-                Web3.to_checksum_address(recipient),
-                badge_type,
-                zk_proof_hash
-            ).build_transaction({
-                'from': self.account.address,
-                'gas': 300000,
-                'gasPrice': self.w3.to_wei('35', 'gwei'),
-                'nonce': self.w3.eth.get_transaction_count(self.account.address)
-            })
-            
-            # Sign and send
-            signed_txn = self.w3.eth.account.sign_transaction(transaction, self.private_key)
-            
-            # Try both attribute names for compatibility
-            raw_tx = getattr(signed_txn, 'rawTransaction', None) or getattr(signed_txn, 'raw_transaction', None)
-            if raw_tx is None:
-                logger.error(f"Cannot get raw transaction. Available attributes: {dir(signed_txn)}")
-                return None
-            
-            tx_hash = self.w3.eth.send_raw_transaction(raw_tx)
+            tx_hash = await self.submit_badge_mint(recipient, badge_type, zk_proof_hash)
             
-            # Wait for receipt
-            receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash, timeout=120)
+            # Wait for receipt without holding a thread or the event loop
+            receipt = await self.wait_for_receipt(tx_hash, timeout=120)
+            tx_hash = receipt['transactionHash']  # a replacement may have been mined
             
             if receipt['status'] == 1:
                 gas_used = receipt['gasUsed']
@@ -263,7 +377,7 @@ class PolygonIntegration:
             
             user_badges = {}
             for badge_name, badge_type in badge_types.items():
-                has_badge = contract.functions.hasBadgeType(user_address, badge_type).call()
+                has_badge = await run_web3(contract.functions.hasBadgeType(user_address, badge_type).call)
                 user_badges[badge_name] = has_badge
             
             return user_badges
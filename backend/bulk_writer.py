@@ -0,0 +1,111 @@
+"""
+Bulk Write-back Buffer
+Accumulates MongoDB write operations and flushes them as unordered
+bulk_write batches, bounded by batch size and time
+"""
+
+import asyncio
+import logging
+import os
+from collections import deque
+from typing import Any, Callable, Dict, List, Tuple
+
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH = int(os.getenv("ORACLE_BULK_BATCH", "500"))
+MAX_DELAY = float(os.getenv("ORACLE_BULK_DELAY", "1.0"))  # seconds
+
+
+class BulkWriter:
+    """Buffered unordered bulk writes with per-document error reporting
+
+    Each operation carries an opaque context (e.g. the wallet address) that is
+    handed back to on_error(context, message) if that document fails.
+
+    Flushes are serialised: when flush() returns, every operation added before
+    the call has been written, including ones a concurrent flush had taken.
+    """
+
+    def __init__(
+        self,
+        collection,
+        name: str,
+        max_batch: int = MAX_BATCH,
+        max_delay: float = MAX_DELAY,
+        on_error: Callable[[Any, str], None] = None
+    ):
+        self.collection = collection
+        self.name = name
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.on_error = on_error
+        self._buffer: List[Tuple[Any, Any]] = []
+        self._flusher = None
+        self._flush_lock = asyncio.Lock()
+        self.counters = {'operations': 0, 'flushes': 0, 'errors': 0}
+        self.recent_errors = deque(maxlen=20)
+
+    async def start(self):
+        """Start the time-based flusher"""
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_periodically())
+
+    async def stop(self):
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        await self.flush()
+
+    async def add(self, operation, context: Any = None):
+        """Buffer an operation; flushes inline once the batch is full"""
+        self._buffer.append((operation, context))
+        if len(self._buffer) >= self.max_batch:
+            await self.flush()
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.max_delay)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"❌ Bulk flush ({self.name}) failed: {e}")
+
+    async def flush(self):
+        """Write everything buffered so far in max_batch-sized requests"""
+        async with self._flush_lock:
+            while self._buffer:
+                batch, self._buffer = self._buffer[:self.max_batch], self._buffer[self.max_batch:]
+                await self._write(batch)
+
+    async def _write(self, batch: List[Tuple[Any, Any]]):
+        self.counters['operations'] += len(batch)
+        self.counters['flushes'] += 1
+
+        try:
+            await self.collection.bulk_write([op for op, _ in batch], ordered=False)
+        except BulkWriteError as e:
+            # Unordered: every other document in the batch was still applied
+            for error in e.details.get('writeErrors', []):
+                self._report(batch[error['index']][1], error.get('errmsg', 'write error'))
+        except Exception as e:
+            for _, context in batch:
+                self._report(context, str(e))
+
+    def _report(self, context: Any, message: str):
+        self.counters['errors'] += 1
+        self.recent_errors.append({'context': context, 'error': message})
+        logger.error(f"❌ Bulk write ({self.name}) failed for {context}: {message}")
+        if self.on_error:
+            self.on_error(context, message)
+
+    def stats(self) -> Dict:
+        return {
+            'buffered': len(self._buffer),
+            'max_batch': self.max_batch,
+            'max_delay': self.max_delay,
+            **self.counters,
+            'recent_errors': list(self.recent_errors)
+        }
@@ -0,0 +1,266 @@
+"""
+Shared Chain Client
+Every module talks to the chain through one pooled keep-alive HTTP session.
+JSON-RPC calls issued within the same batch window (e.g. concurrent
+run_web3 calls) are sent as a single JSON-RPC array, and latency is
+recorded per method. A comma-separated RPC URL becomes an endpoint pool
+behind an RpcRouter.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from web3 import Web3
+from web3._utils.encoding import Web3JsonEncoder
+from web3.providers.base import BaseProvider
+
+from rpc_router import RpcRouter
+from source_guard import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+CHAIN_POOL_SIZE = int(os.getenv("CHAIN_POOL_SIZE", "32"))             # keep-alive connections per host
+CHAIN_BATCH_WINDOW = float(os.getenv("CHAIN_BATCH_WINDOW", "0.002"))  # seconds to gather a batch
+CHAIN_MAX_BATCH = int(os.getenv("CHAIN_MAX_BATCH", "100"))
+CHAIN_TIMEOUT = float(os.getenv("CHAIN_TIMEOUT", "30"))
+
+# Answers that never change for an endpoint (web3 asks for the chain id on
+# most calls)
+IMMUTABLE_METHODS = {"eth_chainId", "net_version"}
+
+
+def _new_session(pool_size: int = CHAIN_POOL_SIZE) -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({"Content-Type": "application/json"})
+    return session
+
+
+class _PendingCall:
+    __slots__ = ("method", "params", "queued_at", "done", "response", "error")
+
+    def __init__(self, method: str, params: Any):
+        self.method = method
+        self.params = params
+        self.queued_at = time.perf_counter()
+        self.done = threading.Event()
+        self.response = None
+        self.error: Optional[Exception] = None
+
+
+class ChainClient:
+    """JSON-RPC client for one endpoint that batches calls made close together
+
+    A call made while no other is in flight is sent at once. Otherwise the
+    first call to arrive opens a batch and sends it after batch_window, or
+    as soon as the batch is full; calls arriving meanwhile ride along in the
+    same HTTP request.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        session: requests.Session = None,
+        batch_window: float = CHAIN_BATCH_WINDOW,
+        max_batch: int = CHAIN_MAX_BATCH,
+        timeout: float = CHAIN_TIMEOUT
+    ):
+        self.url = url
+        self.session = session or get_session()
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._filled = threading.Condition(self._lock)
+        self._active = 0  # calls between request() entry and their response
+        self._queue: List[_PendingCall] = []
+        self._immutable: Dict[str, Any] = {}
+        self._methods: Dict[str, Dict] = {}
+        self.counters = {'calls': 0, 'http_requests': 0, 'batched_calls': 0, 'cached': 0, 'errors': 0}
+
+    def request(self, method: str, params: Any) -> Dict:
+        """Send one call (possibly inside a batch) and return its JSON-RPC response"""
+        if method in self._immutable:
+            with self._lock:
+                self.counters['cached'] += 1
+            return self._immutable[method]
+
+        call = _PendingCall(method, params)
+        batch = None
+        with self._lock:
+            self.counters['calls'] += 1
+            self._active += 1
+            self._queue.append(call)
+            leader = len(self._queue) == 1
+            if len(self._queue) >= self.max_batch:
+                batch, self._queue = self._queue, []
+                self._filled.notify_all()
+            elif leader:
+                if self.batch_window > 0 and self._active > 1:
+                    # Other calls are in flight, so more are likely to follow:
+                    # gather them until the window ends or the batch fills
+                    deadline = time.monotonic() + self.batch_window
+                    while self._queue and self._queue[0] is call:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._filled.wait(remaining)
+                if self._queue and self._queue[0] is call:  # not already sent as a full batch
+                    batch, self._queue = self._queue, []
+
+        try:
+            if batch:
+                self._send(batch)
+            call.done.wait()
+        finally:
+            with self._lock:
+                self._active -= 1
+        if call.error is not None:
+            raise call.error
+        if method in IMMUTABLE_METHODS and 'result' in call.response:
+            self._immutable[method] = call.response
+        return call.response
+
+    def _count(self, **deltas):
+        with self._lock:
+            for name, delta in deltas.items():
+                self.counters[name] += delta
+
+    def _send(self, batch: List[_PendingCall]):
+        if len(batch) == 1:
+            payload = {"jsonrpc": "2.0", "id": 0, "method": batch[0].method, "params": batch[0].params}
+        else:
+            payload = [
+                {"jsonrpc": "2.0", "id": i, "method": call.method, "params": call.params}
+                for i, call in enumerate(batch)
+            ]
+
+        self._count(http_requests=1, batched_calls=len(batch) if len(batch) > 1 else 0)
+        try:
+            response = self.session.post(
+                self.url, data=json.dumps(payload, cls=Web3JsonEncoder), timeout=self.timeout
+            )
+            response.raise_for_status()
+            body = response.json()
+            if isinstance(body, dict) and len(batch) > 1:
+                raise ValueError(f"Batch rejected: {body.get('error', body)}")
+            replies = {0: body} if isinstance(body, dict) else {reply.get('id'): reply for reply in body}
+        except Exception as e:
+            self._count(errors=1)
+            for call in batch:
+                call.error = e
+                self._observe(call, error=True)
+                call.done.set()
+            return
+
+        for i, call in enumerate(batch):
+            reply = replies.get(i)
+            if reply is None:
+                call.error = ValueError(f"No response for {call.method} in batch")
+            else:
+                call.response = reply
+            self._observe(call, error=reply is None or 'error' in reply)
+            call.done.set()
+
+    def _observe(self, call: _PendingCall, error: bool):
+        with self._lock:
+            metrics = self._methods.get(call.method)
+            if metrics is None:
+                metrics = self._methods[call.method] = {'calls': 0, 'errors': 0, 'latency': LatencyHistogram()}
+            metrics['calls'] += 1
+            metrics['errors'] += int(error)
+            metrics['latency'].observe(time.perf_counter() - call.queued_at)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            methods = {
+                method: {'calls': m['calls'], 'errors': m['errors'], **m['latency'].snapshot()}
+                for method, m in self._methods.items()
+            }
+        batches = self.counters['http_requests']
+        return {
+            'url': self.url,
+            **self.counters,
+            'avg_calls_per_request': round(self.counters['calls'] / batches, 2) if batches else 0.0,
+            'methods': methods
+        }
+
+
+class ChainProvider(BaseProvider):
+    """web3 provider backed by a shared ChainClient or RpcRouter"""
+
+    def __init__(self, client):
+        super().__init__()
+        self.client = client
+
+    def make_request(self, method, params):
+        return self.client.request(method, params)
+
+    def is_connected(self, show_traceback: bool = False) -> bool:
+        try:
+            return 'result' in self.client.request("web3_clientVersion", [])
+        except Exception as e:
+            if show_traceback:
+                raise
+            logger.debug(f"RPC {self.client.url} unreachable: {e}")
+            return False
+
+
+_session: Optional[requests.Session] = None
+_clients: Dict[str, ChainClient] = {}
+_routers: Dict[str, RpcRouter] = {}
+_registry_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """The process-wide keep-alive session"""
+    global _session
+    with _registry_lock:
+        if _session is None:
+            _session = _new_session()
+        return _session
+
+
+def get_chain_client(url: str) -> ChainClient:
+    """Shared client per RPC URL"""
+    client = _clients.get(url)
+    if client is None:
+        session = get_session()
+        with _registry_lock:
+            client = _clients.setdefault(url, ChainClient(url, session=session))
+    return client
+
+
+def get_rpc(url: str):
+    """Shared client for a single URL, or a router over a comma-separated pool"""
+    urls = [u.strip() for u in url.split(",") if u.strip()]
+    if len(urls) == 1:
+        return get_chain_client(urls[0])
+
+    key = ",".join(urls)
+    router = _routers.get(key)
+    if router is None:
+        clients = [get_chain_client(u) for u in urls]
+        with _registry_lock:
+            router = _routers.setdefault(key, RpcRouter(clients))
+    return router
+
+
+def chain_web3(url: str) -> Web3:
+    """Web3 instance using the shared client (or endpoint pool) for url"""
+    return Web3(ChainProvider(get_rpc(url)))
+
+
+def chain_stats() -> Dict:
+    return {
+        'endpoints': {url: client.stats() for url, client in list(_clients.items())},
+        'routers': {key: router.stats() for key, router in list(_routers.items())}
+    }
@@ -4,11 +4,16 @@ Fetches user positions from Aave, Uniswap V3, Compound
 """
 
 from web3 import Web3
+from eth_abi import encode, decode
 from typing import Dict, List, Optional
 import os
 import json
+import time
 from datetime import datetime, timedelta
-from redis_cache import get_cache
+from chain_client import chain_web3
+from defi_snapshot import current_snapshot
+from position_cache import PositionCache, BackgroundRefresher, AaveInvalidationWatcher
+from uniswap_v3 import TokenPriceCache, position_amounts, pool_price
 
 # RPC URLs
 POLYGON_RPC = os.getenv("POLYGON_RPC_URL", "https://polygon-amoy.g.alchemy.com/v2/demo")
@@ -18,6 +23,15 @@ ETHEREUM_RPC = os.getenv("ETHEREUM_RPC_URL", "https://eth-mainnet.g.alchemy.com/
 AAVE_POOL_V3 = "0x794a61358D6845594F94dc1DB02A252b5b4814aD"
 UNISWAP_V3_POSITIONS = "0xC36442b4a4522E871399CD717aBDD847Ab11FE88"
 COMPOUND_COMPTROLLER = "0x3d9819210A31b4961b30EF54bE2aeD79B9c9Cd3B"
+UNISWAP_V3_FACTORY = "0x1F98431c8aD98523631AE4a59f267346ea31F984"
+AAVE_ORACLE = "0xb023e699F5a33916Ea823A16485e259257cA8Bd1"  # USD prices, 8 decimals
+MULTICALL3 = "0xcA11bde05977b3631167028862bE2a173976CA11"  # Same address on every chain
+
+# Calls packed into one Multicall3 aggregate3 request
+MULTICALL_BATCH = int(os.getenv("MULTICALL_BATCH", "500"))
+
+# Reuse the latest block number for this long (about one Polygon block)
+BLOCK_NUMBER_TTL = 2.0
 
 # ABIs (minimal)
 AAVE_POOL_ABI = [
@@ -37,6 +51,24 @@ AAVE_POOL_ABI = [
     }
 ]
 
+AGGREGATE3_SELECTOR = Web3.keccak(text="aggregate3((address,bool,bytes)[])")[:4]
+AAVE_ACCOUNT_SELECTOR = Web3.keccak(text="getUserAccountData(address)")[:4]
+AAVE_ACCOUNT_OUTPUTS = ["uint256"] * 6
+
+# Raw selectors/outputs for calls packed into multicalls
+BALANCE_OF_SELECTOR = Web3.keccak(text="balanceOf(address)")[:4]
+TOKEN_OF_OWNER_SELECTOR = Web3.keccak(text="tokenOfOwnerByIndex(address,uint256)")[:4]
+POSITIONS_SELECTOR = Web3.keccak(text="positions(uint256)")[:4]
+POSITION_OUTPUTS = [
+    "uint96", "address", "address", "address", "uint24", "int24", "int24",
+    "uint128", "uint256", "uint256", "uint128", "uint128"
+]
+GET_POOL_SELECTOR = Web3.keccak(text="getPool(address,address,uint24)")[:4]
+SLOT0_SELECTOR = Web3.keccak(text="slot0()")[:4]
+SLOT0_OUTPUTS = ["uint160", "int24", "uint16", "uint16", "uint16", "uint8", "bool"]
+DECIMALS_SELECTOR = Web3.keccak(text="decimals()")[:4]
+ASSET_PRICE_SELECTOR = Web3.keccak(text="getAssetPrice(address)")[:4]
+
 UNISWAP_POSITIONS_ABI = [
     {
         "inputs": [{"internalType": "address", "name": "owner", "type": "address"}],
@@ -64,10 +96,16 @@ UNISWAP_POSITIONS_ABI = [
 ]
 
 class DeFiIndexer:
-    def __init__(self, network: str = "polygon"):
+    def __init__(self, network: str = "polygon", w3: Web3 = None):
         self.network = network
         rpc_url = POLYGON_RPC if network == "polygon" else ETHEREUM_RPC
-        self.w3 = Web3(Web3.HTTPProvider(rpc_url))
+        self.w3 = w3 or chain_web3(rpc_url)
+        self.positions = PositionCache()
+        self.refresher = BackgroundRefresher()
+        self._block = (None, 0.0)  # (number, read at)
+        self.token_prices = TokenPriceCache()
+        self.token_decimals: Dict[str, int] = {}   # immutable, kept forever
+        self.pool_addresses: Dict[tuple, str] = {}  # (token0, token1, fee) -> pool
         
         # Initialize contracts
         try:
@@ -79,79 +117,306 @@ class DeFiIndexer:
                 address=Web3.to_checksum_address(UNISWAP_V3_POSITIONS),
                 abi=UNISWAP_POSITIONS_ABI
             )
+            self.multicall = Web3.to_checksum_address(MULTICALL3)
         except Exception as e:
             print(f"Warning: Could not initialize contracts: {e}")
             self.aave_pool = None
             self.uniswap_positions = None
+            self.multicall = None
+    
+    def _current_block(self) -> int:
+        """Latest block number, shared by reads within BLOCK_NUMBER_TTL"""
+        number, read_at = self._block
+        if number is None or time.monotonic() - read_at > BLOCK_NUMBER_TTL:
+            number = self.w3.eth.block_number
+            self._block = (number, time.monotonic())
+        return number
+    
+    def invalidation_watcher(self) -> AaveInvalidationWatcher:
+        """Watcher that invalidates cached positions on Aave position events"""
+        return AaveInvalidationWatcher(self.w3, AAVE_POOL_V3, self.positions)
     
     def get_aave_data(self, wallet_address: str) -> Dict:
-        """Fetch Aave V3 user data"""
-        # Check cache first
-        cache = get_cache()
-        cache_key = f"aave:{wallet_address}"
-        cached = cache.get(cache_key)
-        if cached:
-            return cached
+        """Fetch Aave V3 user data
+        
+        Served from the block-pinned position cache; stale entries are
+        returned immediately and refreshed in the background.
+        """
+        data, needs_refresh = self.positions.lookup("aave", wallet_address)
+        if data is not None:
+            if needs_refresh:
+                self.refresher.submit([f"aave:{wallet_address.lower()}"], self._refresh_aave, wallet_address)
+            return data
         
         try:
             if not self.aave_pool:
                 return self._mock_aave_data()
-            
-            address = Web3.to_checksum_address(wallet_address)
-            user_data = self.aave_pool.functions.getUserAccountData(address).call()
-            
-            total_collateral = user_data[0] / 1e8  # Base currency decimals
-            total_debt = user_data[1] / 1e8
-            available_borrow = user_data[2] / 1e8
-            health_factor = user_data[5] / 1e18
-            
-            return {
-                "protocol": "aave_v3",
-                "total_collateral_usd": total_collateral,
-                "total_debt_usd": total_debt,
-                "available_borrow_usd": available_borrow,
-                "health_factor": health_factor,
-                "ltv": user_data[4] / 100,  # LTV percentage
-                "liquidation_threshold": user_data[3] / 100,
-                "is_healthy": health_factor > 1.0,
-                "timestamp": datetime.now().isoformat()
-            }
-            
-            # Cache for 5 minutes
-            cache.set(cache_key, result, ttl=300)
-            return result
+            return self._refresh_aave(wallet_address)
         except Exception as e:
             print(f"Error fetching Aave data: {e}")
-            result = self._mock_aave_data()
-            cache.set(cache_key, result, ttl=60)  # Cache errors for 1 min
-            return result
+            return self._mock_aave_data()
+    
+    def _refresh_aave(self, wallet_address: str) -> Dict:
+        """Read the account at the current block and cache it pinned to that block"""
+        block = self._current_block()
+        address = Web3.to_checksum_address(wallet_address)
+        user_data = self.aave_pool.functions.getUserAccountData(address).call(block_identifier=block)
+        
+        result = self._parse_aave_account(user_data)
+        self.positions.store("aave", wallet_address, result, block)
+        return result
+    
+    def get_aave_data_many(self, wallet_addresses: List[str]) -> Dict[str, Dict]:
+        """Fetch Aave V3 user data for many wallets via Multicall3 aggregate3
+        
+        One RPC round trip per MULTICALL_BATCH uncached wallets; stale cache
+        entries are served and refreshed together in the background. A
+        reverted call, an invalid address or a failed batch only affects the
+        wallets concerned, which get the mock (empty) account data.
+        """
+        results = {}
+        pending = []
+        stale = []
+        
+        for wallet_address in dict.fromkeys(wallet_addresses):
+            if not self.aave_pool or not self.multicall or not Web3.is_address(wallet_address):
+                results[wallet_address] = self._mock_aave_data()
+                continue
+            data, needs_refresh = self.positions.lookup("aave", wallet_address)
+            if data is None:
+                pending.append(wallet_address)
+                continue
+            results[wallet_address] = data
+            if needs_refresh:
+                stale.append(wallet_address)
+        
+        if stale:
+            self.refresher.submit(
+                [f"aave:{wallet_address.lower()}" for wallet_address in stale],
+                self._refresh_aave_many, stale
+            )
+        
+        results.update(self._refresh_aave_many(pending))
+        return results
+    
+    def _refresh_aave_many(self, wallet_addresses: List[str]) -> Dict[str, Dict]:
+        """Multicall reads pinned to the current block; successes are cached"""
+        results = {}
+        if not wallet_addresses:
+            return results
+        
+        try:
+            block = self._current_block()
+        except Exception as e:
+            print(f"Error fetching block number: {e}")
+            return {wallet_address: self._mock_aave_data() for wallet_address in wallet_addresses}
+        
+        returns = self._multicall([
+            (self.aave_pool.address, AAVE_ACCOUNT_SELECTOR + encode(
+                ["address"], [Web3.to_checksum_address(wallet_address)]
+            ))
+            for wallet_address in wallet_addresses
+        ], block)
+        
+        for wallet_address, return_data in zip(wallet_addresses, returns):
+            try:
+                if return_data is None:
+                    raise ValueError("call failed")
+                result = self._parse_aave_account(decode(AAVE_ACCOUNT_OUTPUTS, return_data))
+                self.positions.store("aave", wallet_address, result, block)
+            except Exception as e:
+                print(f"Error decoding Aave data for {wallet_address}: {e}")
+                result = self._mock_aave_data()
+            results[wallet_address] = result
+        
+        return results
+    
+    def _multicall(self, calls: List[tuple], block: int) -> List[Optional[bytes]]:
+        """Run (target, calldata) calls through aggregate3, MULTICALL_BATCH per request
+        
+        Returns each call's return data, or None when the call reverted or
+        its whole batch failed.
+        """
+        results = []
+        for start in range(0, len(calls), MULTICALL_BATCH):
+            batch = calls[start:start + MULTICALL_BATCH]
+            try:
+                raw = self._eth_call(self.multicall, AGGREGATE3_SELECTOR + encode(
+                    ["(address,bool,bytes)[]"],
+                    [[(target, True, call_data) for target, call_data in batch]]
+                ), block)
+                (responses,) = decode(["(bool,bytes)[]"], raw)
+            except Exception as e:
+                print(f"Error in multicall batch ({len(batch)} calls): {e}")
+                results.extend([None] * len(batch))
+                continue
+            results.extend(data if success else None for success, data in responses)
+        return results
+    
+    def _eth_call(self, to: str, data: bytes, block: int) -> bytes:
+        """Raw eth_call pinned to block
+        
+        Sent straight to the provider: the web3 middleware stack would add
+        eth_chainId round trips to every call.
+        """
+        response = self.w3.provider.make_request('eth_call', [{'to': to, 'data': Web3.to_hex(data)}, hex(block)])
+        if response.get('error'):
+            raise ValueError(response['error'])
+        return bytes(Web3.to_bytes(hexstr=response['result']))
+    
+    @staticmethod
+    def _parse_aave_account(user_data) -> Dict:
+        """getUserAccountData output -> Aave summary"""
+        total_collateral = user_data[0] / 1e8  # Base currency decimals
+        total_debt = user_data[1] / 1e8
+        available_borrow = user_data[2] / 1e8
+        health_factor = user_data[5] / 1e18
+        
+        return {
+            "protocol": "aave_v3",
+            "total_collateral_usd": total_collateral,
+            "total_debt_usd": total_debt,
+            "available_borrow_usd": available_borrow,
+            "health_factor": health_factor,
+            "ltv": user_data[4] / 100,  # LTV percentage
+            "liquidation_threshold": user_data[3] / 100,
+            "is_healthy": health_factor > 1.0,
+            "timestamp": datetime.now().isoformat()
+        }
     
     def get_uniswap_data(self, wallet_address: str) -> Dict:
-        """Fetch Uniswap V3 positions"""
+        """Fetch and value Uniswap V3 positions (block-pinned cache, stale-while-revalidate)"""
+        data, needs_refresh = self.positions.lookup("uniswap", wallet_address)
+        if data is not None:
+            if needs_refresh:
+                self.refresher.submit([f"uniswap:{wallet_address.lower()}"], self._refresh_uniswap, wallet_address)
+            return data
+        
         try:
-            if not self.uniswap_positions:
+            if not self.uniswap_positions or not self.multicall:
                 return self._mock_uniswap_data()
-            
-            address = Web3.to_checksum_address(wallet_address)
-            balance = self.uniswap_positions.functions.balanceOf(address).call()
-            
-            total_liquidity = 0
-            positions = []
-            
-            # Note: In production, you'd need to track tokenIds
-            # For now, return basic data
-            
-            return {
-                "protocol": "uniswap_v3",
-                "positions_count": balance,
-                "total_liquidity_usd": total_liquidity,
-                "positions": positions,
-                "timestamp": datetime.now().isoformat()
-            }
+            return self._refresh_uniswap(wallet_address)
         except Exception as e:
             print(f"Error fetching Uniswap data: {e}")
             return self._mock_uniswap_data()
     
+    def _refresh_uniswap(self, wallet_address: str) -> Dict:
+        """Enumerate and value every position in a constant number of round trips
+        
+        balanceOf, then one multicall each for tokenOfOwnerByIndex and
+        positions, one for uncached pool addresses, and one for pool slot0,
+        new token decimals and token prices not yet cached for this block.
+        """
+        block = self._current_block()
+        owner = Web3.to_checksum_address(wallet_address)
+        manager = self.uniswap_positions.address
+        (count,) = decode(["uint256"], self._eth_call(manager, BALANCE_OF_SELECTOR + encode(["address"], [owner]), block))
+        
+        id_returns = self._multicall([
+            (manager, TOKEN_OF_OWNER_SELECTOR + encode(["address", "uint256"], [owner, index]))
+            for index in range(count)
+        ], block)
+        token_ids = [decode(["uint256"], data)[0] for data in id_returns if data is not None]
+        
+        position_returns = self._multicall([
+            (manager, POSITIONS_SELECTOR + encode(["uint256"], [token_id]))
+            for token_id in token_ids
+        ], block)
+        positions = []
+        for token_id, data in zip(token_ids, position_returns):
+            if data is None:
+                continue
+            fields = decode(POSITION_OUTPUTS, data)
+            positions.append({
+                "token_id": token_id,
+                "token0": Web3.to_checksum_address(fields[2]),
+                "token1": Web3.to_checksum_address(fields[3]),
+                "fee": fields[4],
+                "tick_lower": fields[5],
+                "tick_upper": fields[6],
+                "liquidity": fields[7]
+            })
+        active = [position for position in positions if position["liquidity"] > 0]
+        
+        pool_of = lambda p: self.pool_addresses.get((p["token0"], p["token1"], p["fee"]))
+        self._resolve_pools({(p["token0"], p["token1"], p["fee"]) for p in active}, block)
+        pools = list(dict.fromkeys(pool_of(p) for p in active if pool_of(p)))
+        tokens = list(dict.fromkeys(t for p in active for t in (p["token0"], p["token1"])))
+        prices, unpriced = self.token_prices.get_many(tokens, block)
+        new_tokens = [token for token in tokens if token not in self.token_decimals]
+        
+        returns = self._multicall(
+            [(pool, SLOT0_SELECTOR) for pool in pools] +
+            [(token, DECIMALS_SELECTOR) for token in new_tokens] +
+            [(AAVE_ORACLE, ASSET_PRICE_SELECTOR + encode(["address"], [token])) for token in unpriced],
+            block
+        )
+        slot0 = {}
+        for pool, data in zip(pools, returns[:len(pools)]):
+            if data is not None:
+                slot0[pool] = decode(SLOT0_OUTPUTS, data)
+        for token, data in zip(new_tokens, returns[len(pools):len(pools) + len(new_tokens)]):
+            self.token_decimals[token] = decode(["uint8"], data)[0] if data is not None else 18
+        fetched = {}
+        for token, data in zip(unpriced, returns[len(pools) + len(new_tokens):]):
+            price = decode(["uint256"], data)[0] / 1e8 if data is not None else 0
+            fetched[token] = price or None
+        
+        # Tokens the oracle doesn't list are priced through a pool against a listed one
+        prices.update(fetched)
+        for _ in range(2):
+            for p in active:
+                state = slot0.get(pool_of(p))
+                if state is None:
+                    continue
+                price = pool_price(state[0], self.token_decimals[p["token0"]], self.token_decimals[p["token1"]])
+                if prices.get(p["token0"]) is None and prices.get(p["token1"]) and price > 0:
+                    prices[p["token0"]] = fetched[p["token0"]] = price * prices[p["token1"]]
+                elif prices.get(p["token1"]) is None and prices.get(p["token0"]) and price > 0:
+                    prices[p["token1"]] = fetched[p["token1"]] = prices[p["token0"]] / price
+        self.token_prices.set_many(fetched, block)
+        
+        total_liquidity = 0.0
+        for p in positions:
+            p["amount0"] = p["amount1"] = p["value_usd"] = 0.0
+            p["in_range"] = False
+            state = slot0.get(pool_of(p))
+            if p["liquidity"] > 0 and state is not None:
+                raw0, raw1 = position_amounts(p["liquidity"], state[0], p["tick_lower"], p["tick_upper"])
+                p["amount0"] = raw0 / 10 ** self.token_decimals[p["token0"]]
+                p["amount1"] = raw1 / 10 ** self.token_decimals[p["token1"]]
+                p["value_usd"] = (
+                    p["amount0"] * (prices.get(p["token0"]) or 0) +
+                    p["amount1"] * (prices.get(p["token1"]) or 0)
+                )
+                p["in_range"] = p["tick_lower"] <= state[1] < p["tick_upper"]
+            p["liquidity"] = str(p["liquidity"])  # uint128 does not fit a JSON number
+            total_liquidity += p["value_usd"]
+        
+        result = {
+            "protocol": "uniswap_v3",
+            "positions_count": count,
+            "active_positions": len(active),
+            "total_liquidity_usd": round(total_liquidity, 2),
+            "positions": positions,
+            "unpriced_tokens": [token for token in tokens if not prices.get(token)],
+            "block": block,
+            "timestamp": datetime.now().isoformat()
+        }
+        self.positions.store("uniswap", wallet_address, result, block)
+        return result
+    
+    def _resolve_pools(self, keys: set, block: int):
+        """Look up pool addresses not cached yet (they never change)"""
+        missing = [key for key in keys if key not in self.pool_addresses]
+        returns = self._multicall([
+            (UNISWAP_V3_FACTORY, GET_POOL_SELECTOR + encode(["address", "address", "uint24"], list(key)))
+            for key in missing
+        ], block)
+        for key, data in zip(missing, returns):
+            if data is not None:
+                self.pool_addresses[key] = Web3.to_checksum_address(decode(["address"], data)[0])
+    
     def get_compound_data(self, wallet_address: str) -> Dict:
         """Fetch Compound data"""
         # Compound is primarily on Ethereum mainnet
@@ -160,7 +425,10 @@ class DeFiIndexer:
     
     def get_all_defi_data(self, wallet_address: str) -> Dict:
         """Aggregate all DeFi protocol data"""
-        aave = self.get_aave_data(wallet_address)
+        snapshot = current_snapshot()
+        aave = snapshot.aave(wallet_address) if snapshot is not None else None
+        if aave is None:
+            aave = self.get_aave_data(wallet_address)
         uniswap = self.get_uniswap_data(wallet_address)
         compound = self.get_compound_data(wallet_address)
         
@@ -248,14 +516,18 @@ def get_defi_indexer(network: str = "polygon") -> DeFiIndexer:
 
 # Convenience functions
 def fetch_defi_data(wallet_address: str, network: str = "polygon") -> Dict:
-    """Fetch all DeFi data for a wallet"""
+    """Fetch all DeFi data for a wallet (once per open defi_snapshot scope)"""
     indexer = get_defi_indexer(network)
-    return indexer.get_all_defi_data(wallet_address)
+    snapshot = current_snapshot()
+    if snapshot is None:
+        return indexer.get_all_defi_data(wallet_address)
+    return snapshot.get(wallet_address, lambda: indexer.get_all_defi_data(wallet_address))
 
 
-def get_defi_risk_score(wallet_address: str) -> float:
-    """Calculate DeFi risk score (0-100)"""
-    data = fetch_defi_data(wallet_address)
+def get_defi_risk_score(wallet_address: str, data: Dict = None) -> float:
+    """Calculate DeFi risk score (0-100), from data when already fetched"""
+    if data is None:
+        data = fetch_defi_data(wallet_address)
     summary = data.get("summary", {})
     
     # Risk factors
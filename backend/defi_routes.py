@@ -6,6 +6,9 @@ Real-time DeFi protocol data endpoints
 from fastapi import APIRouter, HTTPException
 from typing import Dict
 from defi_indexer import fetch_defi_data, get_defi_risk_score, get_defi_indexer
+from chain_client import chain_stats
+from defi_snapshot import snapshot_stats
+from web3_pool import run_web3, pool_stats
 
 router = APIRouter()
 
@@ -14,7 +17,7 @@ router = APIRouter()
 async def get_defi_data(wallet_address: str) -> Dict:
     """Get all DeFi protocol data for a wallet"""
     try:
-        data = fetch_defi_data(wallet_address)
+        data = await run_web3(fetch_defi_data, wallet_address)
         return {
             "success": True,
             "data": data
@@ -28,7 +31,7 @@ async def get_aave_data(wallet_address: str) -> Dict:
     """Get Aave protocol data"""
     try:
         indexer = get_defi_indexer()
-        data = indexer.get_aave_data(wallet_address)
+        data = await run_web3(indexer.get_aave_data, wallet_address)
         return {
             "success": True,
             "data": data
@@ -42,7 +45,7 @@ async def get_uniswap_data(wallet_address: str) -> Dict:
     """Get Uniswap V3 positions"""
     try:
         indexer = get_defi_indexer()
-        data = indexer.get_uniswap_data(wallet_address)
+        data = await run_web3(indexer.get_uniswap_data, wallet_address)
         return {
             "success": True,
             "data": data
@@ -55,7 +58,7 @@ async def get_uniswap_data(wallet_address: str) -> Dict:
 async def get_defi_risk(wallet_address: str) -> Dict:
     """Get DeFi risk score"""
     try:
-        risk_score = get_defi_risk_score(wallet_address)
+        risk_score = await run_web3(get_defi_risk_score, wallet_address)
         return {
             "success": True,
             "wallet_address": wallet_address,
@@ -71,7 +74,7 @@ async def health_check() -> Dict:
     """Health check for DeFi indexer"""
     try:
         indexer = get_defi_indexer()
-        is_connected = indexer.w3.is_connected() if indexer.w3 else False
+        is_connected = await run_web3(indexer.w3.is_connected) if indexer.w3 else False
         
         from redis_cache import get_cache
         cache = get_cache()
@@ -81,7 +84,11 @@ async def health_check() -> Dict:
             "status": "healthy" if is_connected else "degraded",
             "network": indexer.network,
             "rpc_connected": is_connected,
-            "cache_enabled": cache.enabled
+            "cache_enabled": cache.enabled,
+            "position_cache": indexer.positions.stats(),
+            "snapshots": snapshot_stats(),
+            "rpc": chain_stats(),
+            "web3_pool": pool_stats()
         }
     except Exception as e:
         return {
@@ -0,0 +1,98 @@
+"""
+DeFi Snapshot Scope
+One assessment (an API request or an oracle collection for a wallet) reads
+each wallet's DeFi positions once; every consumer inside the scope —
+onchain_service, get_defi_risk_score, the AI models — shares that snapshot.
+"""
+
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional
+
+_current: ContextVar[Optional["DefiSnapshot"]] = ContextVar("defi_snapshot", default=None)
+_counters = {'scopes': 0, 'fetches': 0, 'reused': 0, 'protocol_reads_saved': 0}
+_counters_lock = threading.Lock()
+
+
+def _count(**deltas):
+    with _counters_lock:
+        for name, delta in deltas.items():
+            _counters[name] += delta
+
+
+class DefiSnapshot:
+    """Per-scope wallet -> DeFi data memo; concurrent readers share one fetch
+
+    aave holds Aave accounts already read for the scope's wallets (e.g. a
+    batched multicall by the oracle), used instead of a per-wallet read.
+    """
+
+    def __init__(self, aave: Dict[str, Dict] = None):
+        self._lock = threading.Lock()
+        self._data: Dict[str, Dict] = {}
+        self._pending: Dict[str, threading.Event] = {}
+        self._aave = {wallet.lower(): data for wallet, data in (aave or {}).items()}
+
+    def aave(self, wallet_address: str) -> Optional[Dict]:
+        """Prefetched Aave account for the wallet, if any"""
+        return self._aave.get(wallet_address.lower())
+
+    def get(self, wallet_address: str, fetch: Callable[[], Dict]) -> Dict:
+        key = wallet_address.lower()
+        while True:
+            with self._lock:
+                if key in self._data:
+                    data = self._data[key]
+                    _count(reused=1, protocol_reads_saved=len(data.get('protocols', {})))
+                    return data
+                pending = self._pending.get(key)
+                if pending is None:
+                    pending = self._pending[key] = threading.Event()
+                    break
+            pending.wait()  # another reader is fetching; a failed fetch is retried
+
+        try:
+            data = fetch()
+            with self._lock:
+                self._data[key] = data
+            _count(fetches=1)
+            return data
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+            pending.set()
+
+
+def current_snapshot() -> Optional[DefiSnapshot]:
+    return _current.get()
+
+
+@contextmanager
+def defi_snapshot(aave: Dict[str, Dict] = None):
+    """Open a snapshot scope; nested scopes share the outermost snapshot
+
+    The scope follows the context into tasks created inside it and into
+    run_web3 threads. aave seeds prefetched Aave accounts (outermost scope only).
+    """
+    snapshot = _current.get()
+    if snapshot is not None:
+        yield snapshot
+        return
+
+    snapshot = DefiSnapshot(aave)
+    token = _current.set(snapshot)
+    _count(scopes=1)
+    try:
+        yield snapshot
+    finally:
+        _current.reset(token)
+
+
+def snapshot_stats() -> Dict:
+    with _counters_lock:
+        requested = _counters['fetches'] + _counters['reused']
+        return {
+            **_counters,
+            'reuse_rate': round(_counters['reused'] / requested, 4) if requested else 0.0
+        }
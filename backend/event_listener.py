@@ -3,13 +3,14 @@ Event Listener & ETL Pipeline
 Listens to blockchain events and processes them through ETL pipeline
 """
 
-from web3 import Web3
 from typing import Dict, Callable
 import asyncio
 import logging
 from message_queue import MessageQueue, EventType
 from feature_store import feature_store
 from reputation_engine import reputation_engine
+from chain_client import chain_web3
+from web3_pool import run_web3
 
 logger = logging.getLogger(__name__)
 
@@ -17,7 +18,7 @@ class EventListener:
     """Listen to blockchain events and trigger ETL pipeline"""
     
     def __init__(self, rpc_url: str, contracts: Dict[str, Dict]):
-        self.w3 = Web3(Web3.HTTPProvider(rpc_url))
+        self.w3 = chain_web3(rpc_url)
         self.contracts = contracts
         self.handlers = {}
     
@@ -30,17 +31,25 @@ class EventListener:
         logger.info("Starting event listener...")
         
         # Create event filters
-        badge_filter = self.contracts['badge']['contract'].events.BadgeMinted.create_filter(fromBlock='latest')
-        passport_filter = self.contracts['passport']['contract'].events.PassportIssued.create_filter(fromBlock='latest')
+        badge_filter, passport_filter = await asyncio.gather(
+            run_web3(self.contracts['badge']['contract'].events.BadgeMinted.create_filter, fromBlock='latest'),
+            run_web3(self.contracts['passport']['contract'].events.PassportIssued.create_filter, fromBlock='latest')
+        )
         
         while True:
             try:
+                # Poll both filters together (one JSON-RPC batch)
+                badge_events, passport_events = await asyncio.gather(
+                    run_web3(badge_filter.get_new_entries),
+                    run_web3(passport_filter.get_new_entries)
+                )
+                
                 # Check for new badge events
-                for event in badge_filter.get_new_entries():
+                for event in badge_events:
                     await self._handle_badge_minted(event)
                 
                 # Check for new passport events
-                for event in passport_filter.get_new_entries():
+                for event in passport_events:
                     await self._handle_passport_issued(event)
                 
                 await asyncio.sleep(2)  # Poll every 2 seconds
@@ -9,6 +9,7 @@ from web3 import Web3
 import os
 import sys
 
+from chain_client import chain_web3
 from event_listener import EventListener
 from db_helper import get_db
 
@@ -53,7 +54,7 @@ async def main():
     
     # Setup
     rpc_url = os.getenv("POLYGON_RPC_URL", "https://rpc-amoy.polygon.technology")
-    w3 = Web3(Web3.HTTPProvider(rpc_url))
+    w3 = chain_web3(rpc_url)
     
     if not w3.is_connected():
         logger.error("Failed to connect to blockchain")
@@ -0,0 +1,164 @@
+"""
+EIP-1559 Fee Oracle
+Samples eth_feeHistory about once per block and turns it into
+maxFeePerGas / maxPriorityFeePerGas for each urgency tier. Transaction
+builders read the cached answer, so pricing a transaction costs no RPC
+call; the sample is refreshed in the background (or inline, at most once
+per refresh interval, when no background loop runs).
+"""
+
+import asyncio
+import logging
+import os
+import statistics
+import threading
+import time
+from typing import Dict, Optional
+
+from web3_pool import run_web3
+
+logger = logging.getLogger(__name__)
+
+GWEI = 10 ** 9
+FEE_REFRESH_INTERVAL = float(os.getenv("FEE_REFRESH_INTERVAL", "2.0"))  # ~ one Polygon block
+FEE_MAX_AGE = float(os.getenv("FEE_MAX_AGE", "30"))          # re-sample inline when older than this
+FEE_HISTORY_BLOCKS = int(os.getenv("FEE_HISTORY_BLOCKS", "20"))
+FEE_MIN_PRIORITY_GWEI = float(os.getenv("FEE_MIN_PRIORITY_GWEI", "30"))  # Polygon enforces a 25 gwei minimum tip
+FEE_MAX_GWEI = float(os.getenv("FEE_MAX_GWEI", "1000"))      # never bid more than this
+FEE_FALLBACK_GWEI = float(os.getenv("FEE_FALLBACK_GWEI", "100"))  # max fee before the first sample
+
+# Urgency tier -> (priority fee percentile of recent blocks, base fee multiplier).
+# The base fee can rise 12.5% per full block; 2x covers about six in a row.
+URGENCY_TIERS = {
+    'low': (10, 1.25),
+    'standard': (50, 2.0),
+    'high': (90, 3.0),
+}
+DEFAULT_URGENCY = 'standard'
+PERCENTILES = sorted({percentile for percentile, _ in URGENCY_TIERS.values()})
+
+
+class FeeOracle:
+    """Cached EIP-1559 fee suggestions for one chain"""
+
+    def __init__(
+        self,
+        w3,
+        refresh_interval: float = FEE_REFRESH_INTERVAL,
+        max_age: float = FEE_MAX_AGE,
+        history_blocks: int = FEE_HISTORY_BLOCKS,
+        min_priority: int = int(FEE_MIN_PRIORITY_GWEI * GWEI),
+        max_fee: int = int(FEE_MAX_GWEI * GWEI),
+        clock=time.monotonic
+    ):
+        self.w3 = w3
+        self.refresh_interval = refresh_interval
+        self.max_age = max_age
+        self.history_blocks = history_blocks
+        self.min_priority = min_priority
+        self.max_fee = max_fee
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._failed_at: Optional[float] = None
+        self._fees: Optional[Dict[str, Dict[str, int]]] = None
+        self._sampled_at: Optional[float] = None
+        self.block: Optional[int] = None
+        self.base_fee: Optional[int] = None
+        self.running = False
+        self._task: Optional[asyncio.Task] = None
+        self.counters = {'samples': 0, 'new_blocks': 0, 'sample_errors': 0, 'served': 0, 'fallbacks': 0}
+
+    async def start(self):
+        """Keep the sample fresh in the background"""
+        self.running = True
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"⛽ Fee oracle started (every {self.refresh_interval}s)")
+
+    async def stop(self):
+        self.running = False
+        if self._task:
+            self._task.cancel()
+
+    async def _run(self):
+        while self.running:
+            try:
+                await run_web3(self.refresh)
+            except Exception as e:
+                logger.warning(f"⚠️ Fee history sample failed: {e}")
+            await asyncio.sleep(self.refresh_interval)
+
+    def refresh(self):
+        """Sample eth_feeHistory; tiers are recomputed only when a new block arrived"""
+        try:
+            history = self.w3.eth.fee_history(self.history_blocks, 'latest', PERCENTILES)
+        except Exception:
+            with self._lock:
+                self.counters['sample_errors'] += 1
+            raise
+
+        newest = history['oldestBlock'] + len(history['gasUsedRatio']) - 1
+        with self._lock:
+            self.counters['samples'] += 1
+            self._sampled_at = self.clock()
+            if newest == self.block and self._fees is not None:
+                return
+            self.block = newest
+            self.base_fee = history['baseFeePerGas'][-1]  # the next block's base fee
+            self._fees = {
+                tier: self._tier_fees(history, PERCENTILES.index(percentile), multiplier)
+                for tier, (percentile, multiplier) in URGENCY_TIERS.items()
+            }
+            self.counters['new_blocks'] += 1
+
+    def _tier_fees(self, history, column: int, multiplier: float) -> Dict[str, int]:
+        # Empty blocks report a zero tip, which says nothing about what gets included
+        rewards = [
+            reward[column]
+            for reward, ratio in zip(history.get('reward') or [], history['gasUsedRatio'])
+            if ratio > 0
+        ]
+        priority = max(self.min_priority, int(statistics.median(rewards)) if rewards else 0)
+        max_fee = min(self.max_fee, int(self.base_fee * multiplier) + priority)
+        return {'maxFeePerGas': max_fee, 'maxPriorityFeePerGas': min(priority, max_fee)}
+
+    def _needs_sample(self) -> bool:
+        now = self.clock()
+        if self._failed_at is not None and now - self._failed_at < self.refresh_interval:
+            return False  # don't retry a failing node on every transaction
+        return self._sampled_at is None or now - self._sampled_at > self.max_age
+
+    def fees(self, urgency: str = DEFAULT_URGENCY) -> Dict[str, int]:
+        """maxFeePerGas / maxPriorityFeePerGas for a transaction (blocking only when the sample is stale)"""
+        if urgency not in URGENCY_TIERS:
+            raise ValueError(f"Unknown urgency {urgency!r}, expected one of {sorted(URGENCY_TIERS)}")
+
+        if self._needs_sample():
+            with self._refresh_lock:
+                if self._needs_sample():  # another thread may have just sampled
+                    try:
+                        self.refresh()
+                    except Exception as e:
+                        self._failed_at = self.clock()
+                        logger.warning(f"⚠️ Fee history unavailable: {e}")
+
+        with self._lock:
+            self.counters['served'] += 1
+            if self._fees is None:
+                self.counters['fallbacks'] += 1
+                return {'maxFeePerGas': int(FEE_FALLBACK_GWEI * GWEI), 'maxPriorityFeePerGas': self.min_priority}
+            return dict(self._fees[urgency])
+
+    def stats(self) -> Dict:
+        with self._lock:
+            fees = {
+                tier: {field: round(value / GWEI, 3) for field, value in tier_fees.items()}
+                for tier, tier_fees in (self._fees or {}).items()
+            }
+            return {
+                'block': self.block,
+                'base_fee_gwei': round(self.base_fee / GWEI, 3) if self.base_fee is not None else None,
+                'sample_age_s': round(self.clock() - self._sampled_at, 1) if self._sampled_at is not None else None,
+                'tiers_gwei': fees,
+                **self.counters
+            }
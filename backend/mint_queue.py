@@ -0,0 +1,200 @@
+"""
+Batched Badge Mint Queue
+Mint requests arriving within a short window are issued together through
+SimpleZKBadge.issueBadgeBatch: one transaction, one nonce and one base
+transaction cost for up to MINT_BATCH_MAX badges. Badges that fail inside
+a mined batch (or every badge of a batch that reverted) are retried as
+individual issueBadge transactions on the same contract.
+"""
+
+import asyncio
+import logging
+import os
+from typing import Dict, List, Optional, Tuple
+
+from hexbytes import HexBytes
+from web3 import Web3
+
+logger = logging.getLogger(__name__)
+
+# SimpleZKBadge deployment that has issueBadgeBatch; unset = mint one by one
+BATCH_CONTRACT = os.getenv("BATCH_BADGE_CONTRACT", "")
+MINT_BATCH_WINDOW = float(os.getenv("MINT_BATCH_WINDOW", "0.5"))  # seconds to gather a batch
+MINT_BATCH_MAX = int(os.getenv("MINT_BATCH_MAX", "50"))
+MINT_BATCH_BASE_GAS = int(os.getenv("MINT_BATCH_BASE_GAS", "60000"))
+MINT_BATCH_ITEM_GAS = int(os.getenv("MINT_BATCH_ITEM_GAS", "250000"))
+
+BADGE_ISSUE_FAILED_TOPIC = Web3.keccak(text="BadgeIssueFailed(uint256,address,bytes)")
+
+
+class QueuedMint:
+    __slots__ = ('recipient', 'badge_type', 'zk_proof_hash', 'future')
+
+    def __init__(self, recipient: str, badge_type: str, zk_proof_hash: str, future: asyncio.Future):
+        self.recipient = recipient
+        self.badge_type = badge_type
+        self.zk_proof_hash = zk_proof_hash
+        self.future = future
+
+    @property
+    def args(self) -> Tuple[str, str, str]:
+        return self.recipient, self.badge_type, self.zk_proof_hash
+
+
+def failed_indices(receipt, contract: str) -> List[int]:
+    """Batch positions reported by BadgeIssueFailed events in a receipt"""
+    failed = []
+    for log in receipt.get('logs') or []:
+        topics = [HexBytes(t) for t in log.get('topics') or []]
+        if (
+            len(topics) > 1
+            and topics[0] == BADGE_ISSUE_FAILED_TOPIC
+            and str(log.get('address', '')).lower() == contract.lower()
+        ):
+            failed.append(int.from_bytes(topics[1], 'big'))
+    return failed
+
+
+class MintQueue:
+    """Collects mint requests and broadcasts them as batch transactions"""
+
+    def __init__(
+        self,
+        chain,
+        contract: str = BATCH_CONTRACT,
+        window: float = MINT_BATCH_WINDOW,
+        max_batch: int = MINT_BATCH_MAX
+    ):
+        self.chain = chain  # PolygonIntegration
+        self.contract = contract
+        self.window = window
+        self.max_batch = max_batch
+        self._queue: List[QueuedMint] = []
+        self.batches: Dict[str, List[QueuedMint]] = {}  # broadcast batch tx hash -> its mints
+        self.gas: Dict[int, Dict[str, int]] = {}        # batch size -> gas totals of mined mints
+        self.counters = {'queued': 0, 'batches': 0, 'single': 0, 'item_failures': 0, 'retried': 0}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.contract)
+
+    async def submit(self, recipient: str, badge_type: str, zk_proof_hash: str) -> Tuple[str, Optional[int]]:
+        """Queue a mint; returns its tx hash and position in the batch once broadcast
+
+        The position is None when the mint went out as its own issueBadge
+        transaction.
+        """
+        if not self.enabled:
+            self.counters['single'] += 1
+            return Web3.to_hex(await self.chain.submit_badge_mint(recipient, badge_type, zk_proof_hash)), None
+
+        mint = QueuedMint(recipient, badge_type, zk_proof_hash, asyncio.get_running_loop().create_future())
+        self._queue.append(mint)
+        self.counters['queued'] += 1
+        if len(self._queue) >= self.max_batch:
+            asyncio.create_task(self.flush())
+        elif len(self._queue) == 1:
+            asyncio.create_task(self._flush_after(self.window))
+        return await mint.future
+
+    async def _flush_after(self, delay: float):
+        await asyncio.sleep(delay)
+        await self.flush()
+
+    async def flush(self):
+        """Broadcast everything queued (up to max_batch per transaction)"""
+        while self._queue:
+            batch, self._queue = self._queue[:self.max_batch], self._queue[self.max_batch:]
+            await self._broadcast(batch)
+
+    async def _broadcast(self, batch: List[QueuedMint]):
+        try:
+            if len(batch) == 1:
+                # A lone mint is cheaper without the batch call overhead
+                tx_hash = Web3.to_hex(await self._submit_single(batch[0]))
+                self.counters['single'] += 1
+                batch[0].future.set_result((tx_hash, None))
+                return
+
+            tx_hash = Web3.to_hex(await self.chain.submit_badge_batch(
+                self.contract,
+                [mint.args for mint in batch],
+                gas=MINT_BATCH_BASE_GAS + MINT_BATCH_ITEM_GAS * len(batch)
+            ))
+        except Exception as e:
+            logger.error(f"❌ Mint broadcast failed ({len(batch)} badges): {e}")
+            for mint in batch:
+                if not mint.future.done():
+                    mint.future.set_exception(e)
+            return
+
+        self.batches[tx_hash] = batch
+        self.counters['batches'] += 1
+        logger.info(f"📦 Broadcast batch of {len(batch)} badge mints: {tx_hash}")
+        for index, mint in enumerate(batch):
+            mint.future.set_result((tx_hash, index))
+
+    async def _submit_single(self, mint: QueuedMint):
+        """issueBadge on the batch contract, so every badge lands in the same deployment"""
+        return await self.chain.submit_badge_mint(*mint.args, contract_address=self.contract)
+
+    async def settle(self, tx_hash: str, receipt) -> Dict[int, Optional[str]]:
+        """Handle a mined mint; returns failed batch positions and their retry tx hash
+
+        A failed position maps to None when it could not be retried (the
+        batch was broadcast by an earlier process, or the retry failed).
+        """
+        batch = self.batches.pop(tx_hash, None)
+        size = len(batch) if batch else 1
+        failed = failed_indices(receipt, self.contract) if self.enabled else []
+        if receipt['status'] == 1:
+            totals = self.gas.setdefault(size, {'gas_used': 0, 'badges': 0})
+            totals['gas_used'] += receipt['gasUsed']
+            totals['badges'] += size - len(failed)
+        elif batch:
+            failed = list(range(size))  # the whole batch reverted
+
+        if not failed:
+            return {}
+        self.counters['item_failures'] += len(failed)
+        if batch is None:
+            logger.warning(f"⚠️ {len(failed)} badges failed in batch {tx_hash}, mints unknown to this process")
+            return {index: None for index in failed}
+
+        logger.warning(f"🔁 Retrying {len(failed)} of {size} badges from batch {tx_hash} individually")
+        retries = await asyncio.gather(
+            *[self._submit_single(batch[index]) for index in failed],
+            return_exceptions=True
+        )
+        result = {}
+        for index, retry in zip(failed, retries):
+            if isinstance(retry, Exception):
+                logger.error(f"❌ Retry of badge {index} from {tx_hash} failed: {retry}")
+                result[index] = None
+            else:
+                self.counters['retried'] += 1
+                result[index] = Web3.to_hex(retry)
+        return result
+
+    def stats(self) -> Dict:
+        return {
+            'enabled': self.enabled,
+            'queued_now': len(self._queue),
+            'in_flight_batches': len(self.batches),
+            **self.counters,
+            'gas_per_badge': {
+                size: round(t['gas_used'] / t['badges']) if t['badges'] else None
+                for size, t in sorted(self.gas.items())
+            }
+        }
+
+
+mint_queue = None
+
+def get_mint_queue() -> MintQueue:
+    """Get or create the mint queue"""
+    global mint_queue
+    if mint_queue is None:
+        from blockchain import polygon_integration
+        mint_queue = MintQueue(polygon_integration)
+    return mint_queue
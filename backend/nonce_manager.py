@@ -0,0 +1,393 @@
+"""
+Nonce Manager
+Hands out nonces for the backend wallet without a get_transaction_count
+per transaction, so many transactions can be in flight at once. Resyncs
+from the chain after nonce errors and re-sends transactions stuck in the
+mempool with bumped fees under the same nonce (at least the current
+market fees when a reprice source is given).
+
+The next-nonce counter lives in Redis (NONCE_STORE=redis, the default), so
+several processes can send from the same key (uvicorn --workers N). With
+NONCE_STORE=local it is kept in memory, which is only safe for a single
+sending process. Transactions are refused while Redis is unreachable
+rather than falling back to a per-process counter.
+"""
+
+import contextlib
+
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from hexbytes import HexBytes
+from redis.exceptions import RedisError
+from web3.exceptions import Web3RPCError
+
+logger = logging.getLogger(__name__)
+
+STUCK_AFTER = float(os.getenv("NONCE_STUCK_AFTER", "90"))       # seconds pending before replacing
+FEE_BUMP = float(os.getenv("NONCE_FEE_BUMP", "1.125"))           # nodes require >= 10% to replace
+MAX_REPLACEMENTS = int(os.getenv("NONCE_MAX_REPLACEMENTS", "5"))
+SEND_ATTEMPTS = 3
+
+FEE_FIELDS = ('gasPrice', 'maxFeePerGas', 'maxPriorityFeePerGas')
+NONCE_STORE = os.getenv("NONCE_STORE", "redis")  # "local" only when a single process sends
+NONCE_NAMESPACE = os.getenv("NONCE_NAMESPACE", "polygon")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+# Node errors on broadcast, by what they mean for the nonce
+NONCE_TOO_LOW = ('nonce too low', 'nonce has already been used', 'already been used')
+# A different transaction already holds the nonce in the mempool
+NONCE_TAKEN = ('replacement transaction underpriced', 'replacement fee too low')
+# This very transaction was broadcast before (e.g. a lost response): idempotent
+ALREADY_KNOWN = ('already known', 'known transaction', 'already imported')
+
+
+def _matches(error: Exception, texts) -> bool:
+    message = str(error).lower()
+    return any(text in message for text in texts)
+
+
+def _rejected(error: Exception) -> bool:
+    """The node answered with an error, so the transaction is not in its mempool
+
+    Anything else (timeouts, dropped connections) leaves the outcome unknown.
+    """
+    return isinstance(error, (Web3RPCError, ValueError))
+
+
+class PendingTx:
+    """A nonce's transaction and every hash broadcast for it"""
+
+    __slots__ = ('nonce', 'tx', 'hashes', 'sent_at', 'replacements')
+
+    def __init__(self, nonce: int, tx: Dict, tx_hash: HexBytes, sent_at: float):
+        self.nonce = nonce
+        self.tx = tx
+        self.hashes = [tx_hash]
+        self.sent_at = sent_at
+        self.replacements = 0
+
+
+class NonceStoreUnavailable(RuntimeError):
+    """The shared nonce counter cannot be reached; nothing may be sent"""
+
+
+class LocalNonceStore:
+    """Next nonce held in memory: correct only while one process sends from the address"""
+
+    def __init__(self):
+        self._next: Optional[int] = None
+
+    def allocate(self, chain_next: Callable[[], int]) -> int:
+        if self._next is None:
+            self._next = chain_next()
+        nonce = self._next
+        self._next += 1
+        return nonce
+
+    def advance(self, next_nonce: int):
+        """Skip nonces known to be used (never moves backwards)"""
+        if self._next is None or self._next < next_nonce:
+            self._next = next_nonce
+
+    def reset(self, next_nonce: int):
+        self._next = next_nonce
+
+    def release(self, nonce: int):
+        """Give back a nonce whose transaction never reached the mempool"""
+        if self._next == nonce + 1:
+            self._next = nonce
+        else:
+            # Later nonces are out: let the node tell us where the gap is
+            self._next = None
+
+    def peek(self) -> Optional[int]:
+        return self._next
+
+
+class RedisNonceStore:
+    """Next nonce shared through Redis by every process sending from the address
+
+    Each operation is a single Lua script, so allocations from different
+    processes never hand out the same nonce.
+    """
+
+    ALLOCATE = """
+        local n = redis.call('GET', KEYS[1])
+        if not n then return -1 end
+        redis.call('SET', KEYS[1], tonumber(n) + 1)
+        return tonumber(n)
+    """
+    ADVANCE = """
+        local n = tonumber(redis.call('GET', KEYS[1]) or '-1')
+        if n < tonumber(ARGV[1]) then redis.call('SET', KEYS[1], ARGV[1]) end
+        return 1
+    """
+    RELEASE = """
+        if tonumber(redis.call('GET', KEYS[1]) or '-1') == tonumber(ARGV[1]) + 1 then
+            redis.call('SET', KEYS[1], ARGV[1])
+        else
+            redis.call('DEL', KEYS[1])
+        end
+        return 1
+    """
+
+    def __init__(self, client, key: str):
+        self.client = client  # redis.Redis; connects on first command
+        self.key = key
+        self._allocate = client.register_script(self.ALLOCATE)
+        self._advance = client.register_script(self.ADVANCE)
+        self._release = client.register_script(self.RELEASE)
+
+    @contextlib.contextmanager
+    def _available(self):
+        try:
+            yield
+        except RedisError as e:
+            raise NonceStoreUnavailable(
+                f"Redis nonce store unreachable, refusing to send ({e}); "
+                f"NONCE_STORE=local is only safe with a single sending process"
+            ) from e
+
+    def allocate(self, chain_next: Callable[[], int]) -> int:
+        with self._available():
+            nonce = self._allocate(keys=[self.key])
+            if nonce < 0:
+                # First sender (or after a release gap): seed from the chain unless another process just did
+                self.client.set(self.key, chain_next(), nx=True)
+                nonce = self._allocate(keys=[self.key])
+        return int(nonce)
+
+    def advance(self, next_nonce: int):
+        with self._available():
+            self._advance(keys=[self.key], args=[next_nonce])
+
+    def reset(self, next_nonce: int):
+        with self._available():
+            self.client.set(self.key, next_nonce)
+
+    def release(self, nonce: int):
+        with self._available():
+            self._release(keys=[self.key], args=[nonce])
+
+    def peek(self) -> Optional[int]:
+        with self._available():
+            value = self.client.get(self.key)
+        return int(value) if value is not None else None
+
+
+def create_nonce_store(address: str, store: str = NONCE_STORE):
+    """Nonce store selected by NONCE_STORE (no I/O: Redis connects on first use)"""
+    if store == 'local':
+        logger.info("🔢 In-memory nonce store: only this process may send from the key")
+        return LocalNonceStore()
+    if store != 'redis':
+        raise ValueError(f"Unknown NONCE_STORE {store!r} (expected 'redis' or 'local')")
+    import redis
+    client = redis.from_url(REDIS_URL, socket_connect_timeout=1.0, socket_timeout=2.0)
+    return RedisNonceStore(client, f"nonce:{NONCE_NAMESPACE}:{address.lower()}")
+
+
+class NonceManager:
+    """Allocates nonces for one sending address from a (local or shared) store"""
+
+    def __init__(
+        self,
+        w3,
+        address: str,
+        sign: Callable[[Dict], object],
+        stuck_after: float = STUCK_AFTER,
+        fee_bump: float = FEE_BUMP,
+        clock: Callable[[], float] = time.monotonic,
+        reprice: Optional[Callable[[], Dict[str, int]]] = None,
+        store=None
+    ):
+        self.w3 = w3
+        self.address = address
+        self.sign = sign  # tx dict -> signed transaction
+        self.stuck_after = stuck_after
+        self.fee_bump = fee_bump
+        self.clock = clock
+        self.reprice = reprice  # -> current fee fields a replacement should at least pay
+        self.store = store or LocalNonceStore()
+        self._lock = threading.Lock()
+        self._pending: Dict[int, PendingTx] = {}
+        self._by_hash: Dict[bytes, int] = {}
+        self.counters = {
+            'sent': 0, 'resyncs': 0, 'nonce_errors': 0, 'replaced': 0, 'confirmed': 0, 'unconfirmed': 0
+        }
+
+    def _chain_next(self) -> int:
+        """The node's pending transaction count"""
+        self.counters['resyncs'] += 1
+        return self.w3.eth.get_transaction_count(self.address, 'pending')
+
+    def resync(self):
+        with self._lock:
+            self.store.reset(self._chain_next())
+
+    def _allocate(self) -> int:
+        with self._lock:
+            return self.store.allocate(self._chain_next)
+
+    def _release(self, nonce: int):
+        """Give back a nonce whose transaction never reached the mempool"""
+        with self._lock:
+            self.store.release(nonce)
+
+    def send(self, tx: Dict) -> HexBytes:
+        """Assign a nonce to tx, sign and broadcast it; returns the tx hash"""
+        for attempt in range(SEND_ATTEMPTS):
+            nonce = self._allocate()
+            tx = {**tx, 'nonce': nonce}
+            signed = self.sign(tx)
+            try:
+                tx_hash = HexBytes(self.w3.eth.send_raw_transaction(_raw(signed)))
+            except Exception as e:
+                if _matches(e, ALREADY_KNOWN):
+                    tx_hash = HexBytes(signed.hash)
+                elif _matches(e, NONCE_TOO_LOW + NONCE_TAKEN):
+                    # Used elsewhere (another process, a lost response): skip it and retry
+                    self.counters['nonce_errors'] += 1
+                    logger.warning(f"⚠️ Nonce {nonce} already used ({e}), resyncing")
+                    with self._lock:
+                        self.store.advance(max(self._chain_next(), nonce + 1))
+                    continue
+                elif _rejected(e):
+                    self._release(nonce)
+                    raise
+                else:
+                    tx_hash = self._resend_unconfirmed(nonce, signed, e)
+
+            with self._lock:
+                self._pending[nonce] = PendingTx(nonce, tx, tx_hash, self.clock())
+                self._by_hash[bytes(tx_hash)] = nonce
+                self.counters['sent'] += 1
+            return tx_hash
+
+        raise RuntimeError(f"No usable nonce after {SEND_ATTEMPTS} attempts")
+
+    def _resend_unconfirmed(self, nonce: int, signed, error: Exception) -> HexBytes:
+        """Settle a broadcast whose outcome is unknown (timeout, connection reset)
+
+        The raw transaction may already be in the mempool, so the nonce is
+        not released: the same bytes are sent again, and unless the node now
+        rejects them outright the transaction is kept pending under its hash,
+        polled like any other and re-sent by replace_stuck if it never shows up.
+        """
+        self.counters['unconfirmed'] += 1
+        logger.warning(f"⚠️ Broadcast of nonce {nonce} unconfirmed ({error}), sending it again")
+        try:
+            self.w3.eth.send_raw_transaction(_raw(signed))
+        except Exception as e:
+            if _rejected(e) and not _matches(e, ALREADY_KNOWN + NONCE_TOO_LOW + NONCE_TAKEN):
+                # Same bytes refused: the first attempt never reached the mempool either
+                self._release(nonce)
+                raise
+            if not _rejected(e):
+                logger.warning(f"⚠️ Nonce {nonce} still unconfirmed ({e}), kept pending")
+        return HexBytes(signed.hash)
+
+    def hashes_for(self, tx_hash) -> List[HexBytes]:
+        """Every hash broadcast for tx_hash's nonce (the original plus replacements)"""
+        with self._lock:
+            nonce = self._by_hash.get(bytes(HexBytes(tx_hash)))
+            pending = self._pending.get(nonce)
+            return list(pending.hashes) if pending else [HexBytes(tx_hash)]
+
+    def confirmed(self, tx_hash):
+        """Forget the nonce once one of its transactions is mined"""
+        with self._lock:
+            nonce = self._by_hash.get(bytes(HexBytes(tx_hash)))
+            pending = self._pending.pop(nonce, None)
+            if pending:
+                for h in pending.hashes:
+                    self._by_hash.pop(bytes(h), None)
+                self.counters['confirmed'] += 1
+
+    def replace_if_stuck(self, tx_hash) -> Optional[HexBytes]:
+        """Re-send tx_hash's nonce with bumped fees if it has waited too long"""
+        with self._lock:
+            pending = self._pending.get(self._by_hash.get(bytes(HexBytes(tx_hash))))
+            if (
+                pending is None
+                or self.clock() - pending.sent_at < self.stuck_after
+                or pending.replacements >= MAX_REPLACEMENTS
+            ):
+                return None
+        return self._replace(pending)
+
+    def replace_stuck(self) -> Dict[HexBytes, HexBytes]:
+        """Replace every pending transaction that has waited too long
+
+        Returns the new hash of each replaced transaction, keyed by the hash
+        its nonce was first sent with.
+        """
+        now = self.clock()
+        with self._lock:
+            stuck = [
+                p for p in self._pending.values()
+                if now - p.sent_at >= self.stuck_after and p.replacements < MAX_REPLACEMENTS
+            ]
+        replaced = {p.hashes[0]: self._replace(p) for p in stuck}
+        return {original: h for original, h in replaced.items() if h is not None}
+
+    def _replace(self, pending: PendingTx) -> Optional[HexBytes]:
+        tx = dict(pending.tx)
+        current = self.reprice() if self.reprice else {}
+        for field in FEE_FIELDS:
+            if field in tx:
+                tx[field] = max(int(tx[field] * self.fee_bump) + 1, current.get(field, 0))
+        signed = self.sign(tx)
+        try:
+            tx_hash = HexBytes(self.w3.eth.send_raw_transaction(_raw(signed)))
+        except Exception as e:
+            if _matches(e, ALREADY_KNOWN):
+                tx_hash = HexBytes(signed.hash)  # this replacement was already accepted
+            elif _matches(e, NONCE_TOO_LOW):
+                return None  # one of its transactions was mined meanwhile
+            elif _matches(e, NONCE_TAKEN):
+                # Bump too small for this node: the next attempt bumps on top of it
+                with self._lock:
+                    pending.tx = tx
+                logger.warning(f"⚠️ Replacement for nonce {pending.nonce} underpriced, bumping again later")
+                return None
+            else:
+                logger.warning(f"⚠️ Replacing nonce {pending.nonce} failed: {e}")
+                return None
+
+        with self._lock:
+            pending.tx = tx
+            if tx_hash not in pending.hashes:
+                pending.hashes.append(tx_hash)
+            pending.sent_at = self.clock()
+            pending.replacements += 1
+            self._by_hash[bytes(tx_hash)] = pending.nonce
+            self.counters['replaced'] += 1
+        logger.info(f"🔁 Replaced stuck nonce {pending.nonce} with {tx_hash.hex()}")
+        return tx_hash
+
+    def _peek(self) -> Optional[int]:
+        try:
+            return self.store.peek()
+        except NonceStoreUnavailable:
+            return None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'next_nonce': self._peek(),
+                'in_flight': len(self._pending),
+                **self.counters
+            }
+
+
+def _raw(signed) -> bytes:
+    # Attribute name differs between eth-account versions
+    raw_tx = getattr(signed, 'rawTransaction', None) or getattr(signed, 'raw_transaction', None)
+    if raw_tx is None:
+        raise ValueError(f"Cannot get raw transaction. Available attributes: {dir(signed)}")
+    return raw_tx
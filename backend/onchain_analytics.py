@@ -8,6 +8,9 @@ import os
 from datetime import datetime, timezone
 import logging
 
+from chain_client import chain_web3
+from web3_pool import run_web3
+
 logger = logging.getLogger(__name__)
 
 # Contract addresses
@@ -15,8 +18,8 @@ BADGE_CONTRACT = "0x9e6343BB504Af8a39DB516d61c4Aa0aF36c54678"
 PASSPORT_CONTRACT = "0x1112373c9954B9bbFd91eb21175699b609A1b551"
 PROOF_REGISTRY = "0x296DB144E62C8C826bffA4503Dc9Fbf29F25D44B"
 
-# RPC URL
-RPC_URL = "https://rpc-amoy.polygon.technology"
+# RPC URL (comma-separated for an endpoint pool)
+RPC_URL = os.getenv("POLYGON_AMOY_RPC_URL", "https://rpc-amoy.polygon.technology")
 
 # ABIs (minimal for reading)
 BADGE_ABI = [
@@ -68,7 +71,7 @@ PASSPORT_ABI = [
 class OnChainAnalytics:
     def __init__(self):
         try:
-            self.w3 = Web3(Web3.HTTPProvider(RPC_URL))
+            self.w3 = chain_web3(RPC_URL)
             self.connected = self.w3.is_connected()
             
             if self.connected:
@@ -95,11 +98,8 @@ class OnChainAnalytics:
             return self._get_fallback_data()
         
         try:
-            # Get total badges minted
-            total_badges = self.badge_contract.functions.totalSupply().call()
-            
-            # Get total passports minted
-            total_passports = self.passport_contract.functions.totalSupply().call()
+            # Get total badges/passports minted (off the event loop)
+            total_badges, total_passports, block_number = await run_web3(self._read_totals)
             
             # Calculate metrics
             # Assume 1 user per passport (since passports are soulbound)
@@ -129,7 +129,7 @@ class OnChainAnalytics:
                 # Network info
                 "network": "Polygon Amoy",
                 "chain_id": 80002,
-                "block_number": self.w3.eth.block_number,
+                "block_number": block_number,
                 
                 # Contract addresses
                 "contracts": {
@@ -147,6 +147,14 @@ class OnChainAnalytics:
             logger.error(f"Error fetching on-chain data: {str(e)}")
             return self._get_fallback_data()
     
+    def _read_totals(self):
+        """Blocking contract reads; run on the web3 pool"""
+        return (
+            self.badge_contract.functions.totalSupply().call(),
+            self.passport_contract.functions.totalSupply().call(),
+            self.w3.eth.block_number
+        )
+    
     def _get_fallback_data(self) -> Dict:
         """Fallback data when blockchain is not available"""
         return {
@@ -182,7 +190,9 @@ class OnChainAnalytics:
         
         try:
             checksum_address = Web3.to_checksum_address(wallet_address)
-            passport = self.passport_contract.functions.getPassport(checksum_address).call()
+            passport = await run_web3(
+                self.passport_contract.functions.getPassport(checksum_address).call
+            )
             
             return {
                 "wallet_address": wallet_address,
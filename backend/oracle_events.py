@@ -0,0 +1,157 @@
+"""
+Oracle Event Subscriber
+Listens to the on-chain events EventListener publishes through MessageQueue
+(Redis pub/sub), and to partner demand published by the API, and hands each
+affected wallet to the oracle, debounced so a burst of events for one wallet
+triggers a single refresh
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Set
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+DEBOUNCE = float(os.getenv("ORACLE_EVENT_DEBOUNCE", "2.0"))  # seconds
+RECONNECT_DELAY = 30.0
+
+# Channel names published by message_queue.EventType (not imported: celery)
+BADGE_MINTED = "badge.minted"
+PASSPORT_CREATED = "passport.created"
+
+# Partner API requests for a wallet; the worker owning its shard raises its priority
+PARTNER_DEMAND = "oracle.demand"
+
+
+class OracleEventSubscriber:
+    """Redis subscriber that calls on_wallet(wallet, event_types) per debounce window"""
+
+    def __init__(
+        self,
+        on_wallet: Callable[[str, Set[str]], None],
+        channels: List[str] = None,
+        debounce: float = DEBOUNCE,
+        client=None
+    ):
+        self.on_wallet = on_wallet
+        self.channels = channels or [BADGE_MINTED, PASSPORT_CREATED, PARTNER_DEMAND]
+        self.debounce = debounce
+        self.client = client
+        self._pending: Dict[str, Set[str]] = {}
+        self.counters = {'received': 0, 'coalesced': 0, 'dispatched': 0, 'invalid': 0}
+
+    def _connect(self):
+        import redis.asyncio as aioredis
+        return aioredis.from_url(REDIS_URL, decode_responses=True)
+
+    async def run(self, running: Callable[[], bool]):
+        """Consume events until running() is false, reconnecting on failure"""
+        while running():
+            pubsub = None
+            try:
+                if self.client is None:
+                    self.client = self._connect()
+                pubsub = self.client.pubsub()
+                await pubsub.subscribe(*self.channels)
+                logger.info(f"👂 Oracle subscribed to {', '.join(self.channels)}")
+
+                while running():
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message is not None:
+                        self.handle(message.get('channel'), message.get('data'))
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"⚠️ Oracle event subscription failed, retrying in {RECONNECT_DELAY}s: {e}")
+                await asyncio.sleep(RECONNECT_DELAY)
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.close()
+                    except Exception:
+                        pass
+
+    def handle(self, channel: str, raw: str):
+        """Parse a MessageQueue message and debounce it per wallet"""
+        try:
+            message = json.loads(raw)
+            wallet_address = message['data']['wallet_address']
+            event_type = message.get('event_type', channel)
+        except (TypeError, ValueError, KeyError) as e:
+            self.counters['invalid'] += 1
+            logger.warning(f"⚠️ Ignoring malformed event on {channel}: {e}")
+            return
+
+        self.counters['received'] += 1
+        if wallet_address in self._pending:
+            self._pending[wallet_address].add(event_type)
+            self.counters['coalesced'] += 1
+            return
+
+        self._pending[wallet_address] = {event_type}
+        asyncio.get_event_loop().call_later(self.debounce, self._dispatch, wallet_address)
+
+    def _dispatch(self, wallet_address: str):
+        event_types = self._pending.pop(wallet_address, set())
+        self.counters['dispatched'] += 1
+        try:
+            self.on_wallet(wallet_address, event_types)
+        except Exception as e:
+            logger.error(f"❌ Event dispatch failed for {wallet_address}: {e}")
+
+    def stats(self) -> Dict:
+        return {
+            'channels': self.channels,
+            'debounce': self.debounce,
+            'pending': len(self._pending),
+            **self.counters
+        }
+
+
+class DemandPublisher:
+    """Publishes partner demand for the oracle workers (API side)
+
+    The API process usually does not own the wallet's shard, or runs no
+    oracle at all (ORACLE_EMBEDDED=false), so demand goes through Redis to
+    whichever worker holds the lease. publish() returns False when Redis is
+    unreachable; it is not retried for RECONNECT_DELAY after a failure.
+    """
+
+    def __init__(self, client=None, clock: Callable[[], float] = time.monotonic):
+        self.client = client
+        self.clock = clock
+        self._down_until = 0.0
+        self.counters = {'published': 0, 'failed': 0}
+
+    def _connect(self):
+        import redis.asyncio as aioredis
+        return aioredis.from_url(REDIS_URL, decode_responses=True, socket_connect_timeout=1.0)
+
+    async def publish(self, wallet_address: str) -> bool:
+        if self.clock() < self._down_until:
+            return False
+        try:
+            if self.client is None:
+                self.client = self._connect()
+            await self.client.publish(PARTNER_DEMAND, json.dumps({
+                'event_type': PARTNER_DEMAND,
+                'data': {'wallet_address': wallet_address},
+                'timestamp': datetime.utcnow().isoformat()
+            }))
+            self.counters['published'] += 1
+            return True
+        except Exception as e:
+            self.counters['failed'] += 1
+            self._down_until = self.clock() + RECONNECT_DELAY
+            logger.warning(f"⚠️ Could not publish demand for {wallet_address}: {e}")
+            return False
+
+
+# Singleton instance
+demand_publisher = DemandPublisher()
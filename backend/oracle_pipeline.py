@@ -0,0 +1,176 @@
+"""
+Oracle Refresh Pipeline
+Bounded-concurrency collect -> score -> write pipeline with per-stage
+queues and backpressure
+"""
+
+import asyncio
+import logging
+import os
+from typing import Awaitable, Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+COLLECT_WORKERS = int(os.getenv("ORACLE_WORKERS", "16"))
+WRITE_WORKERS = int(os.getenv("ORACLE_WRITE_WORKERS", "4"))
+QUEUE_SIZE = int(os.getenv("ORACLE_QUEUE_SIZE", "256"))
+MAX_SCORE_BATCH = int(os.getenv("ORACLE_SCORE_BATCH", "256"))
+
+
+class OraclePipeline:
+    """Jobs are dicts that each stage enriches in place
+
+    collect(job)      -- async, I/O bound, runs on `workers` concurrent tasks
+    score(jobs)       -- sync, CPU bound, called with every job waiting (micro-batch)
+                         on the loop's default executor, off the event loop
+    write(job)        -- async, runs on `write_workers` concurrent tasks
+    on_error(job, e)  -- called when any stage raises for a job
+
+    A micro-batch whose score call raises is re-scored one job at a time, so
+    a single bad job fails alone.
+    """
+
+    def __init__(
+        self,
+        collect: Callable[[Dict], Awaitable[None]],
+        score: Callable[[List[Dict]], None],
+        write: Callable[[Dict], Awaitable[None]],
+        on_error: Callable[[Dict, Exception], None] = None,
+        workers: int = COLLECT_WORKERS,
+        write_workers: int = WRITE_WORKERS,
+        queue_size: int = QUEUE_SIZE,
+        max_score_batch: int = MAX_SCORE_BATCH
+    ):
+        self.collect = collect
+        self.score = score
+        self.write = write
+        self.on_error = on_error
+        self.workers = workers
+        self.write_workers = write_workers
+        self.queue_size = queue_size
+        self.max_score_batch = max_score_batch
+        self._tasks = []
+        self.counters = {'submitted': 0, 'collected': 0, 'scored': 0, 'written': 0, 'failed': 0,
+                         'score_fallbacks': 0}
+
+    async def start(self):
+        self.collect_queue = asyncio.Queue(self.queue_size)
+        self.score_queue = asyncio.Queue(self.queue_size)
+        self.write_queue = asyncio.Queue(self.queue_size)
+
+        self._tasks = (
+            [asyncio.create_task(self._collect_worker()) for _ in range(self.workers)] +
+            [asyncio.create_task(self._score_worker())] +
+            [asyncio.create_task(self._write_worker()) for _ in range(self.write_workers)]
+        )
+        logger.info(f"🧵 Oracle pipeline started ({self.workers} collect / {self.write_workers} write workers)")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, job: Dict):
+        """Enqueue a job; waits while the collect queue is full (backpressure)"""
+        self.counters['submitted'] += 1
+        await self.collect_queue.put(job)
+
+    def capacity(self) -> int:
+        """Jobs submit() accepts right now without waiting"""
+        if not self._tasks:
+            return self.queue_size
+        return max(0, self.queue_size - self.collect_queue.qsize())
+
+    async def join(self):
+        """Wait until every submitted job has left the pipeline"""
+        await self.collect_queue.join()
+        await self.score_queue.join()
+        await self.write_queue.join()
+
+    def _fail(self, job: Dict, error: Exception):
+        self.counters['failed'] += 1
+        if self.on_error:
+            try:
+                self.on_error(job, error)
+            except Exception as e:
+                # A failing callback must not take the worker down with it
+                logger.error(f"❌ Pipeline error handler raised: {e}")
+
+    async def _run_score(self, jobs: List[Dict]):
+        await asyncio.get_running_loop().run_in_executor(None, self.score, jobs)
+
+    async def _score_batch(self, batch: List[Dict]) -> List[Dict]:
+        """Score a micro-batch; the jobs that were scored"""
+        try:
+            await self._run_score(batch)
+            return batch
+        except Exception as e:
+            if len(batch) == 1:
+                self._fail(batch[0], e)
+                return []
+            self.counters['score_fallbacks'] += 1
+            logger.warning(f"⚠️ Scoring a batch of {len(batch)} failed ({e}); scoring jobs one at a time")
+
+        scored = []
+        for job in batch:
+            try:
+                await self._run_score([job])
+                scored.append(job)
+            except Exception as e:
+                self._fail(job, e)
+        return scored
+
+    async def _collect_worker(self):
+        while True:
+            job = await self.collect_queue.get()
+            try:
+                await self.collect(job)
+                self.counters['collected'] += 1
+                await self.score_queue.put(job)
+            except Exception as e:
+                self._fail(job, e)
+            finally:
+                self.collect_queue.task_done()
+
+    async def _score_worker(self):
+        while True:
+            batch = [await self.score_queue.get()]
+            while len(batch) < self.max_score_batch and not self.score_queue.empty():
+                batch.append(self.score_queue.get_nowait())
+
+            try:
+                scored = await self._score_batch(batch)
+                self.counters['scored'] += len(scored)
+                for job in scored:
+                    await self.write_queue.put(job)
+            finally:
+                for _ in batch:
+                    self.score_queue.task_done()
+
+    async def _write_worker(self):
+        while True:
+            job = await self.write_queue.get()
+            try:
+                await self.write(job)
+                self.counters['written'] += 1
+            except Exception as e:
+                self._fail(job, e)
+            finally:
+                self.write_queue.task_done()
+
+    def stats(self) -> Dict:
+        queues = {}
+        if self._tasks:
+            queues = {
+                'collect': self.collect_queue.qsize(),
+                'score': self.score_queue.qsize(),
+                'write': self.write_queue.qsize()
+            }
+        return {
+            'workers': self.workers,
+            'write_workers': self.write_workers,
+            'queue_size': self.queue_size,
+            'queues': queues,
+            **self.counters
+        }
@@ -60,7 +60,8 @@ async def get_risk_score(request: RiskAssessmentRequest):
             'onchain_activity': passport.get('onchain_activity', 0),
             'credit_score': passport.get('credit_score', 0),
             'account_age_days': 30,  # TODO: Calculate from issued_at
-            'score_history': [passport.get('credit_score', 0)]  # TODO: Get history
+            'score_history': [passport.get('credit_score', 0)],  # TODO: Get history
+            'score_stats': passport.get('score_stats')
         }
         
         # Get AI prediction
@@ -120,7 +121,8 @@ async def get_lending_recommendation(request: LendingRecommendationRequest):
             'onchain_activity': passport.get('onchain_activity', 0),
             'credit_score': passport.get('credit_score', 0),
             'account_age_days': 30,
-            'score_history': [passport.get('credit_score', 0)]
+            'score_history': [passport.get('credit_score', 0)],
+            'score_stats': passport.get('score_stats')
         }
         
         # Get risk prediction
@@ -1,29 +1,97 @@
 """
 Dynamic Real-time Oracle Service
-Continuous monitoring and updates every 5 minutes
+Continuous monitoring; each passport is refreshed when its priority-based
+schedule says it is due
 """
 
 import asyncio
+import hashlib
+import json
 import logging
 from datetime import datetime, timedelta
 from typing import Dict, List
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
 
-from ai_models import ai_oracle_v2
+from ai_models import ai_oracle_v2, MODEL_VERSION
 from github_service import fetch_github_data
 from twitter_service import fetch_twitter_data
 from onchain_service import fetch_wallet_data, fetch_defi_data
+from defi_indexer import get_defi_indexer
+from defi_snapshot import defi_snapshot
+from web3_pool import run_web3
+from score_stats import SCORE_WINDOW, push_score
+from percentile_index import credit_rank_value, population_index
+from refresh_scheduler import RefreshScheduler
+from oracle_pipeline import OraclePipeline
+from bulk_writer import BulkWriter
+from pymongo import UpdateOne, InsertOne
+from single_flight import RedisSingleFlight
+from source_guard import SourceGuard
+from shard_leases import ShardLeaseManager, shard_of
+from oracle_events import OracleEventSubscriber, PARTNER_DEMAND
+import score_stats
 
 logger = logging.getLogger(__name__)
 
+# Overall time allowed for collecting one passport's data (seconds)
+COLLECT_BUDGET = float(os.getenv("ORACLE_COLLECT_BUDGET", "5.0"))
+
+# data_sources fields produced by each source: (field, source key, default)
+SOURCE_FIELDS = {
+    'github': [('github_score', 'score', 0)],
+    'twitter': [('twitter_score', 'score', 0)],
+    'wallet': [
+        ('tx_count', 'tx_count', 0),
+        ('tx_volume_usd', 'volume_usd', 0),
+        ('account_age_days', 'age_days', 0),
+    ],
+    'defi': [
+        ('total_borrowed', 'borrowed', 0),
+        ('total_supplied', 'supplied', 0),
+        ('repayment_rate', 'repayment_rate', 100),
+        ('liquidation_count', 'liquidations', 0),
+    ],
+}
+
 
 class DynamicOracleService:
     """Real-time oracle with continuous updates"""
     
-    def __init__(self, db):
+    def __init__(self, db, leases: ShardLeaseManager = None):
         self.db = db
-        self.update_interval = 5 * 60  # 5 minutes
+        self.leases = leases  # created on start(); None means this process owns every wallet
+        # Seconds between scheduler seeding sweeps; on-chain events cover new passports
+        self.update_interval = float(os.getenv("ORACLE_SWEEP_INTERVAL", "1800"))
+        # Optional cap in wallets/second; 0 = as fast as the pipeline drains
+        self.refresh_rate = float(os.getenv("ORACLE_REFRESH_RATE", "0"))
+        self.idle_wait = 0.2  # seconds between polls when nothing is due or the pipeline is full
+        self.scheduler = RefreshScheduler()
+        self.pipeline = OraclePipeline(
+            collect=self._collect_stage,
+            score=self._score_stage,
+            write=self._write_stage,
+            on_error=self._on_stage_error
+        )
+        self.passport_writer = BulkWriter(db.passports, 'passports', on_error=self._on_write_error)
+        self.event_writer = BulkWriter(db.events, 'events')
+        self.cycle_counters = {'written': 0, 'skipped': 0, 'dropped': 0}
+        self.last_cycle = None
+        self.refresh_flight = RedisSingleFlight(prefix="oracle:refresh")
+        self.collect_budget = COLLECT_BUDGET
+        self.sources = {
+            'github': SourceGuard('github', fetch_github_data,
+                                  float(os.getenv("ORACLE_GITHUB_TIMEOUT", "2.0"))),
+            'twitter': SourceGuard('twitter', fetch_twitter_data,
+                                   float(os.getenv("ORACLE_TWITTER_TIMEOUT", "2.0"))),
+            'wallet': SourceGuard('wallet', fetch_wallet_data,
+                                  float(os.getenv("ORACLE_WALLET_TIMEOUT", "3.0"))),
+            'defi': SourceGuard('defi', fetch_defi_data,
+                                float(os.getenv("ORACLE_DEFI_TIMEOUT", "4.0"))),
+        }
+        self.reseed = asyncio.Event()
+        self.events = OracleEventSubscriber(self._on_chain_event)
+        self.defi_watcher = None
         self.running = False
     
     async def start(self):
@@ -31,135 +99,376 @@ class DynamicOracleService:
         self.running = True
         logger.info("🚀 Dynamic Oracle Service started")
         
+        # Claim this worker's share of the wallet keyspace before sweeping
+        if self.leases is None:
+            self.leases = ShardLeaseManager(self.db)
+        await self.leases.renew()
+        
+        await self.pipeline.start()
+        await self.passport_writer.start()
+        await self.event_writer.start()
+        
         # Start background tasks
         asyncio.create_task(self._continuous_update_loop())
+        asyncio.create_task(self._refresh_loop())
+        asyncio.create_task(self._lease_loop())
         asyncio.create_task(self._event_listener())
+        
+        # Invalidate cached DeFi positions as Aave events land on-chain
+        indexer = get_defi_indexer()
+        if indexer.positions.cache.enabled:
+            self.defi_watcher = indexer.invalidation_watcher()
+            asyncio.create_task(self.defi_watcher.run())
     
     async def stop(self):
         """Stop oracle service"""
         self.running = False
+        await self.pipeline.stop()
+        await self.passport_writer.stop()
+        await self.event_writer.stop()
+        if self.defi_watcher:
+            self.defi_watcher.stop()
+        if self.leases:
+            await self.leases.release_all()
         logger.info("🛑 Dynamic Oracle Service stopped")
     
+    def owns(self, wallet_address: str) -> bool:
+        """Whether this worker currently holds the lease for the wallet's shard"""
+        return self.leases is None or self.leases.owns(wallet_address)
+    
+    async def _lease_loop(self):
+        """Renew shard leases; drop lost shards and seed newly gained ones"""
+        while self.running:
+            await asyncio.sleep(self.leases.renew_interval)
+            try:
+                gained, lost = await self.leases.renew()
+                
+                if lost:
+                    num_shards = self.leases.num_shards
+                    for wallet_address in self.scheduler.wallets():
+                        if shard_of(wallet_address, num_shards) in lost:
+                            self.scheduler.remove(wallet_address)
+                if gained:
+                    self.reseed.set()
+                    
+            except Exception as e:
+                logger.error(f"❌ Lease renewal error: {e}")
+    
     async def _continuous_update_loop(self):
-        """Update all active passports every 5 minutes"""
+        """Periodically seed the refresh scheduler with this worker's active passports"""
         while self.running:
             try:
-                logger.info("🔄 Starting batch update cycle...")
+                logger.info("🔄 Starting scheduler seeding sweep...")
                 
-                # Get all active passports
-                passports = await self.db.passports.find({
-                    'isActive': True
-                }).to_list(1000)
+                # Stream all active passports; new ones in our shards become due immediately
+                cursor = self.db.passports.find(
+                    {'isActive': True},
+                    {'_id': 0, 'owner': 1, 'score_stats': 1}
+                ).batch_size(1000)
                 
-                logger.info(f"📊 Updating {len(passports)} passports")
+                added = 0
+                async for passport in cursor:
+                    wallet_address = passport.get('owner')
+                    if (wallet_address and wallet_address not in self.scheduler
+                            and self.owns(wallet_address)):
+                        stats = passport.get('score_stats')
+                        volatility = score_stats.volatility(stats) if stats else 0.0
+                        self.scheduler.add(wallet_address, volatility)
+                        added += 1
                 
-                # Update in parallel batches
-                batch_size = 10
-                for i in range(0, len(passports), batch_size):
-                    batch = passports[i:i+batch_size]
-                    await asyncio.gather(*[
-                        self._update_passport(p) for p in batch
-                    ])
+                logger.info(f"📊 Scheduler tracking {len(self.scheduler)} passports ({added} new)")
                 
-                logger.info("✅ Batch update completed")
+                # Written vs. skipped-unchanged updates since the previous sweep
+                self.last_cycle = {**self.cycle_counters, 'ended_at': datetime.utcnow().isoformat()}
+                self.cycle_counters = {'written': 0, 'skipped': 0, 'dropped': 0}
+                logger.info(
+                    f"✅ Cycle: {self.last_cycle['written']} written, "
+                    f"{self.last_cycle['skipped']} unchanged"
+                )
                 
             except Exception as e:
-                logger.error(f"❌ Batch update error: {e}")
+                logger.error(f"❌ Scheduler seeding error: {e}")
             
-            # Wait 5 minutes
-            await asyncio.sleep(self.update_interval)
+            # Wait for the next sweep, or until new shards are leased to this worker
+            try:
+                await asyncio.wait_for(self.reseed.wait(), self.update_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.reseed.clear()
     
-    async def _update_passport(self, passport: Dict):
-        """Update single passport with fresh data"""
-        try:
-            wallet_address = passport.get('owner')
-            
-            # Collect fresh data from all sources
-            data = await self._collect_all_data(wallet_address)
-            
-            # Compute new score using AI models
-            assessment = ai_oracle_v2.assess_risk(data)
+    async def _refresh_loop(self):
+        """Pull due passports from the scheduler as fast as the pipeline takes them
+        
+        Each pop is bounded by the pipeline's free capacity, so throughput
+        follows its worker count and backpressure (and refresh_rate, if set).
+        """
+        tick = 1.0
+        
+        while self.running:
+            started = asyncio.get_event_loop().time()
+            wallets, submitted, popped = [], set(), []
+            try:
+                budget = self.pipeline.capacity()
+                if self.refresh_rate:
+                    budget = min(budget, max(1, int(self.refresh_rate * tick)))
+                popped = self.scheduler.pop_due(budget) if budget else []
+                for wallet_address in popped:
+                    if self.owns(wallet_address):
+                        wallets.append(wallet_address)
+                    else:
+                        self.scheduler.remove(wallet_address)
+                
+                if wallets:
+                    # Aave accounts for the whole tick in one multicall, read
+                    # while the passports load
+                    prefetch = asyncio.create_task(self._prefetch_aave(wallets))
+                    passports = [passport async for passport in self.db.passports.find({'owner': {'$in': wallets}})]
+                    aave = await prefetch
+                    
+                    # submit() blocks while the pipeline is saturated
+                    for passport in passports:
+                        wallet_address = passport.get('owner')
+                        await self.pipeline.submit({'passport': passport, 'aave': aave.get(wallet_address)})
+                        submitted.add(wallet_address)
+                    
+                    found = {passport.get('owner') for passport in passports}
+                    for wallet_address in wallets:
+                        if wallet_address not in found:
+                            self.scheduler.remove(wallet_address)
+                
+            except Exception as e:
+                logger.error(f"❌ Refresh loop error: {e}")
+                # Popped wallets are in flight until marked; retry the ones never submitted
+                for wallet_address in wallets:
+                    if wallet_address not in submitted:
+                        self.scheduler.mark_failed(wallet_address)
             
-            # Update database
-            await self.db.passports.update_one(
+            if self.refresh_rate:
+                elapsed = asyncio.get_event_loop().time() - started
+                await asyncio.sleep(max(0.0, tick - elapsed))
+            elif not popped:
+                await asyncio.sleep(self.idle_wait)  # nothing due, or the pipeline is full
+            else:
+                await asyncio.sleep(0)
+    
+    async def _prefetch_aave(self, wallets: List[str]) -> Dict[str, Dict]:
+        """Aave account data for many wallets via Multicall3 (cache-aware)
+        
+        Only real reads are kept: a wallet whose multicall read failed is
+        read on its own by the DeFi source, under its guard.
+        """
+        try:
+            accounts = await run_web3(get_defi_indexer().get_aave_data_many, wallets)
+        except Exception as e:
+            logger.warning(f"⚠️ Aave prefetch failed for {len(wallets)} wallets: {e}")
+            return {}
+        return {wallet: data for wallet, data in accounts.items() if not data.get('is_mock')}
+    
+    async def _update_passport(self, passport: Dict, force: bool = False):
+        """Update single passport with fresh data (outside the pipeline)
+        
+        force rescoring even when the collected inputs have not changed.
+        """
+        job = {'passport': passport, 'force': force}
+        try:
+            await self._collect_stage(job)
+            await asyncio.get_running_loop().run_in_executor(None, self._score_stage, [job])
+            await self._write_stage(job)
+        except Exception as e:
+            self._on_stage_error(job, e)
+    
+    async def _collect_stage(self, job: Dict):
+        """Collect fresh data from all sources"""
+        passport = job['passport']
+        data = await self._collect_all_data(
+            passport.get('owner'), passport.get('data_sources'), aave=job.get('aave')
+        )
+        
+        job['data'] = data
+        job['inputs_hash'] = self._inputs_hash(data)
+        job['unchanged'] = (
+            not job.get('force') and
+            job['inputs_hash'] == job['passport'].get('inputs_hash')
+        )
+    
+    @staticmethod
+    def _inputs_hash(data: Dict) -> str:
+        """Content hash of the collected inputs (and the model that scores them)"""
+        payload = json.dumps(data, sort_keys=True, default=str)
+        return hashlib.sha256(f"{MODEL_VERSION}:{payload}".encode()).hexdigest()
+    
+    def _score_stage(self, jobs: List[Dict]):
+        """Compute new scores for a micro-batch using the vectorized AI models"""
+        
+        # Unchanged inputs keep their existing score
+        changed = [job for job in jobs if not job['unchanged']]
+        if not changed:
+            return
+        
+        # Volatility/trend come from each passport's running stats
+        assessments = ai_oracle_v2.batch_assess([
+            {**job['data'], 'score_stats': job['passport'].get('score_stats')}
+            for job in changed
+        ])
+        
+        for job, assessment in zip(changed, assessments):
+            job['assessment'] = assessment
+    
+    async def _write_stage(self, job: Dict):
+        """Persist a scored passport and propagate the new score"""
+        passport = job['passport']
+        wallet_address = passport.get('owner')
+        
+        if not job.get('force') and not self.owns(wallet_address):
+            # Shard lease lost while in flight; its new owner refreshes it
+            self.cycle_counters['dropped'] += 1
+            return
+        
+        if job['unchanged']:
+            # Only record that the passport was checked
+            await self.passport_writer.add(UpdateOne(
                 {'passport_id': passport['passport_id']},
-                {
-                    '$set': {
-                        'credit_score': assessment['risk_score'],
-                        'risk_level': assessment['risk_category'],
-                        'default_probability': assessment['default_probability'],
-                        'fraud_detected': assessment['fraud_detected'],
-                        'last_updated': datetime.utcnow(),
-                        'data_sources': data
-                    },
-                    '$push': {
-                        'score_history': {
-                            '$each': [assessment['risk_score']],
-                            '$slice': -30  # Keep last 30 scores
-                        }
+                {'$set': {'checked_at': datetime.utcnow()}}
+            ), context=wallet_address)
+            self.scheduler.mark_refreshed(wallet_address)
+            self.cycle_counters['skipped'] += 1
+            return
+        
+        data = job['data']
+        assessment = job['assessment']
+        
+        # Roll the running statistics forward with the new score
+        stats = push_score(
+            passport.get('score_stats'),
+            passport.get('score_history', []),
+            assessment['risk_score']
+        )
+        
+        # The oracle's score is stored as both the passport's credit and risk score
+        fields = {
+            'credit_score': assessment['risk_score'],
+            'risk_score': assessment['risk_score'],
+            'risk_level': assessment['risk_category'],
+            'default_probability': assessment['default_probability'],
+            'fraud_detected': assessment['fraud_detected'],
+            'last_updated': datetime.utcnow(),
+            'data_sources': data,
+            'inputs_hash': job['inputs_hash'],
+            'checked_at': datetime.utcnow(),
+            'score_stats': stats
+        }
+        
+        # Queue the database update; flushed in unordered bulk batches
+        await self.passport_writer.add(UpdateOne(
+            {'passport_id': passport['passport_id']},
+            {
+                '$set': fields,
+                '$push': {
+                    'score_history': {
+                        '$each': [assessment['risk_score']],
+                        '$slice': -SCORE_WINDOW  # Keep last 30 scores
                     }
                 }
-            )
-            
-            # Check for significant change
-            old_score = passport.get('credit_score', 0)
-            new_score = assessment['risk_score']
-            change = abs(new_score - old_score)
-            
-            if change > 50:  # 5% change
-                logger.info(f"📈 Significant change for {wallet_address}: {old_score} → {new_score}")
-                await self._emit_update_event(wallet_address, old_score, new_score)
-            
-        except Exception as e:
-            logger.error(f"❌ Update failed for {passport.get('passport_id')}: {e}")
-    
-    async def _collect_all_data(self, wallet_address: str) -> Dict:
-        """Collect data from all sources in parallel"""
-        
-        # Parallel data collection
-        github_data, twitter_data, wallet_data, defi_data = await asyncio.gather(
-            fetch_github_data(wallet_address),
-            fetch_twitter_data(wallet_address),
-            fetch_wallet_data(wallet_address),
-            fetch_defi_data(wallet_address),
-            return_exceptions=True
+            }
+        ), context=wallet_address)
+        self.cycle_counters['written'] += 1
+        
+        # Schedule the next refresh from the new volatility
+        self.scheduler.mark_refreshed(wallet_address, score_stats.volatility(stats))
+        
+        # Keep the population percentile index current, converted the same
+        # way a rebuild converts the stored fields
+        population_index.update(
+            wallet_address,
+            credit_score=credit_rank_value(fields['credit_score'], fields['risk_score']),
+            risk_score=fields['risk_score']
         )
         
-        # Combine all data
+        # Check for significant change
+        old_score = passport.get('credit_score', 0)
+        new_score = assessment['risk_score']
+        change = abs(new_score - old_score)
+        
+        if change > 50:  # 5% change
+            logger.info(f"📈 Significant change for {wallet_address}: {old_score} → {new_score}")
+            self.scheduler.record_event(wallet_address)
+            await self._emit_update_event(wallet_address, old_score, new_score)
+    
+    def _on_write_error(self, wallet_address: str, message: str):
+        """A buffered passport write was rejected; retry the wallet soon"""
+        self.scheduler.mark_failed(wallet_address)
+    
+    def _on_stage_error(self, job: Dict, error: Exception):
+        passport = job['passport']
+        logger.error(f"❌ Update failed for {passport.get('passport_id')}: {error}")
+        self.scheduler.mark_failed(passport.get('owner'))
+    
+    async def _collect_all_data(self, wallet_address: str, previous: Dict = None, aave: Dict = None) -> Dict:
+        """Collect data from all sources in parallel within the collection budget
+        
+        A source that times out, fails or has its breaker open contributes its
+        last known values from previous (the passport's stored data_sources).
+        aave is the wallet's Aave account when the refresh loop prefetched it.
+        """
+        names = list(self.sources)
+        seeded = {wallet_address: aave} if aave else None
+        with defi_snapshot(aave=seeded):  # one DeFi read per wallet per cycle
+            results = await asyncio.gather(*[
+                self.sources[name].call(wallet_address, deadline=self.collect_budget)
+                for name in names
+            ])
+        
+        previous = previous or {}
+        data = {'wallet_address': wallet_address}
+        for name, result in zip(names, results):
+            for field, key, default in SOURCE_FIELDS[name]:
+                if result is not None:
+                    data[field] = result.get(key, default)
+                else:
+                    data[field] = previous.get(field, default)
+        return data
+    
+    def source_stats(self) -> Dict:
+        """Breaker state, outcome counters and latency histogram per source"""
         return {
-            'wallet_address': wallet_address,
-            'github_score': github_data.get('score', 0) if isinstance(github_data, dict) else 0,
-            'twitter_score': twitter_data.get('score', 0) if isinstance(twitter_data, dict) else 0,
-            'tx_count': wallet_data.get('tx_count', 0) if isinstance(wallet_data, dict) else 0,
-            'tx_volume_usd': wallet_data.get('volume_usd', 0) if isinstance(wallet_data, dict) else 0,
-            'account_age_days': wallet_data.get('age_days', 0) if isinstance(wallet_data, dict) else 0,
-            'total_borrowed': defi_data.get('borrowed', 0) if isinstance(defi_data, dict) else 0,
-            'total_supplied': defi_data.get('supplied', 0) if isinstance(defi_data, dict) else 0,
-            'repayment_rate': defi_data.get('repayment_rate', 100) if isinstance(defi_data, dict) else 100,
-            'liquidation_count': defi_data.get('liquidations', 0) if isinstance(defi_data, dict) else 0,
+            'budget_s': self.collect_budget,
+            'sources': {name: guard.stats() for name, guard in self.sources.items()}
         }
     
     async def _event_listener(self):
         """Listen for blockchain events and trigger immediate updates"""
-        # Placeholder for Web3 event listener
-        # In production, this would subscribe to blockchain events
-        logger.info("👂 Event listener started")
+        await self.events.run(lambda: self.running)
+    
+    def _on_chain_event(self, wallet_address: str, event_types):
+        """Debounced badge/passport event: refresh the wallet ahead of the queue
         
-        while self.running:
-            await asyncio.sleep(10)  # Check every 10 seconds
+        Partner demand arrives on the same subscription and only raises priority.
+        """
+        if not self.owns(wallet_address):
+            return  # the shard's owner receives the same event
+        
+        if PARTNER_DEMAND in event_types:
+            self.scheduler.record_demand(wallet_address)
+        chain_events = set(event_types) - {PARTNER_DEMAND}
+        if not chain_events:
+            return
+        
+        logger.info(f"⚡ On-chain event for {wallet_address}: {', '.join(sorted(chain_events))}")
+        self.scheduler.expedite(wallet_address)
+        self.scheduler.record_event(wallet_address, weight=len(chain_events))
     
     async def _emit_update_event(self, wallet_address: str, old_score: float, new_score: float):
         """Emit update event for WebSocket broadcast"""
         try:
-            # Store event in database
-            await self.db.events.insert_one({
+            # Store event in database (batched with other events)
+            await self.event_writer.add(InsertOne({
                 'event_type': 'passport_updated',
                 'wallet_address': wallet_address,
                 'old_score': old_score,
                 'new_score': new_score,
                 'change': new_score - old_score,
                 'timestamp': datetime.utcnow()
-            })
+            }), context=wallet_address)
             
             # Broadcast via WebSocket (if available)
             from websocket_server import ws_manager
@@ -173,7 +482,16 @@ class DynamicOracleService:
             logger.error(f"❌ Event emission failed: {e}")
     
     async def force_refresh(self, wallet_address: str) -> Dict:
-        """Force immediate refresh for a wallet (partner API)"""
+        """Force immediate refresh for a wallet (partner API)
+        
+        Concurrent requests for the same wallet, in this worker or another,
+        share a single collection-and-score run.
+        """
+        return await self.refresh_flight.do(
+            wallet_address, lambda: self._force_refresh(wallet_address)
+        )
+    
+    async def _force_refresh(self, wallet_address: str) -> Dict:
         try:
             # Check rate limit
             last_refresh = await self.db.refresh_log.find_one({
@@ -196,8 +514,10 @@ class DynamicOracleService:
             if not passport:
                 return {'success': False, 'error': 'Passport not found'}
             
-            # Update immediately
-            await self._update_passport(passport)
+            # Update immediately and write through
+            await self._update_passport(passport, force=True)
+            await self.passport_writer.flush()
+            await self.event_writer.flush()
             
             # Log refresh
             await self.db.refresh_log.insert_one({
@@ -231,3 +551,9 @@ def get_oracle_service(db):
     if oracle_service is None:
         oracle_service = DynamicOracleService(db)
     return oracle_service
+
+def running_oracle_service():
+    """The oracle running in this process, or None (ORACLE_EMBEDDED=false)"""
+    if oracle_service is not None and oracle_service.running:
+        return oracle_service
+    return None
@@ -0,0 +1,55 @@
+"""
+Oracle Worker Runner
+Runs the dynamic oracle outside the API server. Start one per core/node:
+workers split the wallet keyspace through shard leases in MongoDB, and a
+dead worker's shards are taken over once its leases expire.
+
+    ORACLE_EMBEDDED=false uvicorn server:app --workers 4
+    python oracle_worker.py   # x N
+"""
+
+import asyncio
+import logging
+import os
+import signal
+from pathlib import Path
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from oracle_service import get_oracle_service
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+
+async def main():
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+
+    oracle = get_oracle_service(db)
+    await oracle.start()
+    logger.info(f"✅ Oracle worker {oracle.leases.worker_id} started")
+
+    stopped = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stopped.set)
+
+    try:
+        await stopped.wait()
+    finally:
+        # Releasing leases lets other workers take our shards immediately
+        await oracle.stop()
+        client.close()
+        logger.info("🛑 Oracle worker stopped")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
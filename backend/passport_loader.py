@@ -0,0 +1,216 @@
+"""
+Columnar Passport Loader
+Streams the passports collection into preallocated NumPy column arrays
+for the vectorized AI Risk Oracle models
+"""
+
+import numpy as np
+from typing import Dict, List, Optional, AsyncIterator, Tuple
+from datetime import datetime
+import logging
+
+from ai_models import ai_oracle_v2
+import score_stats
+
+logger = logging.getLogger(__name__)
+
+# Only the fields the models read are pulled from MongoDB
+PASSPORT_PROJECTION = {
+    '_id': 0,
+    'passport_id': 1,
+    'owner': 1,
+    'wallet_address': 1,
+    'credit_score': 1,
+    'poh_score': 1,
+    'pohScore': 1,
+    'badge_count': 1,
+    'badgeCount': 1,
+    'onchainActivity': 1,
+    'issued_at': 1,
+    'issuedAt': 1,
+    'reputation_score': 1,
+    'is_verified': 1,
+    'score_history': 1,
+    'score_stats': 1,
+    'data_sources': 1
+}
+
+# Numeric columns, named after the AIRiskOracleV2 user_data fields
+COLUMNS = [
+    'credit_score', 'poh_score', 'badge_count', 'onchain_activity',
+    'account_age_days', 'reputation_score', 'is_verified',
+    'tx_count', 'tx_volume_usd', 'total_borrowed', 'total_supplied',
+    'repayment_rate', 'liquidation_count', 'github_score', 'twitter_score',
+    'score_volatility', 'score_trend'
+]
+
+DEFAULT_BATCH_SIZE = 5000
+
+
+class PassportColumns:
+    """Column-oriented block of passports"""
+
+    def __init__(self, capacity: int):
+        self.count = 0
+        self.wallets: List[str] = []
+        self.addresses: List[Tuple[Optional[str], Optional[str]]] = []  # (wallet_address, owner)
+        self.passport_ids: List[str] = []
+        self.columns: Dict[str, np.ndarray] = {
+            name: np.zeros(capacity, dtype=np.float64) for name in COLUMNS
+        }
+
+    @property
+    def capacity(self) -> int:
+        return len(self.columns['credit_score'])
+
+    def _grow(self):
+        new_capacity = max(1, self.capacity * 2)
+        for name, values in self.columns.items():
+            grown = np.zeros(new_capacity, dtype=np.float64)
+            grown[:self.count] = values[:self.count]
+            self.columns[name] = grown
+
+    @classmethod
+    def from_documents(cls, passports: List[Dict], now: datetime = None) -> 'PassportColumns':
+        """Column block over passports already fetched (e.g. by a single-passport route)"""
+        now = now or datetime.utcnow()
+        block = cls(len(passports))
+        for passport in passports:
+            block.append(passport, now)
+        return block
+
+    def append(self, passport: Dict, now: datetime):
+        """Write one passport document into the next row
+
+        The row is computed before anything is written, so a document that
+        cannot be converted leaves the block unchanged.
+        """
+        values = _row_values(passport, now)
+        if self.count == self.capacity:
+            self._grow()
+
+        row = self.count
+        for name, value in values.items():
+            self.columns[name][row] = value
+
+        self.wallets.append(passport_wallet(passport))
+        self.addresses.append((passport.get('wallet_address'), passport.get('owner')))
+        self.passport_ids.append(passport.get('passport_id'))
+        self.count += 1
+
+    def trimmed_columns(self) -> Dict[str, np.ndarray]:
+        """Column views over the filled rows only"""
+        return {name: values[:self.count] for name, values in self.columns.items()}
+
+    def feature_matrix(self) -> np.ndarray:
+        """(N, 19) feature matrix ready for AIRiskOracleV2.assess_matrix"""
+        return ai_oracle_v2.feature_matrix_from_columns(self.trimmed_columns())
+
+
+def _row_values(passport: Dict, now: datetime) -> Dict[str, float]:
+    """Numeric column values of one passport document"""
+    # Both the camelCase (on-chain sync) and snake_case (PoH flow) schemas
+    values = {
+        'credit_score': _number(passport.get('credit_score')),
+        'poh_score': _number(passport.get('poh_score')) or _number(passport.get('pohScore')),
+        'badge_count': _number(passport.get('badge_count')) or _number(passport.get('badgeCount')),
+        'onchain_activity': _number(passport.get('onchainActivity')),
+        'account_age_days': _account_age_days(passport, now),
+        'reputation_score': _number(passport.get('reputation_score')),
+        'is_verified': 1.0 if passport.get('is_verified', False) else 0.0,
+    }
+
+    # Data sources (nested per-source documents, or the oracle's flat form)
+    sources = passport.get('data_sources')
+    sources = sources if isinstance(sources, dict) else {}
+    values.update({
+        'github_score': _source_value(sources, 'github', 'score', 'github_score', 0),
+        'twitter_score': _source_value(sources, 'twitter', 'score', 'twitter_score', 0),
+        'tx_count': _source_value(sources, 'wallet', 'tx_count', 'tx_count', 0),
+        'tx_volume_usd': _source_value(sources, 'wallet', 'volume_usd', 'tx_volume_usd', 0),
+        'total_borrowed': _source_value(sources, 'defi', 'borrowed', 'total_borrowed', 0),
+        'total_supplied': _source_value(sources, 'defi', 'supplied', 'total_supplied', 0),
+        'repayment_rate': _source_value(sources, 'defi', 'repayment_rate', 'repayment_rate', 100),
+        'liquidation_count': _source_value(sources, 'defi', 'liquidations', 'liquidation_count', 0),
+    })
+
+    # Score history is reduced on the way in, never kept per row
+    stats = passport.get('score_stats')
+    if stats:
+        values['score_volatility'] = score_stats.volatility(stats)
+        values['score_trend'] = score_stats.trend(stats)
+    else:
+        score_history = [
+            v for v in (_number(v, None) for v in passport.get('score_history') or []) if v is not None
+        ]
+        values['score_volatility'] = ai_oracle_v2._calculate_volatility(score_history)
+        values['score_trend'] = ai_oracle_v2._calculate_trend(score_history)
+    return values
+
+
+def _number(value, default: Optional[float] = 0.0) -> Optional[float]:
+    """Stored value as a float (numeric strings included); default when it is not a number"""
+    if isinstance(value, bool):
+        return float(value)
+    if isinstance(value, (int, float)):
+        return float(value) if np.isfinite(value) else default
+    if isinstance(value, str):
+        try:
+            number = float(value)
+        except ValueError:
+            return default
+        return number if np.isfinite(number) else default
+    return default
+
+
+def passport_wallet(passport: Dict) -> Optional[str]:
+    """Wallet address of a passport under either schema"""
+    return passport.get('wallet_address') or passport.get('owner')
+
+
+def _account_age_days(passport: Dict, now: datetime) -> int:
+    issued = passport.get('issued_at') or passport.get('issuedAt')
+    if isinstance(issued, str):
+        try:
+            issued = datetime.fromisoformat(issued.replace('Z', '+00:00'))
+        except ValueError:
+            return 0
+    if not isinstance(issued, datetime):
+        return 0
+    if issued.tzinfo is not None:
+        issued = issued.replace(tzinfo=None) - issued.utcoffset()
+    return max(0, (now - issued).days)
+
+
+def _source_value(sources: Dict, source: str, field: str, flat_key: str, default: float) -> float:
+    nested = sources.get(source)
+    if isinstance(nested, dict):
+        value = nested.get(field, default)
+    else:
+        value = sources.get(flat_key, default)
+    return _number(value, default)
+
+
+async def iter_passport_columns(
+    db,
+    query: Dict = None,
+    chunk_size: int = DEFAULT_BATCH_SIZE
+) -> AsyncIterator[PassportColumns]:
+    """Stream passports as fixed-size column blocks (bounded memory)"""
+    now = datetime.utcnow()
+    cursor = db.passports.find(query or {}, PASSPORT_PROJECTION).batch_size(chunk_size)
+
+    block = PassportColumns(chunk_size)
+    async for passport in cursor:
+        try:
+            block.append(passport, now)
+        except (TypeError, ValueError, KeyError, ZeroDivisionError) as e:
+            logger.warning(f"⚠️ Skipping passport {passport.get('passport_id')}: {e}")
+            continue
+        if block.count == chunk_size:
+            yield block
+            block = PassportColumns(chunk_size)
+
+    if block.count:
+        yield block
+
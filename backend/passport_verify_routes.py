@@ -86,25 +86,14 @@ async def get_passport_partner(
         if not passport:
             raise HTTPException(status_code=404, detail="Passport not found")
         
-        # Get AI assessment if available
+        # AI assessment through the same column path as the batch routes
+        from ai_models import ai_oracle_v2
+        from passport_loader import PassportColumns, passport_wallet
+        
         assessment = None
-        if passport.get('wallet_address') or passport.get('owner'):
-            wallet = passport.get('wallet_address') or passport.get('owner')
-            
-            # Try to get latest assessment
-            from ai_models import ai_oracle_v2
-            
-            user_data = {
-                'wallet_address': wallet,
-                'credit_score': passport.get('credit_score', 0),
-                'poh_score': passport.get('poh_score', 0) or passport.get('pohScore', 0),
-                'badge_count': passport.get('badge_count', 0) or passport.get('badgeCount', 0),
-                'account_age_days': (datetime.utcnow() - datetime.fromisoformat(
-                    passport.get('issued_at', passport.get('issuedAt', datetime.utcnow().isoformat()))
-                )).days if isinstance(passport.get('issued_at') or passport.get('issuedAt'), str) else 0
-            }
-            
-            assessment = ai_oracle_v2.assess_risk(user_data)
+        if passport_wallet(passport):
+            block = PassportColumns.from_documents([passport])
+            assessment = ai_oracle_v2.assess_matrix(block.feature_matrix(), block.wallets)[0]
         
         # Update API key usage
         await _db.api_keys.update_one(
@@ -0,0 +1,183 @@
+"""
+Population Percentile Index
+In-process sorted indexes over passport credit_score and oracle risk_score,
+answering percentile / rank queries in O(log n). Rebuilt from MongoDB once
+it is older than PERCENTILE_INDEX_MAX_AGE, so processes that never write
+scores (API workers, non-owners of a shard) still follow the population.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sortedcontainers import SortedList
+
+logger = logging.getLogger(__name__)
+
+INDEX_MAX_AGE = float(os.getenv("PERCENTILE_INDEX_MAX_AGE", "300"))  # seconds
+
+
+def credit_rank_value(credit_score: Optional[float], risk_score: Optional[float] = None) -> Optional[float]:
+    """credit_score on the 0-1000 scale the credit index ranks
+
+    The oracle stores its 0-100 risk score (higher is riskier) as the
+    passport's credit_score too; such values are converted, so they rank
+    alongside credit scores written by the scoring service and the chain.
+    """
+    if credit_score is None:
+        return None
+    if risk_score is not None and credit_score == risk_score:
+        return round((100 - risk_score) * 10, 2)
+    return credit_score
+
+
+class ScoreIndex:
+    """Sorted score list (O(log n) insert / remove) plus wallet -> score map"""
+
+    def __init__(self, higher_is_better: bool = True):
+        self.higher_is_better = higher_is_better
+        self._sorted = SortedList()
+        self._scores: Dict[str, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._sorted)
+
+    def load(self, scores: Dict[str, float]):
+        """Replace the whole index (initial build)"""
+        self._scores = dict(scores)
+        self._sorted = SortedList(self._scores.values())
+
+    def update(self, wallet: str, score: float):
+        """Insert or move one wallet's score"""
+        old = self._scores.get(wallet)
+        if old == score:
+            return
+        if old is not None:
+            self._sorted.remove(old)
+        self._sorted.add(score)
+        self._scores[wallet] = score
+
+    def remove(self, wallet: str):
+        old = self._scores.pop(wallet, None)
+        if old is not None:
+            self._sorted.remove(old)
+
+    def get(self, wallet: str) -> Optional[float]:
+        return self._scores.get(wallet)
+
+    def rank(self, score: float) -> Dict:
+        """Percentile and rank of a score against the population"""
+        total = len(self._sorted)
+        if total == 0:
+            return {'score': score, 'percentile': None, 'rank': None, 'top_percent': None, 'population': 0}
+
+        lower = self._sorted.bisect_left(score)
+        higher = total - self._sorted.bisect_right(score)
+        worse, better = (lower, higher) if self.higher_is_better else (higher, lower)
+        rank = better + 1
+
+        return {
+            'score': score,
+            'percentile': round(100 * worse / total, 2),
+            'rank': rank,
+            'top_percent': round(100 * rank / total, 2),
+            'population': total
+        }
+
+
+class PopulationIndex:
+    """Percentile indexes for every passport in the population"""
+
+    def __init__(self, max_age: float = INDEX_MAX_AGE, clock: Callable[[], float] = time.monotonic):
+        self.credit_score = ScoreIndex(higher_is_better=True)
+        self.risk_score = ScoreIndex(higher_is_better=False)
+        self.built = False
+        self.max_age = max_age
+        self.clock = clock
+        self.built_at: Optional[float] = None
+        self._rebuild: Optional[asyncio.Task] = None
+        self._build_lock = asyncio.Lock()
+        # Updates made while a build is scanning; replayed over the fresh index
+        self._pending: Optional[List[Tuple[str, Optional[float], Optional[float]]]] = None
+
+    async def build(self, db, batch_size: int = 5000):
+        """Full build from the passports collection
+
+        The scan can miss writes that land while it runs, so incremental
+        updates made during the build are replayed after the swap.
+        """
+        async with self._build_lock:
+            credit_scores, risk_scores = {}, {}
+            started = self.clock()
+            self._pending = []
+            try:
+                await self._scan(db, batch_size, credit_scores, risk_scores)
+                self.credit_score.load(credit_scores)
+                self.risk_score.load(risk_scores)
+                pending = self._pending
+            finally:
+                self._pending = None
+
+            for wallet, credit_score, risk_score in pending:
+                self.update(wallet, credit_score=credit_score, risk_score=risk_score)
+            self.built = True
+            self.built_at = started
+            logger.info(
+                f"📊 Percentile index built: {len(self.credit_score)} passports "
+                f"({len(pending)} updates replayed)"
+            )
+
+    async def _scan(self, db, batch_size: int, credit_scores: Dict, risk_scores: Dict):
+        cursor = db.passports.find(
+            {},
+            {'_id': 0, 'owner': 1, 'wallet_address': 1, 'credit_score': 1, 'risk_score': 1}
+        ).batch_size(batch_size)
+
+        async for passport in cursor:
+            wallet = passport.get('wallet_address') or passport.get('owner')
+            if not wallet:
+                continue
+            credit_score = credit_rank_value(passport.get('credit_score'), passport.get('risk_score'))
+            if credit_score is not None:
+                credit_scores[wallet] = credit_score
+            if passport.get('risk_score') is not None:
+                risk_scores[wallet] = passport['risk_score']
+
+    async def ensure_built(self, db):
+        """Build on first use; once stale, rebuild in the background and keep serving"""
+        if not self.built:
+            await self.build(db)
+        elif self.clock() - self.built_at > self.max_age and (self._rebuild is None or self._rebuild.done()):
+            self._rebuild = asyncio.create_task(self._rebuild_quietly(db))
+
+    async def _rebuild_quietly(self, db):
+        try:
+            await self.build(db)
+        except Exception as e:
+            logger.error(f"❌ Percentile index rebuild failed: {e}")
+
+    def update(self, wallet: str, credit_score: float = None, risk_score: float = None):
+        """Incremental refresh after a passport score is written
+
+        credit_score is expected on the index's scale (see credit_rank_value).
+        """
+        if self._pending is not None:
+            self._pending.append((wallet, credit_score, risk_score))
+        if credit_score is not None:
+            self.credit_score.update(wallet, credit_score)
+        if risk_score is not None:
+            self.risk_score.update(wallet, risk_score)
+
+    def lookup(self, wallet: str) -> Dict:
+        """Percentile / rank of a wallet on both indexes"""
+        result = {}
+        for name, index in (('credit_score', self.credit_score), ('risk_score', self.risk_score)):
+            score = index.get(wallet)
+            result[name] = index.rank(score) if score is not None else None
+        return result
+
+
+# Singleton instance
+population_index = PopulationIndex()
@@ -355,25 +355,22 @@ async def issue_badge(request: IssueRequest):
         if existing_badge:
             raise HTTPException(400, "Badge already issued for this identity")
         
-        # Mint SBT on-chain
+        # Broadcast the SBT mint; the receipt tracker records the outcome
         from blockchain import polygon_integration
+        from mint_queue import get_mint_queue
+        from receipt_tracker import get_receipt_tracker, pending_mint_record
         
-        mint_result = await polygon_integration.mint_badge(
-            request.wallet_address,
-            "proof_of_humanity",
-            request.proof_hash
-        )
-        
-        if not mint_result:
+        if not polygon_integration.account:
+            raise HTTPException(500, "Failed to mint badge on-chain")
+        try:
+            tx_hash, batch_index = await get_mint_queue().submit(
+                request.wallet_address,
+                "proof_of_humanity",
+                request.proof_hash
+            )
+        except Exception as e:
+            logger.error(f"Mint broadcast failed: {e}")
             raise HTTPException(500, "Failed to mint badge on-chain")
-        
-        # Extract tx_hash from result
-        if isinstance(mint_result, dict):
-            tx_hash = mint_result.get('tx_hash')
-            if not tx_hash:
-                raise HTTPException(500, "No transaction hash received")
-        else:
-            tx_hash = mint_result
         
         token_id = await db.badges.count_documents({}) + 1
         
@@ -384,15 +381,16 @@ async def issue_badge(request: IssueRequest):
             'nullifier': request.nullifier,
             'proof_hash': request.proof_hash,
             'token_id': token_id,
-            'tx_hash': tx_hash,
+            **pending_mint_record(tx_hash, batch_index),
             'score': request.public_signals[0],
             'verification_level': polygon_id_service._get_verification_level(request.public_signals[0]),
             'issued_at': datetime.now(timezone.utc).isoformat()
         }
         
         await db.badges.insert_one(badge)
+        get_receipt_tracker(db).track(tx_hash)
         
-        logger.info(f"Badge #{token_id} issued to {request.wallet_address}")
+        logger.info(f"Badge #{token_id} submitted for {request.wallet_address}")
         
         # Auto-update or create passport
         await update_or_create_passport(db, request.wallet_address)
@@ -402,7 +400,9 @@ async def issue_badge(request: IssueRequest):
             'tx_hash': tx_hash,
             'badge_id': badge['id'],
             'token_id': token_id,
-            'message': 'ZK-ID Badge issued successfully'
+            'status': badge['status'],
+            'status_url': f"/api/badges/mint/{tx_hash}",
+            'message': 'ZK-ID Badge mint submitted'
         }
         
     except HTTPException:
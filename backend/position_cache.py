@@ -0,0 +1,194 @@
+"""
+Block-pinned DeFi Position Cache
+Cached positions remember the block they were read at. Entries past their
+freshness window are served stale while a background refresh runs;
+entries older than a relevant on-chain event for the wallet are never
+served.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from web3 import Web3
+
+from redis_cache import get_cache
+from web3_pool import run_web3, submit_web3
+
+logger = logging.getLogger(__name__)
+
+FRESH_TTL = int(os.getenv("DEFI_CACHE_FRESH_TTL", "300"))   # served without refresh
+MAX_STALE = int(os.getenv("DEFI_CACHE_MAX_STALE", "3600"))  # served while refreshing
+WATCH_INTERVAL = float(os.getenv("DEFI_WATCH_INTERVAL", "2.0"))
+MAX_LOG_RANGE = 1000  # blocks per eth_getLogs request
+
+# Aave V3 Pool events that change an account's position, and the topic
+# index holding the affected account
+AAVE_POSITION_EVENTS = {
+    bytes(Web3.keccak(text="Borrow(address,address,address,uint256,uint8,uint256,uint16)")): 2,  # onBehalfOf
+    bytes(Web3.keccak(text="Repay(address,address,address,uint256,bool)")): 2,                   # user
+    bytes(Web3.keccak(text="LiquidationCall(address,address,address,uint256,uint256,address,bool)")): 3,  # user
+    bytes(Web3.keccak(text="Supply(address,address,address,uint256,uint16)")): 2,                # onBehalfOf
+    bytes(Web3.keccak(text="Withdraw(address,address,address,uint256)")): 2,                     # user
+}
+
+
+class PositionCache:
+    """Redis-backed cache of {data, block, fetched_at} entries per (kind, wallet)"""
+
+    def __init__(self, cache=None, fresh_ttl: int = FRESH_TTL, max_stale: int = MAX_STALE):
+        self.cache = cache if cache is not None else get_cache()
+        self.fresh_ttl = fresh_ttl
+        self.max_stale = max_stale
+        self.counters = {'fresh': 0, 'stale': 0, 'invalidated': 0, 'misses': 0, 'rejected': 0}
+
+    @staticmethod
+    def _key(kind: str, wallet_address: str) -> str:
+        return f"{kind}:{wallet_address.lower()}"
+
+    @staticmethod
+    def _dirty_key(wallet_address: str) -> str:
+        return f"defi:dirty:{wallet_address.lower()}"
+
+    def _dirty_block(self, wallet_address: str) -> int:
+        return self.cache.get(self._dirty_key(wallet_address)) or 0
+
+    def lookup(self, kind: str, wallet_address: str) -> Tuple[Optional[Any], bool]:
+        """(data or None, needs_refresh)"""
+        entry = self.cache.get(self._key(kind, wallet_address))
+        if not entry:
+            self.counters['misses'] += 1
+            return None, True
+
+        if self._dirty_block(wallet_address) > entry['block']:
+            # A position-changing event landed after this read
+            self.counters['invalidated'] += 1
+            return None, True
+
+        if time.time() - entry['fetched_at'] > self.fresh_ttl:
+            self.counters['stale'] += 1
+            return entry['data'], True
+
+        self.counters['fresh'] += 1
+        return entry['data'], False
+
+    def store(self, kind: str, wallet_address: str, data: Any, block: int):
+        """Cache data read at block, unless an event after that block invalidated it"""
+        if self._dirty_block(wallet_address) > block:
+            self.counters['rejected'] += 1
+            return
+        self.cache.set(
+            self._key(kind, wallet_address),
+            {'data': data, 'block': block, 'fetched_at': time.time()},
+            ttl=self.max_stale
+        )
+
+    def invalidate(self, wallet_address: str, block: int):
+        """Mark every position of the wallet read before block as outdated"""
+        if block > self._dirty_block(wallet_address):
+            self.cache.set(self._dirty_key(wallet_address), block, ttl=self.max_stale)
+
+    def stats(self) -> Dict:
+        served = self.counters['fresh'] + self.counters['stale']
+        lookups = served + self.counters['invalidated'] + self.counters['misses']
+        return {
+            'enabled': getattr(self.cache, 'enabled', True),
+            'fresh_ttl': self.fresh_ttl,
+            'max_stale': self.max_stale,
+            **self.counters,
+            'hit_rate': round(served / lookups, 4) if lookups else 0.0
+        }
+
+
+class BackgroundRefresher:
+    """Runs at most one refresh per key at a time on the shared web3 pool"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight = set()
+
+    def submit(self, keys: List[str], fn, *args) -> bool:
+        with self._lock:
+            keys = [key for key in keys if key not in self._in_flight]
+            if not keys:
+                return False
+            self._in_flight.update(keys)
+
+        def run():
+            try:
+                fn(*args)
+            except Exception as e:
+                logger.warning(f"⚠️ Background position refresh failed: {e}")
+            finally:
+                with self._lock:
+                    self._in_flight.difference_update(keys)
+
+        try:
+            submit_web3(run)
+        except RuntimeError as e:  # pool shut down (process exiting)
+            with self._lock:
+                self._in_flight.difference_update(keys)
+            logger.warning(f"⚠️ Background position refresh not scheduled: {e}")
+            return False
+        return True
+
+
+class AaveInvalidationWatcher:
+    """Follows new blocks and invalidates wallets touched by Aave position events"""
+
+    def __init__(self, w3: Web3, pool_address: str, cache: PositionCache, poll_interval: float = WATCH_INTERVAL):
+        self.w3 = w3
+        self.pool_address = Web3.to_checksum_address(pool_address)
+        self.cache = cache
+        self.poll_interval = poll_interval
+        self.last_block = None
+        self.running = False
+
+    async def run(self):
+        self.running = True
+        logger.info("👀 Aave invalidation watcher started")
+        while self.running:
+            try:
+                await self.poll()
+            except Exception as e:
+                logger.warning(f"⚠️ Aave invalidation watcher error: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    def stop(self):
+        self.running = False
+
+    async def poll(self) -> int:
+        """Scan blocks since the last poll; returns the number of invalidations"""
+        latest = await run_web3(lambda: self.w3.eth.block_number)
+        if self.last_block is None:
+            self.last_block = latest
+            return 0
+
+        invalidated = 0
+        while self.last_block < latest:
+            from_block = self.last_block + 1
+            to_block = min(latest, self.last_block + MAX_LOG_RANGE)
+            logs = await run_web3(self.w3.eth.get_logs, {
+                'address': self.pool_address,
+                'fromBlock': from_block,
+                'toBlock': to_block,
+                'topics': [[Web3.to_hex(topic) for topic in AAVE_POSITION_EVENTS]]
+            })
+            for log in logs:
+                wallet_address = self.account_from_log(log)
+                if wallet_address:
+                    self.cache.invalidate(wallet_address, log['blockNumber'])
+                    invalidated += 1
+            self.last_block = to_block
+        return invalidated
+
+    @staticmethod
+    def account_from_log(log) -> Optional[str]:
+        topics = log['topics']
+        index = AAVE_POSITION_EVENTS.get(bytes(topics[0])) if topics else None
+        if index is None or len(topics) <= index:
+            return None
+        return Web3.to_checksum_address(bytes(topics[index])[-20:])
@@ -0,0 +1,209 @@
+"""
+Mint Receipt Tracker
+Mint endpoints return as soon as the transaction is broadcast and leave a
+pending badge record. This tracker polls receipts for every pending hash
+in batches, records gas and status on the badge, and pushes completion
+over the WebSocket manager. Fee-bumped replacements are added to the
+record's tx_hashes, so a restarted process still finds whichever was mined. Badges that failed inside a batch mint are
+handed back to the mint queue, which retries them individually.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, List, Optional
+
+from web3 import Web3
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = float(os.getenv("RECEIPT_POLL_INTERVAL", "2.0"))
+BATCH_SIZE = int(os.getenv("RECEIPT_BATCH_SIZE", "100"))  # receipts per poll (one JSON-RPC batch)
+DROP_AFTER = float(os.getenv("RECEIPT_DROP_AFTER", "1800"))  # give up on a tx after this many seconds
+
+PENDING = "pending"
+CONFIRMED = "confirmed"
+FAILED = "failed"
+DROPPED = "dropped"
+
+
+class ReceiptTracker:
+    """Resolves pending mint transactions in the background"""
+
+    def __init__(
+        self,
+        db,
+        chain,
+        ws=None,
+        poll_interval: float = POLL_INTERVAL,
+        batch_size: int = BATCH_SIZE,
+        drop_after: float = DROP_AFTER,
+        clock=time.monotonic,
+        queue=None
+    ):
+        self.db = db
+        self.chain = chain  # PolygonIntegration
+        self.ws = ws
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.drop_after = drop_after
+        self.clock = clock
+        self.queue = queue  # MintQueue
+        self.pending: Dict[str, float] = {}  # submitted tx hash -> tracked since
+        self.hashes: Dict[str, List[str]] = {}  # submitted tx hash -> every hash broadcast for it
+        self.running = False
+        self._task: Optional[asyncio.Task] = None
+        self.counters = {'tracked': 0, 'confirmed': 0, 'failed': 0, 'dropped': 0, 'polls': 0, 'retried': 0}
+
+    async def start(self):
+        """Resume tracking mints left pending by a previous process"""
+        async for badge in self.db.badges.find({'status': PENDING}, {'tx_hash': 1, 'tx_hashes': 1}):
+            if badge.get('tx_hash'):
+                self.track(badge['tx_hash'], badge.get('tx_hashes'))
+        self.running = True
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"🧾 Receipt tracker started ({len(self.pending)} pending)")
+
+    async def stop(self):
+        self.running = False
+        if self._task:
+            self._task.cancel()
+
+    def track(self, tx_hash: str, hashes: Optional[List[str]] = None):
+        if tx_hash not in self.pending:
+            self.pending[tx_hash] = self.clock()
+            self.counters['tracked'] += 1
+        known = self.hashes.setdefault(tx_hash, [tx_hash])
+        known.extend(h for h in hashes or [] if h not in known)
+
+    async def _run(self):
+        while self.running:
+            try:
+                await self.poll_once()
+            except Exception as e:
+                logger.error(f"❌ Receipt poll failed: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    async def poll_once(self) -> int:
+        """Check up to batch_size pending transactions; returns how many resolved"""
+        if not self.pending:
+            return 0
+        self.counters['polls'] += 1
+        hashes = sorted(self.pending, key=self.pending.get)[:self.batch_size]
+        candidates = {tx_hash: self.hashes.get(tx_hash, [tx_hash]) for tx_hash in hashes}
+        receipts = await self.chain.fetch_receipts([h for known in candidates.values() for h in known])
+
+        resolved = 0
+        for tx_hash in hashes:
+            receipt = next((receipts[h] for h in candidates[tx_hash] if receipts.get(h) is not None), None)
+            if receipt is not None:
+                await self._resolve(tx_hash, receipt)
+                resolved += 1
+            elif self.clock() - self.pending[tx_hash] > self.drop_after:
+                await self._drop(tx_hash)
+                resolved += 1
+
+        await self._record_replacements(await self.chain.replace_stuck())
+        return resolved
+
+    async def _record_replacements(self, replacements: Dict):
+        """Persist replacement hashes so they are still polled after a restart"""
+        for original, replacement in replacements.items():
+            tx_hash, replacement = Web3.to_hex(original), Web3.to_hex(replacement)
+            if tx_hash not in self.pending:
+                continue
+            self.track(tx_hash, [replacement])
+            await self.db.badges.update_many({'tx_hash': tx_hash}, {'$addToSet': {'tx_hashes': replacement}})
+
+    async def _resolve(self, tx_hash: str, receipt):
+        self.pending.pop(tx_hash, None)
+        self.hashes.pop(tx_hash, None)
+        status = CONFIRMED if receipt['status'] == 1 else FAILED
+        gas_used = receipt['gasUsed']
+        gas_fee = Web3.from_wei(gas_used * receipt['effectiveGasPrice'], 'ether')
+        mined_hash = Web3.to_hex(receipt['transactionHash'])
+
+        update = {
+            'status': status,
+            'gas_used': gas_used,
+            'gas_fee': str(gas_fee),
+            'block_number': receipt['blockNumber'],
+            'confirmed_at': time.time()
+        }
+        if mined_hash != tx_hash:
+            update['mined_tx_hash'] = mined_hash  # a fee-bumped replacement was mined
+        await self.db.badges.update_many({'tx_hash': tx_hash}, {'$set': update})
+        self.counters[status] += 1
+        if self.queue is not None:
+            await self._settle_batch(tx_hash, receipt)
+
+        logger.info(f"🧾 Mint {tx_hash} {status} in block {receipt['blockNumber']} (gas {gas_used})")
+        event = {'tx_hash': tx_hash, **update}
+        await self._notify(status, event)
+
+    async def _settle_batch(self, tx_hash: str, receipt):
+        """Re-point badges that failed inside a batch at their individual retry"""
+        retries = await self.queue.settle(tx_hash, receipt)
+        for index, retry_hash in retries.items():
+            query = {'tx_hash': tx_hash, 'batch_index': index}
+            if retry_hash:
+                await self.db.badges.update_many(
+                    query, {'$set': {**pending_mint_record(retry_hash), 'batch_tx_hash': tx_hash}}
+                )
+                self.track(retry_hash)
+                self.counters['retried'] += 1
+            else:
+                await self.db.badges.update_many(query, {'$set': {'status': FAILED}})
+                await self._notify(FAILED, {'tx_hash': tx_hash, 'batch_index': index, 'status': FAILED})
+    
+    async def _drop(self, tx_hash: str):
+        self.pending.pop(tx_hash, None)
+        self.hashes.pop(tx_hash, None)
+        await self.db.badges.update_many({'tx_hash': tx_hash}, {'$set': {'status': DROPPED}})
+        self.counters['dropped'] += 1
+        logger.warning(f"⚠️ Mint {tx_hash} not mined after {self.drop_after}s, marked dropped")
+        await self._notify(DROPPED, {'tx_hash': tx_hash, 'status': DROPPED})
+
+    async def _notify(self, status: str, event: Dict):
+        if self.ws is None:
+            return
+        try:
+            if status == CONFIRMED:
+                await self.ws.broadcast_badge_minted(event)
+            else:
+                await self.ws.broadcast('mint_failed', event)
+        except Exception as e:
+            logger.error(f"❌ Mint status broadcast failed: {e}")
+
+    def stats(self) -> Dict:
+        oldest = min(self.pending.values(), default=None)
+        return {
+            'pending': len(self.pending),
+            'oldest_pending_s': round(self.clock() - oldest, 1) if oldest is not None else None,
+            **self.counters
+        }
+
+
+def pending_mint_record(tx_hash: str, batch_index: Optional[int] = None) -> Dict:
+    """Fields every freshly broadcast badge record starts with"""
+    record = {'tx_hash': tx_hash, 'tx_hashes': [tx_hash], 'status': PENDING, 'gas_used': None, 'gas_fee': None}
+    if batch_index is not None:
+        record['batch_index'] = batch_index  # position in a batch mint
+    return record
+
+
+receipt_tracker = None
+
+def get_receipt_tracker(db) -> ReceiptTracker:
+    """Get or create the receipt tracker"""
+    global receipt_tracker
+    if receipt_tracker is None:
+        from blockchain import polygon_integration
+        from mint_queue import get_mint_queue
+        try:
+            from websocket_server import ws_manager
+        except ImportError:
+            ws_manager = None
+        receipt_tracker = ReceiptTracker(db, polygon_integration, ws_manager, queue=get_mint_queue())
+    return receipt_tracker
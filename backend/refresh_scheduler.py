@@ -0,0 +1,197 @@
+"""
+Priority-based Refresh Scheduler
+Keeps each passport's next-due refresh time in a heap; hot wallets
+(volatile, eventful, in partner demand) refresh within seconds while
+dormant ones back off to hours
+"""
+
+import heapq
+import math
+import os
+import time
+from typing import Callable, Dict, List, Optional
+
+MIN_INTERVAL = float(os.getenv("ORACLE_MIN_INTERVAL", "15"))       # 15 seconds
+MAX_INTERVAL = float(os.getenv("ORACLE_MAX_INTERVAL", "21600"))    # 6 hours
+RETRY_INTERVAL = float(os.getenv("ORACLE_RETRY_INTERVAL", "60"))   # 1 minute
+SIGNAL_HALF_LIFE = float(os.getenv("ORACLE_SIGNAL_HALF_LIFE", "3600"))
+
+# Score volatility (std / 1000) treated as fully "hot": a 50-point std
+VOLATILITY_SCALE = 0.05
+
+
+class RefreshScheduler:
+    """Min-heap of (next_due, wallet) with lazily discarded stale entries"""
+
+    def __init__(
+        self,
+        min_interval: float = MIN_INTERVAL,
+        max_interval: float = MAX_INTERVAL,
+        retry_interval: float = RETRY_INTERVAL,
+        half_life: float = SIGNAL_HALF_LIFE,
+        clock: Callable[[], float] = time.time
+    ):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.retry_interval = retry_interval
+        self.half_life = half_life
+        self.clock = clock
+        self._heap = []
+        self._state: Dict[str, Dict] = {}
+
+    def __len__(self) -> int:
+        return len(self._state)
+
+    def __contains__(self, wallet: str) -> bool:
+        return wallet in self._state
+
+    def wallets(self) -> List[str]:
+        return list(self._state)
+
+    # ---- priority ----
+
+    def _decay(self, state: Dict, now: float):
+        elapsed = now - state['signals_at']
+        if elapsed > 0:
+            factor = 0.5 ** (elapsed / self.half_life)
+            state['events'] *= factor
+            state['demand'] *= factor
+            state['signals_at'] = now
+
+    def heat(self, wallet: str, now: float = None) -> float:
+        """0 (dormant) .. 1 (hot): any one strong signal makes a wallet hot"""
+        state = self._state.get(wallet)
+        if state is None:
+            return 0.0
+        self._decay(state, now if now is not None else self.clock())
+
+        volatility = min(1.0, state['volatility'] / VOLATILITY_SCALE)
+        events = 1 - math.exp(-state['events'])
+        demand = 1 - math.exp(-state['demand'])
+        return 1 - (1 - volatility) * (1 - events) * (1 - demand)
+
+    def interval(self, wallet: str, now: float = None) -> float:
+        """Refresh interval, interpolated geometrically between min and max"""
+        heat = self.heat(wallet, now)
+        return self.max_interval * (self.min_interval / self.max_interval) ** heat
+
+    # ---- scheduling ----
+
+    def _push(self, wallet: str, due_at: float):
+        state = self._state[wallet]
+        state['due_at'] = due_at
+        heapq.heappush(self._heap, (due_at, wallet))
+
+    def _pull_forward(self, wallet: str, due_at: float):
+        state = self._state[wallet]
+        # In-flight wallets are rescheduled when their refresh completes
+        if state['due_at'] is not None and due_at < state['due_at']:
+            self._push(wallet, due_at)
+
+    def add(self, wallet: str, volatility: float = 0.0, due_at: float = None):
+        """Track a wallet; new wallets are due immediately unless told otherwise"""
+        if wallet in self._state:
+            return
+        now = self.clock()
+        self._state[wallet] = {
+            'due_at': None,
+            'volatility': volatility,
+            'events': 0.0,
+            'demand': 0.0,
+            'signals_at': now
+        }
+        self._push(wallet, due_at if due_at is not None else now)
+
+    def remove(self, wallet: str):
+        self._state.pop(wallet, None)
+
+    def record_event(self, wallet: str, weight: float = 1.0):
+        """On-chain / score event: raises priority and pulls the refresh forward"""
+        self._record_signal(wallet, 'events', weight)
+
+    def record_demand(self, wallet: str, weight: float = 1.0):
+        """Partner API request for the wallet"""
+        self._record_signal(wallet, 'demand', weight)
+
+    def _record_signal(self, wallet: str, signal: str, weight: float):
+        if wallet not in self._state:
+            return
+        now = self.clock()
+        state = self._state[wallet]
+        self._decay(state, now)
+        state[signal] += weight
+        self._pull_forward(wallet, now + self.interval(wallet, now))
+
+    def bump(self, wallet: str, delay: float = 0.0):
+        """Make a wallet due within delay seconds (adds it if unknown)"""
+        if wallet not in self._state:
+            self.add(wallet, due_at=self.clock() + delay)
+        else:
+            self._pull_forward(wallet, self.clock() + delay)
+
+    def expedite(self, wallet: str):
+        """Refresh ahead of every other due wallet (adds it if unknown)
+
+        A wallet already in flight is refreshed again once it completes, since
+        the running refresh may have collected its data before the event.
+        """
+        if wallet not in self._state:
+            self.add(wallet, due_at=0.0)
+        elif self._state[wallet]['due_at'] is None:
+            self._state[wallet]['rerun'] = True
+        else:
+            self._push(wallet, 0.0)
+
+    def mark_refreshed(self, wallet: str, volatility: float = None):
+        """Reschedule after a successful refresh"""
+        if wallet not in self._state:
+            self.add(wallet, volatility or 0.0, due_at=float('inf'))
+        state = self._state[wallet]
+        if volatility is not None:
+            state['volatility'] = volatility
+        if state.pop('rerun', False):
+            self._push(wallet, 0.0)
+            return
+        now = self.clock()
+        self._push(wallet, now + self.interval(wallet, now))
+
+    def mark_failed(self, wallet: str):
+        """Retry a failed refresh after a short back-off"""
+        if wallet in self._state:
+            self._push(wallet, self.clock() + min(self.retry_interval, self.interval(wallet)))
+
+    def pop_due(self, limit: int, now: float = None) -> List[str]:
+        """Up to limit due wallets, most overdue first; they are in flight until marked"""
+        now = now if now is not None else self.clock()
+        due = []
+        while self._heap and len(due) < limit and self._heap[0][0] <= now:
+            due_at, wallet = heapq.heappop(self._heap)
+            state = self._state.get(wallet)
+            if state is None or state['due_at'] != due_at:
+                continue  # stale heap entry
+            state['due_at'] = None
+            due.append(wallet)
+        return due
+
+    def seconds_until_due(self, now: float = None) -> Optional[float]:
+        """Time until the next wallet is due (None when nothing is scheduled)"""
+        now = now if now is not None else self.clock()
+        while self._heap:
+            due_at, wallet = self._heap[0]
+            state = self._state.get(wallet)
+            if state is None or state['due_at'] != due_at:
+                heapq.heappop(self._heap)
+                continue
+            return max(0.0, due_at - now)
+        return None
+
+    def stats(self) -> Dict:
+        now = self.clock()
+        scheduled = [s['due_at'] for s in self._state.values() if s['due_at'] is not None]
+        return {
+            'tracked_wallets': len(self._state),
+            'in_flight': len(self._state) - len(scheduled),
+            'due_now': sum(1 for due_at in scheduled if due_at <= now),
+            'min_interval': self.min_interval,
+            'max_interval': self.max_interval
+        }
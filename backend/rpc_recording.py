@@ -0,0 +1,68 @@
+"""
+Recorded JSON-RPC Providers
+RecordingProvider captures a live provider's responses to a file;
+ReplayProvider serves them back (optionally with simulated latency) so
+benchmarks and tests run deterministically without an RPC endpoint
+"""
+
+import json
+import time
+from typing import Any, Dict
+
+from web3.providers.base import BaseProvider
+
+
+def request_key(method: str, params: Any) -> str:
+    """Stable key for a JSON-RPC request"""
+    return json.dumps(
+        [method, params], sort_keys=True,
+        default=lambda value: "0x" + bytes(value).hex() if isinstance(value, (bytes, bytearray)) else str(value)
+    )
+
+
+class RecordingProvider(BaseProvider):
+    """Forwards requests to provider and remembers every response"""
+
+    def __init__(self, provider: BaseProvider):
+        super().__init__()
+        self.provider = provider
+        self.recording: Dict[str, Any] = {}
+
+    def make_request(self, method, params):
+        response = self.provider.make_request(method, params)
+        self.recording[request_key(method, params)] = response
+        return response
+
+    def is_connected(self, show_traceback: bool = False) -> bool:
+        return self.provider.is_connected()
+
+    def save(self, path: str):
+        with open(path, 'w') as f:
+            json.dump(self.recording, f)
+
+
+class ReplayProvider(BaseProvider):
+    """Answers requests from a recording; unknown requests raise KeyError"""
+
+    def __init__(self, recording: Dict[str, Any], latency: float = 0.0):
+        super().__init__()
+        self.recording = recording
+        self.latency = latency
+        self.requests = 0
+
+    @classmethod
+    def load(cls, path: str, latency: float = 0.0) -> "ReplayProvider":
+        with open(path) as f:
+            return cls(json.load(f), latency)
+
+    def make_request(self, method, params):
+        self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+        key = request_key(method, params)
+        if key not in self.recording:
+            raise KeyError(f"No recorded response for {method} {params}")
+        return self.recording[key]
+
+    def is_connected(self, show_traceback: bool = False) -> bool:
+        return True
@@ -0,0 +1,209 @@
+"""
+Latency-aware RPC Router
+Spreads JSON-RPC traffic over a pool of endpoints for the same chain.
+Reads go to the fastest healthy endpoint (EWMA latency, penalised by its
+error rate) and are hedged to the next one when the answer takes longer
+than that endpoint's recent latency percentile. Writes and node-stateful
+calls (nonces, receipts, filters) stay pinned to one endpoint.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional
+
+from source_guard import CircuitBreaker, LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+EWMA_ALPHA = float(os.getenv("RPC_EWMA_ALPHA", "0.2"))
+HEDGE_PERCENTILE = float(os.getenv("RPC_HEDGE_PERCENTILE", "0.95"))
+HEDGE_MIN_DELAY = float(os.getenv("RPC_HEDGE_MIN_DELAY", "0.05"))
+HEDGE_MAX_DELAY = float(os.getenv("RPC_HEDGE_MAX_DELAY", "2.0"))
+HEDGE_DEFAULT_DELAY = float(os.getenv("RPC_HEDGE_DEFAULT_DELAY", "0.5"))  # until enough samples
+HEDGE_MIN_SAMPLES = 20
+ROUTER_THREADS = int(os.getenv("RPC_ROUTER_THREADS", "32"))
+ENDPOINT_FAILURES = int(os.getenv("RPC_ENDPOINT_FAILURES", "3"))
+ENDPOINT_COOLDOWN = float(os.getenv("RPC_ENDPOINT_COOLDOWN", "30"))
+
+# Must reach the node that saw the write (or holds the filter)
+PINNED_METHODS = {
+    "eth_sendRawTransaction", "eth_sendTransaction", "eth_getTransactionCount",
+    "eth_getTransactionReceipt", "eth_newFilter", "eth_newBlockFilter",
+    "eth_getFilterChanges", "eth_getFilterLogs", "eth_uninstallFilter",
+}
+# JSON-RPC error codes that mean the endpoint, not the request, failed
+ENDPOINT_ERROR_CODES = {-32005}  # limit exceeded
+
+
+class EndpointError(Exception):
+    """The endpoint answered with a rate-limit or similar error"""
+
+
+class EndpointState:
+    """Latency and health tracking for one endpoint"""
+
+    def __init__(self, client, index: int, breaker: CircuitBreaker = None):
+        self.client = client
+        self.index = index
+        self.breaker = breaker or CircuitBreaker(ENDPOINT_FAILURES, ENDPOINT_COOLDOWN)
+        self.ewma_latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.recent = deque(maxlen=200)
+        self.histogram = LatencyHistogram()
+        self._lock = threading.Lock()
+        self.counters = {'requests': 0, 'errors': 0, 'hedges_sent': 0, 'hedges_won': 0}
+
+    @property
+    def url(self) -> str:
+        return self.client.url
+
+    @property
+    def healthy(self) -> bool:
+        return self.breaker.state != 'open'
+
+    def score(self) -> float:
+        """Expected latency; errors make an endpoint look slower"""
+        return (self.ewma_latency or 0.0) * (1 + 10 * self.error_rate)
+
+    def observe_success(self, seconds: float):
+        with self._lock:
+            self.counters['requests'] += 1
+            self.ewma_latency = seconds if self.ewma_latency is None else (
+                EWMA_ALPHA * seconds + (1 - EWMA_ALPHA) * self.ewma_latency
+            )
+            self.error_rate *= 1 - EWMA_ALPHA
+            self.recent.append(seconds)
+            self.histogram.observe(seconds)
+            self.breaker.record_success()
+
+    def observe_failure(self):
+        with self._lock:
+            self.counters['requests'] += 1
+            self.counters['errors'] += 1
+            self.error_rate = EWMA_ALPHA + (1 - EWMA_ALPHA) * self.error_rate
+            self.breaker.record_failure()
+
+    def hedge_delay(self) -> float:
+        """Wait this long for the endpoint before asking another one"""
+        with self._lock:
+            if len(self.recent) < HEDGE_MIN_SAMPLES:
+                return HEDGE_DEFAULT_DELAY
+            samples = sorted(self.recent)
+        delay = samples[min(len(samples) - 1, int(HEDGE_PERCENTILE * len(samples)))]
+        return max(HEDGE_MIN_DELAY, min(HEDGE_MAX_DELAY, delay))
+
+    def stats(self) -> Dict:
+        return {
+            'url': self.url,
+            'state': self.breaker.state,
+            'ewma_ms': round(self.ewma_latency * 1000, 2) if self.ewma_latency is not None else None,
+            'error_rate': round(self.error_rate, 4),
+            'hedge_delay_ms': round(self.hedge_delay() * 1000, 1),
+            **self.counters,
+            'latency': self.histogram.snapshot()
+        }
+
+
+_executor = ThreadPoolExecutor(max_workers=ROUTER_THREADS, thread_name_prefix="rpc-router")
+
+
+class RpcRouter:
+    """Drop-in for a ChainClient that routes over several of them"""
+
+    def __init__(self, clients: List, executor: ThreadPoolExecutor = None):
+        if not clients:
+            raise ValueError("RpcRouter needs at least one endpoint")
+        self.endpoints = [EndpointState(client, i) for i, client in enumerate(clients)]
+        self.executor = executor or _executor
+        self._pinned = self.endpoints[0]
+        self._lock = threading.Lock()
+        self.counters = {'reads': 0, 'pinned': 0, 'hedged': 0, 'failovers': 0}
+
+    @property
+    def url(self) -> str:
+        return self.endpoints[0].url
+
+    def request(self, method: str, params: Any) -> Dict:
+        if method in PINNED_METHODS:
+            self.counters['pinned'] += 1
+            return self._pinned_request(method, params)
+        self.counters['reads'] += 1
+        return self._hedged_request(method, params)
+
+    def _ranked(self) -> List[EndpointState]:
+        """Healthy endpoints fastest first (config order breaks ties); all when none are healthy"""
+        candidates = [e for e in self.endpoints if e.healthy] or self.endpoints
+        return sorted(candidates, key=lambda e: (e.score(), e.index))
+
+    def _attempt(self, endpoint: EndpointState, method: str, params: Any) -> Dict:
+        started = time.perf_counter()
+        try:
+            response = endpoint.client.request(method, params)
+            error = response.get('error') if isinstance(response, dict) else None
+            if error and error.get('code') in ENDPOINT_ERROR_CODES:
+                raise EndpointError(f"{endpoint.url}: {error.get('message')}")
+        except Exception:
+            endpoint.observe_failure()
+            raise
+        endpoint.observe_success(time.perf_counter() - started)
+        return response
+
+    def _pinned_request(self, method: str, params: Any) -> Dict:
+        """Send to the pinned endpoint; move the pin only when it fails"""
+        with self._lock:
+            if not self._pinned.healthy:
+                healthy = [e for e in self.endpoints if e.healthy]
+                if healthy:
+                    logger.warning(f"📌 Re-pinning RPC writes {self._pinned.url} -> {healthy[0].url}")
+                    self._pinned = healthy[0]
+            endpoint = self._pinned
+        return self._attempt(endpoint, method, params)
+
+    def _hedged_request(self, method: str, params: Any) -> Dict:
+        ranked = self._ranked()
+        primary = ranked[0]
+        backups = iter(ranked[1:])
+        in_flight = {self.executor.submit(self._attempt, primary, method, params): primary}
+        hedge_at = primary.hedge_delay()
+        hedged = False
+        last_error = None
+
+        while in_flight:
+            done, _ = wait(in_flight, timeout=None if hedged else hedge_at, return_when=FIRST_COMPLETED)
+            if not done:
+                # Primary is slower than usual: ask the next endpoint as well
+                hedged = True
+                backup = next(backups, None)
+                if backup is not None:
+                    self.counters['hedged'] += 1
+                    primary.counters['hedges_sent'] += 1
+                    in_flight[self.executor.submit(self._attempt, backup, method, params)] = backup
+                continue
+
+            for future in done:
+                endpoint = in_flight.pop(future)
+                try:
+                    response = future.result()
+                except Exception as e:
+                    last_error = e
+                    backup = next(backups, None)
+                    if backup is not None:
+                        self.counters['failovers'] += 1
+                        in_flight[self.executor.submit(self._attempt, backup, method, params)] = backup
+                    continue
+                if endpoint is not primary and hedged:
+                    endpoint.counters['hedges_won'] += 1
+                return response
+
+        raise last_error
+
+    def stats(self) -> Dict:
+        return {
+            **self.counters,
+            'pinned_endpoint': self._pinned.url,
+            'endpoints': [endpoint.stats() for endpoint in self.endpoints]
+        }
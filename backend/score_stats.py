@@ -0,0 +1,88 @@
+"""
+Running Score Statistics
+O(1) Welford statistics kept next to each passport's score_history window
+"""
+
+import math
+from typing import Dict, List, Optional
+
+# Matches the $slice on score_history in DynamicOracleService
+SCORE_WINDOW = 30
+
+
+def empty_stats() -> Dict:
+    """Statistics of an empty window"""
+    return {'count': 0, 'mean': 0.0, 'm2': 0.0, 'first': None, 'last': None}
+
+
+def stats_from_history(score_history: List[float]) -> Dict:
+    """Build statistics from an existing history (backfill / resync)"""
+    stats = empty_stats()
+    for score in score_history:
+        stats = add_score(stats, score)
+    return stats
+
+
+def add_score(stats: Dict, score: float) -> Dict:
+    """Welford update for a score appended to the window"""
+    count = stats['count'] + 1
+    delta = score - stats['mean']
+    mean = stats['mean'] + delta / count
+    m2 = stats['m2'] + delta * (score - mean)
+
+    return {
+        'count': count,
+        'mean': mean,
+        'm2': m2,
+        'first': stats['first'] if stats['count'] else score,
+        'last': score
+    }
+
+
+def remove_score(stats: Dict, score: float, next_first: Optional[float]) -> Dict:
+    """Reverse Welford update for the oldest score leaving the window"""
+    count = stats['count'] - 1
+    if count <= 0:
+        return empty_stats()
+
+    mean = (stats['count'] * stats['mean'] - score) / count
+    m2 = max(0.0, stats['m2'] - (score - stats['mean']) * (score - mean))
+
+    return {
+        'count': count,
+        'mean': mean,
+        'm2': m2,
+        'first': next_first,
+        'last': stats['last']
+    }
+
+
+def push_score(stats: Optional[Dict], score_history: List[float], score: float) -> Dict:
+    """Statistics after pushing score onto a SCORE_WINDOW-long sliding window
+
+    score_history is the window before the push; it is only read to find the
+    evicted value, or to resync when stored statistics are missing or stale.
+    """
+    window = score_history[-SCORE_WINDOW:]
+    if not stats or stats.get('count') != len(window):
+        stats = stats_from_history(window)
+
+    if len(window) == SCORE_WINDOW:
+        next_first = window[1] if SCORE_WINDOW > 1 else None
+        stats = remove_score(stats, window[0], next_first)
+
+    return add_score(stats, score)
+
+
+def volatility(stats: Dict) -> float:
+    """Score volatility (0-1): population std of the window / 1000"""
+    if stats['count'] < 2:
+        return 0.0
+    return min(1.0, math.sqrt(stats['m2'] / stats['count']) / 1000)
+
+
+def trend(stats: Dict) -> float:
+    """Score trend (0-1, 0.5=neutral): window change / 1000"""
+    if stats['count'] < 2:
+        return 0.5
+    return max(0, min(1, 0.5 + (stats['last'] - stats['first']) / 1000))
@@ -14,6 +14,8 @@ import random
 import asyncio
 from blockchain import polygon_integration
 from proof_service import ProofService
+from mint_queue import get_mint_queue
+from receipt_tracker import get_receipt_tracker, pending_mint_record
 from api_key_auth import verify_api_key, set_db
 
 from poh_routes import router as poh_router
@@ -48,6 +50,18 @@ async def lifespan(app: FastAPI):
     import poh_routes
     poh_routes.set_db(db)
     
+    # Resolve broadcast mints in the background
+    try:
+        await get_receipt_tracker(db).start()
+    except Exception as e:
+        logger.warning(f"⚠️ Receipt tracker not started: {e}")
+    
+    # Keep EIP-1559 fee suggestions fresh so transactions are priced from cache
+    try:
+        await polygon_integration.fees.start()
+    except Exception as e:
+        logger.warning(f"⚠️ Fee oracle not started: {e}")
+    
     # Start monitoring
     # from monitor_runner import run_monitor
     # asyncio.create_task(run_monitor())
@@ -56,15 +70,25 @@ async def lifespan(app: FastAPI):
     try:
         import ai_oracle_routes
         ai_oracle_routes.set_db(db)
-        from oracle_service import get_oracle_service
-        oracle = get_oracle_service(db)
-        await oracle.start()
-        logger.info("✅ AI Risk Oracle started")
+        # ORACLE_EMBEDDED=false when refreshes run in dedicated oracle_worker.py processes
+        if os.getenv("ORACLE_EMBEDDED", "true").lower() == "true":
+            from oracle_service import get_oracle_service
+            oracle = get_oracle_service(db)
+            await oracle.start()
+            logger.info("✅ AI Risk Oracle started")
     except Exception as e:
         logger.warning(f"⚠️ AI Oracle not started: {e}")
     
     yield
     # Shutdown
+    try:
+        await get_receipt_tracker(db).stop()
+    except Exception as e:
+        logger.warning(f"⚠️ Receipt tracker not stopped cleanly: {e}")
+    try:
+        await polygon_integration.fees.stop()
+    except Exception as e:
+        logger.warning(f"⚠️ Fee oracle not stopped cleanly: {e}")
     try:
         from oracle_service import oracle_service
         if oracle_service:
@@ -296,30 +320,22 @@ async def mint_badge(badge_data: BadgeMintRequest):
         
         logger.info("Signature verified, minting...")
         
-        # Mint using backend wallet (deployer)
-        result = await polygon_integration.mint_badge(
-            badge_data.wallet_address,
-            badge_data.badge_type,
-            badge_data.zk_proof_hash
-        )
+        # Broadcast using backend wallet (deployer), batched with other
+        # mints; the receipt tracker records gas and final status once mined
+        tx_hash = batch_index = None
+        if polygon_integration.account:
+            try:
+                tx_hash, batch_index = await get_mint_queue().submit(
+                    badge_data.wallet_address,
+                    badge_data.badge_type,
+                    badge_data.zk_proof_hash
+                )
+            except Exception as e:
+                logger.error(f"Mint broadcast failed: {e}")
         
-        logger.info(f"Mint result: {result}")
+        logger.info(f"Mint broadcast: {tx_hash}")
         
-        if result:
-            # Handle both old string format and new dict format
-            if isinstance(result, dict):
-                tx_hash = result['tx_hash']
-                gas_used = result.get('gas_used')
-                gas_fee = result.get('gas_fee')
-            else:
-                tx_hash = result
-                gas_used = None
-                gas_fee = None
-            
-            # Ensure 0x prefix
-            if not tx_hash.startswith('0x'):
-                tx_hash = '0x' + tx_hash
-            
+        if tx_hash:
             # Save to database
             badge_doc = {
                 "id": str(uuid.uuid4()),
@@ -327,20 +343,19 @@ async def mint_badge(badge_data: BadgeMintRequest):
                 "badge_type": badge_data.badge_type,
                 "zk_proof_hash": badge_data.zk_proof_hash,
                 "token_id": f"ZK-{uuid.uuid4().hex[:8].upper()}",
-                "tx_hash": tx_hash,
-                "gas_used": gas_used,
-                "gas_fee": gas_fee,
+                **pending_mint_record(tx_hash, batch_index),
                 "created_at": datetime.now(timezone.utc).isoformat()
             }
             await db.badges.insert_one(badge_doc)
+            get_receipt_tracker(db).track(tx_hash)
             
             return {
                 "success": True,
                 "tx_hash": tx_hash,
                 "token_id": badge_doc["token_id"],
-                "gas_used": gas_used,
-                "gas_fee": gas_fee,
-                "message": "Badge minted successfully"
+                "status": badge_doc["status"],
+                "status_url": f"/api/badges/mint/{tx_hash}",
+                "message": "Badge mint submitted"
             }
         else:
             return {"success": False, "message": "Minting failed"}
@@ -348,6 +363,36 @@ async def mint_badge(badge_data: BadgeMintRequest):
         logger.error(f"Minting error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.get("/badges/mint/stats")
+async def get_mint_stats():
+    """Mint queue (batching, retries, gas per badge by batch size), receipt tracker and fee stats"""
+    return {
+        "queue": get_mint_queue().stats(),
+        "tracker": get_receipt_tracker(db).stats(),
+        "fees": polygon_integration.fees.stats(),
+        "nonces": polygon_integration.nonces.stats() if polygon_integration.nonces else None
+    }
+
+@api_router.get("/badges/mint/{tx_hash}")
+async def get_mint_status(tx_hash: str):
+    """Status of a submitted mint: pending, confirmed, failed or dropped"""
+    badge = await db.badges.find_one(
+        {"$or": [{"tx_hash": tx_hash}, {"mined_tx_hash": tx_hash}]},
+        {"_id": 0}
+    )
+    if not badge:
+        raise HTTPException(status_code=404, detail="Mint not found")
+    return {
+        "success": True,
+        "tx_hash": badge["tx_hash"],
+        "mined_tx_hash": badge.get("mined_tx_hash"),
+        "token_id": badge.get("token_id"),
+        "status": badge.get("status", "confirmed"),  # records from before tracking were mined synchronously
+        "gas_used": badge.get("gas_used"),
+        "gas_fee": badge.get("gas_fee"),
+        "block_number": badge.get("block_number")
+    }
+
 # Demo Badge Model
 class DemoBadge(BaseModel):
     wallet_address: str
@@ -0,0 +1,170 @@
+"""
+Shard Leases for Oracle Workers
+Partitions the wallet keyspace into fixed shards; each oracle worker holds
+time-limited MongoDB leases on its fair share of them, renews them while
+alive, and takes over shards whose lease expired
+"""
+
+import hashlib
+import logging
+import math
+import os
+import socket
+import time
+import uuid
+from datetime import datetime
+from typing import Callable, Dict, Set, Tuple
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+NUM_SHARDS = int(os.getenv("ORACLE_SHARDS", "64"))
+LEASE_TTL = float(os.getenv("ORACLE_LEASE_TTL", "30"))                # seconds
+RENEW_INTERVAL = float(os.getenv("ORACLE_LEASE_RENEW_INTERVAL", "10"))
+
+# Expiry is compared against MongoDB's clock, never a worker's
+LIVE = {'$expr': {'$gt': ['$expires_at', '$$NOW']}}
+EXPIRED = {'$expr': {'$lte': ['$expires_at', '$$NOW']}}
+RELEASED = datetime(1970, 1, 1)
+
+
+def shard_of(wallet_address: str, num_shards: int = NUM_SHARDS) -> int:
+    """Stable shard for a wallet, identical in every process"""
+    digest = hashlib.sha1(wallet_address.lower().encode()).digest()
+    return int.from_bytes(digest[:8], 'big') % num_shards
+
+
+class ShardLeaseManager:
+    """Lease bookkeeping for one worker
+
+    oracle_leases:  {_id: shard, owner: worker_id | None, expires_at: Date}
+    oracle_workers: {_id: worker_id, expires_at: Date} (heartbeats)
+
+    expires_at is set and compared with the server's $$NOW, so skew between
+    worker clocks cannot make a live lease look expired. Locally a worker
+    counts its lease from just before the write on its own monotonic clock;
+    that never outlasts the server-side lease, so it stops processing a
+    shard before any other worker can claim it.
+    """
+
+    def __init__(
+        self,
+        db,
+        worker_id: str = None,
+        num_shards: int = NUM_SHARDS,
+        lease_ttl: float = LEASE_TTL,
+        renew_interval: float = RENEW_INTERVAL,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.leases = db.oracle_leases
+        self.workers = db.oracle_workers
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.num_shards = num_shards
+        self.lease_ttl = lease_ttl
+        self.renew_interval = renew_interval
+        self.clock = clock
+        self._held: Dict[int, float] = {}  # shard -> local lease expiry
+        self.counters = {'acquired': 0, 'lost': 0, 'released': 0}
+
+    @property
+    def shards(self) -> Set[int]:
+        now = self.clock()
+        return {shard for shard, expires_at in self._held.items() if expires_at > now}
+
+    def owns(self, wallet_address: str) -> bool:
+        expires_at = self._held.get(shard_of(wallet_address, self.num_shards))
+        return expires_at is not None and expires_at > self.clock()
+
+    async def renew(self) -> Tuple[Set[int], Set[int]]:
+        """Heartbeat, renew held leases, then rebalance; returns (gained, lost)"""
+        expires_at = self.clock() + self.lease_ttl
+        gained, lost = set(), set()
+
+        await self.workers.update_one(
+            {'_id': self.worker_id}, [{'$set': {'expires_at': self._server_expiry()}}], upsert=True
+        )
+
+        for shard in list(self._held):
+            result = await self.leases.update_one(
+                {'_id': shard, 'owner': self.worker_id, **LIVE},
+                [{'$set': {'expires_at': self._server_expiry()}}]
+            )
+            if result.matched_count:
+                self._held[shard] = expires_at
+            else:
+                del self._held[shard]
+                lost.add(shard)
+
+        live_workers = max(1, await self.workers.count_documents(LIVE))
+        target = math.ceil(self.num_shards / live_workers)
+
+        if len(self._held) > target:
+            # Hand surplus shards back so newly joined workers can claim them
+            for shard in sorted(self._held)[target:]:
+                await self._release(shard)
+                lost.add(shard)
+        elif len(self._held) < target:
+            taken = set()
+            async for lease in self.leases.find({'owner': {'$ne': None}, **LIVE}, {'_id': 1}):
+                taken.add(lease['_id'])
+            for shard in range(self.num_shards):
+                if len(self._held) >= target:
+                    break
+                if shard in self._held or shard in taken:
+                    continue
+                if await self._claim(shard, expires_at):
+                    gained.add(shard)
+
+        self.counters['acquired'] += len(gained)
+        self.counters['lost'] += len(lost)
+        if gained or lost:
+            logger.info(
+                f"🔑 Worker {self.worker_id} holds {len(self._held)}/{self.num_shards} shards "
+                f"(+{len(gained)} / -{len(lost)}, {live_workers} live workers)"
+            )
+        return gained, lost
+
+    def _server_expiry(self) -> Dict:
+        """Aggregation expression: lease_ttl past the server's current time"""
+        return {'$add': ['$$NOW', int(self.lease_ttl * 1000)]}
+
+    async def _claim(self, shard: int, expires_at: float) -> bool:
+        """Atomically take a free or expired lease"""
+        try:
+            lease = await self.leases.find_one_and_update(
+                {'_id': shard, '$or': [{'owner': None}, EXPIRED]},
+                [{'$set': {'owner': self.worker_id, 'expires_at': self._server_expiry()}}],
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            return False  # another worker holds it
+        if lease and lease.get('owner') == self.worker_id:
+            self._held[shard] = expires_at
+            return True
+        return False
+
+    async def _release(self, shard: int):
+        self._held.pop(shard, None)
+        self.counters['released'] += 1
+        await self.leases.update_one(
+            {'_id': shard, 'owner': self.worker_id},
+            {'$set': {'owner': None, 'expires_at': RELEASED}}
+        )
+
+    async def release_all(self):
+        """Give up every lease (clean shutdown) so others take over at once"""
+        for shard in list(self._held):
+            await self._release(shard)
+        await self.workers.delete_one({'_id': self.worker_id})
+
+    def stats(self) -> Dict:
+        return {
+            'worker_id': self.worker_id,
+            'num_shards': self.num_shards,
+            'held_shards': len(self.shards),
+            'lease_ttl': self.lease_ttl,
+            **self.counters
+        }
@@ -0,0 +1,143 @@
+"""
+Single-flight Request Coalescing
+Concurrent calls for the same key share one in-flight run: locally through
+a map of futures, and across workers through a Redis lock
+"""
+
+import asyncio
+import logging
+import os
+from typing import Any, Awaitable, Callable, Dict
+
+from bson import json_util
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+
+class SingleFlight:
+    """Per-process coalescing: one run per key, every caller gets its result"""
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.counters = {'runs': 0, 'coalesced': 0}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        future = self._inflight.get(key)
+        while future is not None:
+            self.counters['coalesced'] += 1
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise  # this caller was cancelled
+            # The run was cancelled under us: take over (or join a newer run)
+            future = self._inflight.get(key)
+
+        future = asyncio.get_event_loop().create_future()
+        # Nobody may be waiting; don't warn about an unretrieved exception
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = future
+        try:
+            self.counters['runs'] += 1
+            result = await self._run(key, fn)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    async def _run(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        return await fn()
+
+    def stats(self) -> Dict:
+        return {'in_flight': len(self._inflight), **self.counters}
+
+
+class RedisSingleFlight(SingleFlight):
+    """Cross-worker coalescing
+
+    The worker holding the Redis lock runs fn and publishes its result for a
+    short time; other workers wait for that result instead of running fn
+    themselves. Results are stored as MongoDB extended JSON, so datetimes and
+    ObjectIds come back as the same types an in-process caller receives.
+    Falls back to per-process coalescing without Redis.
+    """
+
+    def __init__(
+        self,
+        client=None,
+        prefix: str = "singleflight",
+        lock_timeout: float = 60.0,
+        result_ttl: float = 10.0,
+        poll_interval: float = 0.1
+    ):
+        super().__init__()
+        self.prefix = prefix
+        self.lock_timeout = lock_timeout
+        self.result_ttl = result_ttl
+        self.poll_interval = poll_interval
+        self.client = client if client is not None else self._connect()
+        self.counters['remote_coalesced'] = 0
+
+    @staticmethod
+    def _connect():
+        try:
+            import redis.asyncio as aioredis
+            return aioredis.from_url(REDIS_URL, decode_responses=True)
+        except Exception as e:
+            logger.warning(f"⚠️ Redis single-flight unavailable, using local only: {e}")
+            return None
+
+    async def _run(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        if self.client is None:
+            return await fn()
+
+        lock_key = f"{self.prefix}:lock:{key}"
+        result_key = f"{self.prefix}:result:{key}"
+
+        try:
+            lock = self.client.lock(lock_key, timeout=self.lock_timeout)
+            acquired = await lock.acquire(blocking=False)
+        except Exception as e:
+            logger.warning(f"⚠️ Redis lock failed for {key}, running locally: {e}")
+            return await fn()
+
+        if acquired:
+            try:
+                result = await fn()
+                try:
+                    await self.client.set(
+                        result_key, json_util.dumps(result),
+                        px=int(self.result_ttl * 1000)
+                    )
+                except Exception as e:
+                    logger.warning(f"⚠️ Could not publish single-flight result for {key}: {e}")
+                return result
+            finally:
+                try:
+                    await lock.release()
+                except Exception:
+                    pass  # expired; another worker may already hold it
+
+        # Another worker is running it: wait for its result
+        waited = 0.0
+        while waited < self.lock_timeout:
+            await asyncio.sleep(self.poll_interval)
+            waited += self.poll_interval
+            cached = await self.client.get(result_key)
+            if cached is not None:
+                self.counters['remote_coalesced'] += 1
+                return json_util.loads(cached)
+            if not await self.client.exists(lock_key):
+                break
+
+        # Holder died or its result already expired
+        return await fn()
@@ -0,0 +1,171 @@
+"""
+Data Source Guards
+Per-source deadlines, circuit breakers and latency histograms for the
+oracle's external data sources
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = float(os.getenv("ORACLE_SOURCE_TIMEOUT", "3.0"))
+FAILURE_THRESHOLD = int(os.getenv("ORACLE_BREAKER_FAILURES", "5"))
+COOLDOWN = float(os.getenv("ORACLE_BREAKER_COOLDOWN", "60"))
+
+# Histogram bucket upper bounds, in milliseconds
+LATENCY_BUCKETS_MS = [10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float('inf')]
+
+
+class CircuitBreaker:
+    """closed -> open after N consecutive failures -> half-open after cool-down"""
+
+    def __init__(
+        self,
+        failure_threshold: int = FAILURE_THRESHOLD,
+        cooldown: float = COOLDOWN,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        if self.clock() - self.opened_at >= self.cooldown:
+            return 'half_open'
+        return 'open'
+
+    def allow(self) -> bool:
+        """Closed: always. Half-open: a single probe call. Open: never."""
+        state = self.state
+        if state == 'closed':
+            return True
+        if state == 'half_open' and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self._probing or self.failures >= self.failure_threshold:
+            self.opened_at = self.clock()
+        self._probing = False
+
+    def release_probe(self):
+        """The probe ended without an outcome (cancelled): let the next call probe"""
+        self._probing = False
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram"""
+
+    def __init__(self, buckets_ms=LATENCY_BUCKETS_MS):
+        self.buckets_ms = buckets_ms
+        self.counts = [0] * len(buckets_ms)
+        self.count = 0
+        self.total_ms = 0.0
+
+    def observe(self, seconds: float):
+        ms = seconds * 1000
+        self.count += 1
+        self.total_ms += ms
+        for i, bound in enumerate(self.buckets_ms):
+            if ms <= bound:
+                self.counts[i] += 1
+                break
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """Bucket upper bound containing the given fraction of observations"""
+        if not self.count:
+            return None
+        target = fraction * self.count
+        seen = 0
+        for bound, count in zip(self.buckets_ms, self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return self.buckets_ms[-1]
+
+    def snapshot(self) -> Dict:
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total_ms / self.count, 2) if self.count else None,
+            'p50_ms': self.percentile(0.50),
+            'p95_ms': self.percentile(0.95),
+            'p99_ms': self.percentile(0.99),
+            'buckets': {
+                ('+Inf' if bound == float('inf') else f"le_{bound}"): count
+                for bound, count in zip(self.buckets_ms, self.counts)
+            }
+        }
+
+
+class SourceGuard:
+    """Wraps one async data source with a deadline, breaker and histogram"""
+
+    def __init__(
+        self,
+        name: str,
+        fetch: Callable[[str], Awaitable[Dict]],
+        timeout: float = DEFAULT_TIMEOUT,
+        breaker: CircuitBreaker = None
+    ):
+        self.name = name
+        self.fetch = fetch
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker()
+        self.latency = LatencyHistogram()
+        self.counters = {'ok': 0, 'timeout': 0, 'error': 0, 'short_circuited': 0}
+
+    async def call(self, wallet_address: str, deadline: float = None) -> Optional[Dict]:
+        """Source result, or None when it timed out, failed or is short-circuited"""
+        probe = self.breaker.state == 'half_open'
+        if not self.breaker.allow():
+            self.counters['short_circuited'] += 1
+            return None
+
+        timeout = self.timeout if deadline is None else max(0.0, min(self.timeout, deadline))
+        started = time.monotonic()
+        try:
+            result = await asyncio.wait_for(self.fetch(wallet_address), timeout)
+            if not isinstance(result, dict):
+                raise ValueError(f"unexpected result type {type(result).__name__}")
+            self.breaker.record_success()
+            self.counters['ok'] += 1
+            return result
+        except asyncio.TimeoutError:
+            self.breaker.record_failure()
+            self.counters['timeout'] += 1
+            logger.warning(f"⏱️ {self.name} timed out after {timeout:.2f}s for {wallet_address}")
+            return None
+        except Exception as e:
+            self.breaker.record_failure()
+            self.counters['error'] += 1
+            logger.warning(f"⚠️ {self.name} failed for {wallet_address}: {e}")
+            return None
+        finally:
+            if probe:
+                self.breaker.release_probe()
+            self.latency.observe(time.monotonic() - started)
+
+    def stats(self) -> Dict:
+        return {
+            'state': self.breaker.state,
+            'timeout_s': self.timeout,
+            **self.counters,
+            'latency': self.latency.snapshot()
+        }
@@ -9,10 +9,13 @@ from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import Optional
 from motor.motor_asyncio import AsyncIOMotorClient
+import logging
 import os
 import uuid
 from datetime import datetime, timezone
 
+logger = logging.getLogger(__name__)
+
 # MongoDB
 mongo_url = os.getenv("MONGO_URL", "mongodb://localhost:27017")
 client = AsyncIOMotorClient(mongo_url)
@@ -28,6 +31,34 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def start_mint_services():
+    # Mints return on broadcast; the tracker records their outcome and
+    # the fee oracle keeps transaction pricing off the request path
+    from blockchain import polygon_integration
+    from receipt_tracker import get_receipt_tracker
+    try:
+        await get_receipt_tracker(db).start()
+    except Exception as e:
+        logger.warning(f"⚠️ Receipt tracker not started: {e}")
+    try:
+        await polygon_integration.fees.start()
+    except Exception as e:
+        logger.warning(f"⚠️ Fee oracle not started: {e}")
+
+@app.on_event("shutdown")
+async def stop_mint_services():
+    from blockchain import polygon_integration
+    from receipt_tracker import get_receipt_tracker
+    try:
+        await get_receipt_tracker(db).stop()
+    except Exception as e:
+        logger.warning(f"⚠️ Receipt tracker not stopped cleanly: {e}")
+    try:
+        await polygon_integration.fees.stop()
+    except Exception as e:
+        logger.warning(f"⚠️ Fee oracle not stopped cleanly: {e}")
+
 # Models
 class EnrollRequest(BaseModel):
     user_id: str
@@ -158,6 +189,8 @@ async def prove(request: ProveRequest):
 async def issue(request: IssueRequest):
     from blockchain import polygon_integration
     from polygon_id_service import polygon_id_service
+    from mint_queue import get_mint_queue
+    from receipt_tracker import get_receipt_tracker, pending_mint_record
     
     try:
         proof_doc = await db.proofs.find_one({'proof_hash': request.proof_hash})
@@ -172,20 +205,14 @@ async def issue(request: IssueRequest):
         if existing_badge:
             raise HTTPException(400, "Badge already issued")
         
-        # Mint on-chain
-        mint_result = await polygon_integration.mint_badge(
+        # Broadcast on-chain; the receipt tracker records the outcome
+        if not polygon_integration.account:
+            raise HTTPException(500, "Minting failed")
+        tx_hash, batch_index = await get_mint_queue().submit(
             request.wallet_address,
             "proof_of_humanity",
             request.proof_hash
         )
-        
-        if not mint_result:
-            raise HTTPException(500, "Minting failed")
-        
-        tx_hash = mint_result['tx_hash'] if isinstance(mint_result, dict) else mint_result
-        # Ensure 0x prefix
-        if not tx_hash.startswith('0x'):
-            tx_hash = '0x' + tx_hash
         token_id = await db.badges.count_documents({}) + 1
         
         badge = {
@@ -194,20 +221,22 @@ async def issue(request: IssueRequest):
             'nullifier': request.nullifier,
             'proof_hash': request.proof_hash,
             'token_id': token_id,
-            'tx_hash': tx_hash,
+            **pending_mint_record(tx_hash, batch_index),
             'score': request.public_signals[0],
             'verification_level': 'low' if request.public_signals[0] < 30 else 'medium',
             'issued_at': datetime.now(timezone.utc).isoformat()
         }
         
         await db.badges.insert_one(badge)
+        get_receipt_tracker(db).track(tx_hash)
         
         return {
             'success': True,
             'tx_hash': tx_hash,
             'badge_id': badge['id'],
             'token_id': token_id,
-            'message': 'Badge minted successfully'
+            'status': badge['status'],
+            'message': 'Badge mint submitted'
         }
     except HTTPException:
         raise
@@ -0,0 +1,158 @@
+"""
+In-process dev chain for transaction tests
+Accepts signed raw transactions into a mempool with node-like nonce and
+replacement rules, and mines them when told to.
+"""
+
+import threading
+
+import rlp
+from eth_account import Account
+from web3 import Web3
+from web3.providers.base import BaseProvider
+
+CHAIN_ID = 80002
+GAS_USED = 21000
+
+
+def decode_raw(raw: bytes) -> dict:
+    """nonce, fee and gas fields of a legacy or EIP-1559 raw transaction"""
+    as_int = lambda b: int.from_bytes(b, 'big')
+    if raw[0] == 2:
+        fields = rlp.decode(raw[1:])
+        return {
+            'nonce': as_int(fields[1]), 'priority_fee': as_int(fields[2]), 'price': as_int(fields[3]),
+            'gas': as_int(fields[4]), 'to': fields[5], 'data': fields[7]
+        }
+    fields = rlp.decode(raw)
+    price = as_int(fields[1])
+    return {'nonce': as_int(fields[0]), 'priority_fee': price, 'price': price, 'gas': as_int(fields[2]), 'to': fields[3], 'data': fields[5]}
+
+
+class FakeDevChain(BaseProvider):
+    def __init__(self, base_fee: int = 30 * 10 ** 9, tip: int = 40 * 10 ** 9):
+        super().__init__()
+        self.lock = threading.Lock()
+        self.block = 1
+        self.base_fee = base_fee
+        self.tip = tip        # median priority fee paid in recent blocks
+        self.confirmed = {}   # sender -> next nonce
+        self.mempool = {}     # (sender, nonce) -> tx
+        self.receipts = {}
+        self.sent = []        # every accepted broadcast
+        self.reject = None    # tx -> error message or None
+        self.execute = None   # tx -> (status, gas used, logs) when mined
+        self.calls = {}
+
+    def _count(self, sender, tag):
+        confirmed = self.confirmed.get(sender, 0)
+        if tag != 'pending':
+            return confirmed
+        nonce = confirmed
+        while (sender, nonce) in self.mempool:
+            nonce += 1
+        return nonce
+
+    def send_raw(self, raw: bytes):
+        tx = decode_raw(raw)
+        tx['from'] = Account.recover_transaction(raw)
+        tx['hash'] = Web3.keccak(raw)
+        key = (tx['from'], tx['nonce'])
+        with self.lock:
+            if tx['nonce'] < self.confirmed.get(tx['from'], 0):
+                raise ValueError("nonce too low")
+            if self.reject and self.reject(tx):
+                raise ValueError(self.reject(tx))
+            current = self.mempool.get(key)
+            if current is not None:
+                if current['hash'] == tx['hash']:
+                    raise ValueError("already known")
+                if tx['price'] < current['price'] * 1.1:
+                    raise ValueError("replacement transaction underpriced")
+            self.mempool[key] = tx
+            self.sent.append(tx)
+        return tx['hash']
+
+    def mine(self, limit: int = None):
+        """Include pending transactions in nonce order; returns how many were mined"""
+        with self.lock:
+            self.block += 1
+            mined = 0
+            for sender in {s for s, _ in self.mempool}:
+                nonce = self.confirmed.get(sender, 0)
+                while (sender, nonce) in self.mempool and (limit is None or mined < limit):
+                    tx = self.mempool.pop((sender, nonce))
+                    self.receipts[tx['hash']] = self._receipt(tx)
+                    nonce += 1
+                    mined += 1
+                self.confirmed[sender] = nonce
+            return mined
+
+    def _receipt(self, tx):
+        status, gas_used, logs = self.execute(tx) if self.execute else (1, GAS_USED, [])
+        effective = min(tx['price'], self.base_fee + tx['priority_fee'])
+        return {
+            'transactionHash': Web3.to_hex(tx['hash']),
+            'transactionIndex': '0x0',
+            'blockHash': '0x' + f"{self.block:064x}",
+            'blockNumber': hex(self.block),
+            'from': tx['from'],
+            'to': Web3.to_checksum_address(tx['to']) if tx['to'] else None,
+            'cumulativeGasUsed': hex(gas_used),
+            'gasUsed': hex(gas_used),
+            'effectiveGasPrice': hex(effective),
+            'contractAddress': None,
+            'logs': [
+                {
+                    'address': Web3.to_checksum_address(tx['to']),
+                    'topics': [Web3.to_hex(t) for t in topics],
+                    'data': Web3.to_hex(data),
+                    'blockNumber': hex(self.block),
+                    'blockHash': '0x' + f"{self.block:064x}",
+                    'transactionHash': Web3.to_hex(tx['hash']),
+                    'transactionIndex': '0x0',
+                    'logIndex': hex(i),
+                    'removed': False
+                }
+                for i, (topics, data) in enumerate(logs)
+            ],
+            'logsBloom': '0x' + '00' * 256,
+            'status': hex(status),
+            'type': '0x2'
+        }
+
+    def fee_history(self, count, percentiles):
+        """Half-full blocks at a constant base fee; the pth percentile tip is tip * p / 50"""
+        count = min(int(count, 16) if isinstance(count, str) else count, self.block + 1)
+        return {
+            'oldestBlock': hex(self.block - count + 1),
+            'baseFeePerGas': [hex(self.base_fee)] * (count + 1),
+            'gasUsedRatio': [0.5] * count,
+            'reward': [[hex(int(self.tip * p / 50)) for p in percentiles] for _ in range(count)]
+        }
+    
+    def make_request(self, method, params):
+        self.calls[method] = self.calls.get(method, 0) + 1
+        reply = {'jsonrpc': '2.0', 'id': 1}
+        try:
+            if method == 'eth_chainId':
+                reply['result'] = hex(CHAIN_ID)
+            elif method == 'eth_blockNumber':
+                reply['result'] = hex(self.block)
+            elif method == 'eth_getTransactionCount':
+                reply['result'] = hex(self._count(Web3.to_checksum_address(params[0]), params[1]))
+            elif method == 'eth_sendRawTransaction':
+                reply['result'] = Web3.to_hex(self.send_raw(Web3.to_bytes(hexstr=params[0])))
+            elif method == 'eth_feeHistory':
+                reply['result'] = self.fee_history(params[0], params[2])
+            elif method == 'eth_getTransactionReceipt':
+                reply['result'] = self.receipts.get(Web3.to_bytes(hexstr=params[0]))
+            else:
+                raise ValueError(f"unsupported method {method}")
+        except ValueError as e:
+            reply.pop('result', None)
+            reply['error'] = {'code': -32000, 'message': str(e)}
+        return reply
+
+    def is_connected(self, show_traceback=False):
+        return True
@@ -0,0 +1,74 @@
+import sys
+sys.path.insert(0, '..')
+
+import random
+
+from ai_models import AIRiskOracleV2
+
+def _random_user(rng, index):
+    return {
+        "wallet_address": f"0x{index:040x}",
+        "credit_score": rng.uniform(0, 1000),
+        "poh_score": rng.uniform(0, 100),
+        "badge_count": rng.randint(0, 15),
+        "onchain_activity": rng.randint(0, 150),
+        "account_age_days": rng.randint(0, 800),
+        "reputation_score": rng.uniform(0, 100),
+        "is_verified": rng.random() > 0.5,
+        "tx_count": rng.randint(0, 900),
+        "tx_volume_usd": rng.uniform(0, 200000),
+        "tx_velocity": rng.random(),
+        "unique_contracts": rng.randint(0, 30),
+        "total_borrowed": rng.uniform(0, 80000),
+        "total_supplied": rng.uniform(0, 90000),
+        "repayment_rate": rng.uniform(50, 100),
+        "liquidation_count": rng.randint(0, 6),
+        "github_score": rng.uniform(0, 100),
+        "twitter_score": rng.uniform(0, 100),
+        "score_history": [rng.uniform(0, 1000) for _ in range(rng.randint(0, 30))],
+        "requested_loan_amount": rng.choice([1000, 10000, 2675.125, 50000])
+    }
+
+def _without_proof(assessment):
+    return {k: v for k, v in assessment.items() if k not in ("proof", "timestamp")}
+
+def test_batch_matches_per_wallet():
+    rng = random.Random(42)
+    oracle = AIRiskOracleV2()
+    users = [_random_user(rng, i) for i in range(500)]
+    
+    batch = oracle.batch_assess(users)
+    single = [oracle.assess_risk(user) for user in users]
+    
+    assert len(batch) == len(users)
+    for batched, alone in zip(batch, single):
+        assert _without_proof(batched) == _without_proof(alone)
+
+def test_batch_assess_empty():
+    assert AIRiskOracleV2().batch_assess([]) == []
+
+def test_feature_matrix_shape():
+    oracle = AIRiskOracleV2()
+    features = oracle.extract_feature_matrix([{"credit_score": 800}, {"poh_score": 50}])
+    
+    assert features.shape == (2, 19)
+    assert features[0, 0] == 0.8
+    assert features[1, 1] == 0.5
+
+def test_fraud_detection_flags_anomalies():
+    oracle = AIRiskOracleV2()
+    assessment = oracle.assess_risk({
+        "tx_velocity": 0.95,
+        "score_history": [0, 1000],
+        "onchain_activity": 0
+    })
+    
+    assert assessment["fraud_detected"] is True
+    assert len(assessment["fraud_anomalies"]) == 3
+
+if __name__ == "__main__":
+    test_batch_matches_per_wallet()
+    test_batch_assess_empty()
+    test_feature_matrix_shape()
+    test_fraud_detection_flags_anomalies()
+    print("✅ All tests passed!")
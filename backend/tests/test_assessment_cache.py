@@ -0,0 +1,66 @@
+import sys
+sys.path.insert(0, '..')
+
+import numpy as np
+
+from ai_models import AIRiskOracleV2
+from assessment_cache import AssessmentCache
+
+USER = {
+    "wallet_address": "0xabc",
+    "credit_score": 700,
+    "poh_score": 80,
+    "badge_count": 3,
+    "score_history": [650, 700]
+}
+
+def test_identical_inputs_skip_models(monkeypatch):
+    oracle = AIRiskOracleV2()
+    calls = []
+    run_models = oracle._run_models
+    monkeypatch.setattr(oracle, '_run_models', lambda *args: calls.append(1) or run_models(*args))
+    
+    first = oracle.assess_risk(dict(USER))
+    second = oracle.assess_risk(dict(USER))
+    
+    assert len(calls) == 1
+    assert oracle.cache.hits == 1 and oracle.cache.misses == 1
+    assert first['risk_score'] == second['risk_score']
+    assert first['recommended_terms'] == second['recommended_terms']
+    assert first['proof']['oracle_address'] == second['proof']['oracle_address']
+
+def test_loan_amount_is_part_of_key():
+    oracle = AIRiskOracleV2()
+    oracle.assess_risk(dict(USER, requested_loan_amount=1000))
+    oracle.assess_risk(dict(USER, requested_loan_amount=5000))
+    
+    assert oracle.cache.hits == 0
+
+def test_lru_eviction_and_ttl(monkeypatch):
+    cache = AssessmentCache(max_entries=2, ttl=10)
+    now = [100.0]
+    monkeypatch.setattr('assessment_cache.time.monotonic', lambda: now[0])
+    
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+    
+    assert cache.get('b') is None
+    assert cache.evictions == 1
+    now[0] += 11
+    assert cache.get('a') is None
+    assert cache.stats()['misses'] == 2
+
+def test_fingerprint_quantizes_features():
+    cache = AssessmentCache(decimals=6)
+    features = np.array([[0.5] * 19, [0.5 + 1e-9] * 19, [0.6] * 19])
+    keys = cache.fingerprints(features, np.array([10000.0] * 3), "2.0.0")
+    
+    assert keys[0] == keys[1]
+    assert keys[0] != keys[2]
+    assert keys[0] != cache.fingerprints(features[:1], np.array([10000.0]), "2.1.0")[0]
+
+if __name__ == "__main__":
+    import pytest
+    pytest.main([__file__])
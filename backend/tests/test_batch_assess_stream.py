@@ -0,0 +1,120 @@
+import sys
+sys.path.insert(0, '..')
+
+import json
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import ai_oracle_routes
+from api_key_auth import verify_api_key
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+    
+    def batch_size(self, size):
+        return self
+    
+    def __aiter__(self):
+        self._iter = iter(self.docs)
+        return self
+    
+    async def __anext__(self):
+        try:
+            return next(self._iter)
+        except StopIteration:
+            raise StopAsyncIteration
+
+class FakePassports:
+    def __init__(self, docs):
+        self.docs = docs
+        self.queries = []
+    
+    def find(self, query=None, projection=None):
+        self.queries.append(query)
+        wanted = set(query['$or'][0]['owner']['$in'])
+        return FakeCursor([d for d in self.docs if d.get('owner') in wanted or d.get('wallet_address') in wanted])
+
+class FakeApiKeys:
+    def __init__(self):
+        self.used = 0
+    
+    async def update_one(self, query, update):
+        self.used += update['$inc']['requests_used']
+
+class FakeDB:
+    def __init__(self, docs):
+        self.passports = FakePassports(docs)
+        self.api_keys = FakeApiKeys()
+
+def _client(db):
+    ai_oracle_routes.set_db(db)
+    app = FastAPI()
+    app.include_router(ai_oracle_routes.router)
+    app.dependency_overrides[verify_api_key] = lambda: {'api_key': 'test', 'tier': 'pro'}
+    return TestClient(app)
+
+def test_stream_resolves_wallets_in_chunks(monkeypatch):
+    monkeypatch.setattr(ai_oracle_routes, 'STREAM_CHUNK_SIZE', 2)
+    docs = [
+        {'owner': '0x1', 'credit_score': 800, 'pohScore': 90},
+        {'wallet_address': '0x2', 'credit_score': 300, 'poh_score': 10},
+        {'owner': '0x3', 'credit_score': 600}
+    ]
+    db = FakeDB(docs)
+    
+    response = _client(db).post('/api/ai-oracle/batch-assess/stream', json={
+        'wallet_addresses': ['0x1', '0x2', '0x3', '0xmissing']
+    })
+    
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('application/x-ndjson')
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line['wallet_address'] for line in lines] == ['0x1', '0x2', '0x3', '0xmissing']
+    assert [line['success'] for line in lines] == [True, True, True, False]
+    assert lines[0]['assessment']['risk_score'] < lines[1]['assessment']['risk_score']
+    assert len(db.passports.queries) == 2
+    assert db.api_keys.used == 4
+
+def test_results_keyed_by_the_requested_address():
+    owner = "0x52908400098527886E0F7030069857D2E4169EE7"
+    stored_checksummed = "0x8617E340B3D01FA5F11F306F4090FD50E238070D"
+    docs = [
+        # Found through owner; its wallet_address differs (and is lowercase)
+        {'owner': owner, 'wallet_address': '0x' + 'ab' * 20, 'credit_score': 700},
+        {'wallet_address': stored_checksummed, 'credit_score': 400}
+    ]
+    db = FakeDB(docs)
+    
+    response = _client(db).post('/api/ai-oracle/batch-assess/stream', json={
+        'wallet_addresses': [owner, stored_checksummed.lower()]
+    })
+    
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line['wallet_address'] for line in lines] == [owner, stored_checksummed.lower()]
+    assert [line['success'] for line in lines] == [True, True]
+
+def test_batch_assess_uses_column_loader(monkeypatch):
+    monkeypatch.setattr(ai_oracle_routes, 'STREAM_CHUNK_SIZE', 2)
+    docs = [
+        {'owner': '0x1', 'credit_score': 800, 'pohScore': 90},
+        {'wallet_address': '0x2', 'credit_score': 300, 'poh_score': 10},
+        {'owner': '0x3', 'credit_score': 600}
+    ]
+    db = FakeDB(docs)
+    
+    response = _client(db).post('/api/ai-oracle/batch-assess', json={
+        'wallet_addresses': ['0x1', '0x2', '0x3', '0xmissing']
+    })
+    
+    body = response.json()
+    assert body['total'] == 4
+    assert [r['success'] for r in body['results']] == [True, True, True, False]
+    assert body['results'][3]['error'] == 'Passport not found'
+    assert len(db.passports.queries) == 2  # one $in query per chunk, no find_one per wallet
+    assert db.api_keys.used == 4
+
+if __name__ == "__main__":
+    import pytest
+    pytest.main([__file__])
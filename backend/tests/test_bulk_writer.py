@@ -0,0 +1,93 @@
+import sys
+sys.path.insert(0, '..')
+
+import asyncio
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from bulk_writer import BulkWriter
+
+class FakeCollection:
+    def __init__(self, fail_index=None):
+        self.calls = []
+        self.fail_index = fail_index
+    
+    async def bulk_write(self, operations, ordered=True):
+        self.calls.append((len(operations), ordered))
+        if self.fail_index is not None and self.fail_index < len(operations):
+            raise BulkWriteError({'writeErrors': [{'index': self.fail_index, 'errmsg': 'duplicate key'}]})
+
+def _op(i):
+    return UpdateOne({'passport_id': i}, {'$set': {'credit_score': i}})
+
+def test_flushes_by_size_unordered():
+    async def scenario():
+        collection = FakeCollection()
+        writer = BulkWriter(collection, 'passports', max_batch=100, max_delay=60)
+        for i in range(250):
+            await writer.add(_op(i), context=i)
+        await writer.flush()
+        return collection, writer
+    
+    collection, writer = asyncio.run(scenario())
+    assert collection.calls == [(100, False), (100, False), (50, False)]
+    assert writer.stats()['operations'] == 250
+
+def test_flushes_by_time():
+    async def scenario():
+        collection = FakeCollection()
+        writer = BulkWriter(collection, 'passports', max_batch=100, max_delay=0.05)
+        await writer.start()
+        await writer.add(_op(1))
+        await asyncio.sleep(0.15)
+        flushed = list(collection.calls)
+        await writer.stop()
+        return flushed
+    
+    assert asyncio.run(scenario()) == [(1, False)]
+
+def test_per_document_errors_reported():
+    async def scenario():
+        failed = []
+        collection = FakeCollection(fail_index=2)
+        writer = BulkWriter(collection, 'passports', max_batch=10, on_error=lambda ctx, msg: failed.append((ctx, msg)))
+        for wallet in ['0xa', '0xb', '0xc', '0xd']:
+            await writer.add(_op(wallet), context=wallet)
+        await writer.flush()
+        return failed, writer
+    
+    failed, writer = asyncio.run(scenario())
+    assert failed == [('0xc', 'duplicate key')]
+    assert writer.stats()['errors'] == 1
+
+class SlowCollection:
+    def __init__(self):
+        self.applied = []
+    
+    async def bulk_write(self, operations, ordered=True):
+        await asyncio.sleep(0.05)
+        self.applied.extend(operations)
+
+def test_flush_waits_for_a_batch_already_in_flight():
+    async def scenario():
+        collection = SlowCollection()
+        writer = BulkWriter(collection, 'passports', max_batch=100, max_delay=60)
+        await writer.add(_op(1), context=1)
+        
+        # Another flush (e.g. the periodic one) has taken the buffer and is mid-write
+        background = asyncio.create_task(writer.flush())
+        await asyncio.sleep(0)
+        assert writer.stats()['buffered'] == 0
+        
+        await writer.flush()
+        applied_after_flush = len(collection.applied)
+        await background
+        return applied_after_flush
+    
+    # The caller reads its own write once flush() returns
+    assert asyncio.run(scenario()) == 1
+
+if __name__ == "__main__":
+    import pytest
+    pytest.main([__file__])
@@ -0,0 +1,157 @@
+import sys
+sys.path.insert(0, '..')
+
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from web3 import Web3
+
+from chain_client import ChainClient, ChainProvider, _new_session
+from web3_pool import run_web3
+
+class StubRPC:
+    """Local JSON-RPC server; balances are the address's last byte in wei"""
+    
+    def __init__(self, status=200):
+        self.posts = []        # number of calls in each HTTP request
+        self.connections = set()
+        self.status = status
+        stub = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+            
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                stub.connections.add(self.client_address)
+                calls = body if isinstance(body, list) else [body]
+                stub.posts.append(len(calls))
+                replies = [stub.answer(call) for call in calls]
+                payload = json.dumps(replies if isinstance(body, list) else replies[0]).encode()
+                self.send_response(stub.status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+            
+            def log_message(self, *args):
+                pass
+        
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+    
+    def answer(self, call):
+        reply = {"jsonrpc": "2.0", "id": call["id"]}
+        if call["method"] == "eth_chainId":
+            reply["result"] = "0x13882"
+        elif call["method"] == "eth_getBalance":
+            reply["result"] = hex(int(call["params"][0][-2:], 16))
+        else:
+            reply["error"] = {"code": -32601, "message": "method not found"}
+        return reply
+    
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+@pytest.fixture
+def stub():
+    server = StubRPC()
+    yield server
+    server.close()
+
+def _web3(url, **kwargs):
+    client = ChainClient(url, session=_new_session(4), **kwargs)
+    return Web3(ChainProvider(client)), client
+
+def test_concurrent_calls_share_one_batch(stub):
+    w3, client = _web3(stub.url, batch_window=0.05)
+    addresses = [Web3.to_checksum_address(f"0x{i:040x}") for i in range(1, 9)]
+    
+    async def scenario():
+        return await asyncio.gather(*[run_web3(w3.eth.get_balance, a) for a in addresses])
+    
+    balances = asyncio.run(scenario())
+    
+    assert balances == list(range(1, 9))
+    assert sum(stub.posts) == 8
+    assert len(stub.posts) <= 2
+    assert client.stats()['methods']['eth_getBalance']['calls'] == 8
+
+def test_sequential_calls_reuse_connection_and_cache_chain_id(stub):
+    w3, client = _web3(stub.url, batch_window=0)
+    
+    for i in range(5):
+        assert w3.eth.chain_id == 80002
+        w3.eth.get_balance(Web3.to_checksum_address(f"0x{i + 1:040x}"))
+    
+    assert len(stub.connections) == 1
+    assert stub.posts == [1] * 6  # one eth_chainId, then balances only
+    assert client.stats()['cached'] >= 4
+
+def test_errors_are_per_call_in_a_batch(stub):
+    _, client = _web3(stub.url, batch_window=0.05)
+    client._active = 1  # another request in flight, so new calls gather into a batch
+    results = {}
+    
+    def call(method, params):
+        results[method] = client.request(method, params)
+    
+    threads = [
+        threading.Thread(target=call, args=("eth_getBalance", ["0x" + "00" * 19 + "07", "latest"])),
+        threading.Thread(target=call, args=("eth_unknown", []))
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    
+    assert stub.posts == [2]
+    assert results["eth_getBalance"]["result"] == "0x7"
+    assert "error" in results["eth_unknown"]
+    assert client.stats()['methods']['eth_unknown']['errors'] == 1
+
+def test_lone_call_skips_the_batch_window(stub):
+    _, client = _web3(stub.url, batch_window=0.5)
+    
+    started = time.perf_counter()
+    reply = client.request("eth_getBalance", ["0x" + "00" * 19 + "05", "latest"])
+    
+    assert reply["result"] == "0x5"
+    assert time.perf_counter() - started < 0.25
+
+def test_full_batch_is_sent_before_the_window_ends(stub):
+    _, client = _web3(stub.url, batch_window=5, max_batch=3)
+    client._active = 1
+    
+    def call(i):
+        client.request("eth_getBalance", ["0x" + "00" * 19 + f"{i:02x}", "latest"])
+    
+    started = time.perf_counter()
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    
+    assert stub.posts == [3]
+    assert time.perf_counter() - started < 1
+
+def test_http_failure_raises_for_every_call():
+    stub = StubRPC(status=503)
+    try:
+        _, client = _web3(stub.url, batch_window=0)
+        with pytest.raises(Exception):
+            client.request("eth_getBalance", ["0x" + "00" * 20, "latest"])
+        assert client.stats()['errors'] == 1
+    finally:
+        stub.close()
+
+if __name__ == "__main__":
+    pytest.main([__file__])
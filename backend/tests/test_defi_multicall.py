@@ -0,0 +1,114 @@
+import sys
+sys.path.insert(0, '..')
+
+import asyncio
+
+from eth_abi import encode, decode
+from web3 import Web3
+from web3.providers.base import BaseProvider
+
+import defi_indexer
+from defi_indexer import DeFiIndexer, AAVE_ACCOUNT_SELECTOR, MULTICALL3
+from defi_snapshot import defi_snapshot
+from oracle_service import DynamicOracleService
+
+AGGREGATE3_SELECTOR = Web3.keccak(text="aggregate3((address,bool,bytes)[])")[:4]
+
+class MulticallProvider(BaseProvider):
+    """Answers Multicall3 aggregate3 eth_calls from a table of Aave accounts"""
+    
+    def __init__(self, accounts, reverting=()):
+        super().__init__()
+        self.accounts = accounts
+        self.reverting = {Web3.to_checksum_address(a) for a in reverting}
+        self.requests = []
+    
+    def make_request(self, method, params):
+        self.requests.append(method)
+        if method == 'eth_chainId':
+            return {'jsonrpc': '2.0', 'id': 1, 'result': '0x89'}
+        if method == 'eth_blockNumber':
+            return {'jsonrpc': '2.0', 'id': 1, 'result': '0x64'}
+        assert method == 'eth_call'
+        tx = params[0]
+        assert Web3.to_checksum_address(tx['to']) == MULTICALL3
+        data = bytes.fromhex(tx['data'][2:])
+        assert data[:4] == AGGREGATE3_SELECTOR
+        (calls,) = decode(['(address,bool,bytes)[]'], data[4:])
+        
+        results = []
+        for target, allow_failure, call_data in calls:
+            assert call_data[:4] == AAVE_ACCOUNT_SELECTOR
+            (user,) = decode(['address'], call_data[4:])
+            user = Web3.to_checksum_address(user)
+            if user in self.reverting:
+                results.append((False, b''))
+            else:
+                results.append((True, encode(['uint256'] * 6, self.accounts.get(user, [0] * 6))))
+        return {
+            'jsonrpc': '2.0', 'id': 1,
+            'result': '0x' + encode(['(bool,bytes)[]'], [results]).hex()
+        }
+    
+    def is_connected(self, show_traceback=False):
+        return True
+
+def _wallet(i):
+    return Web3.to_checksum_address(f"0x{i + 1:040x}")
+
+def test_get_aave_data_many_batches_and_tolerates_failures(monkeypatch):
+    monkeypatch.setattr(defi_indexer, 'MULTICALL_BATCH', 4)
+    wallets = [_wallet(i) for i in range(10)]
+    accounts = {
+        wallet: [2000 * 10**8, 500 * 10**8, 100 * 10**8, 8000, 7000, 3 * 10**18]
+        for wallet in wallets
+    }
+    provider = MulticallProvider(accounts, reverting=[wallets[3]])
+    indexer = DeFiIndexer(w3=Web3(provider))
+    
+    results = indexer.get_aave_data_many(wallets + ['not-an-address'])
+    
+    assert provider.requests.count('eth_call') == 3  # ceil(10 / 4)
+    assert provider.requests.count('eth_blockNumber') == 1
+    assert results[wallets[0]]['total_collateral_usd'] == 2000
+    assert results[wallets[0]]['total_debt_usd'] == 500
+    assert results[wallets[0]]['health_factor'] == 3
+    assert results[wallets[3]]['is_mock']
+    assert results['not-an-address']['is_mock']
+    assert len(results) == 11
+
+def test_batch_matches_single_wallet_parse():
+    account = [1234 * 10**8, 10 * 10**8, 0, 8250, 7500, 15 * 10**17]
+    wallet = _wallet(0)
+    indexer = DeFiIndexer(w3=Web3(MulticallProvider({wallet: account})))
+    
+    batch = indexer.get_aave_data_many([wallet])[wallet]
+    single = DeFiIndexer._parse_aave_account(account)
+    
+    batch.pop('timestamp'), single.pop('timestamp')
+    assert batch == single
+
+def test_oracle_prefetch_replaces_per_wallet_aave_reads(monkeypatch):
+    wallets = [_wallet(i) for i in range(6)]
+    accounts = {wallet: [1000 * 10**8, 0, 0, 8000, 7000, 2 * 10**18] for wallet in wallets}
+    provider = MulticallProvider(accounts, reverting=[wallets[5]])
+    indexer = DeFiIndexer(w3=Web3(provider))
+    indexer.get_uniswap_data = lambda wallet: indexer._mock_uniswap_data()
+    monkeypatch.setattr(defi_indexer, '_indexer', indexer)
+    service = DynamicOracleService(db=type('DB', (), {'passports': None, 'events': None})())
+    
+    prefetched = asyncio.run(service._prefetch_aave(wallets))
+    calls_after_prefetch = provider.requests.count('eth_call')
+    
+    for wallet in wallets[:5]:
+        with defi_snapshot(aave={wallet: prefetched.get(wallet)}):
+            data = defi_indexer.fetch_defi_data(wallet)
+        assert data['summary']['total_supplied_usd'] == 1000
+    
+    assert calls_after_prefetch == 1
+    assert provider.requests.count('eth_call') == 1  # no per-wallet Aave reads
+    assert wallets[5] not in prefetched  # failed read: left to the guarded per-wallet path
+
+if __name__ == "__main__":
+    import pytest
+    pytest.main([__file__])
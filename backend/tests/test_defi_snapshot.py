@@ -0,0 +1,108 @@
+import sys
+sys.path.insert(0, '..')
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+import defi_indexer
+import onchain_service
+from ai_models import ai_oracle_v2
+from defi_snapshot import DefiSnapshot, defi_snapshot, current_snapshot, snapshot_stats
+from web3_pool import run_web3
+
+WALLET = "0x00000000000000000000000000000000000000aa"
+
+class FakeIndexer:
+    network = "polygon"
+    
+    def __init__(self):
+        self.reads = 0
+    
+    def get_all_defi_data(self, wallet_address):
+        self.reads += 1
+        time.sleep(0.01)
+        return {
+            'wallet_address': wallet_address,
+            'protocols': {'aave': {'health_factor': 1.8, 'total_collateral_usd': 5000}, 'uniswap': {}, 'compound': {}},
+            'summary': {'total_supplied_usd': 5000, 'total_borrowed_usd': 1000, 'protocols_used': 1}
+        }
+
+@pytest.fixture
+def indexer(monkeypatch):
+    fake = FakeIndexer()
+    monkeypatch.setattr(defi_indexer, '_indexer', fake)
+    return fake
+
+def test_onchain_service_reads_defi_once(indexer):
+    result = asyncio.run(onchain_service.fetch_defi_data(WALLET))
+    
+    assert indexer.reads == 1
+    assert result['supplied'] == 5000
+    assert result['score'] == 100 - defi_indexer.get_defi_risk_score(WALLET, indexer.get_all_defi_data(WALLET))
+
+def test_assessment_shares_one_snapshot_across_consumers(indexer):
+    before = snapshot_stats()
+    
+    async def assessment():
+        with defi_snapshot():
+            await onchain_service.fetch_defi_data(WALLET)
+            await run_web3(defi_indexer.get_defi_risk_score, WALLET.upper())
+            return ai_oracle_v2._enrich_with_defi_data({}, WALLET)
+    
+    user_data = asyncio.run(assessment())
+    after = snapshot_stats()
+    
+    assert indexer.reads == 1
+    assert user_data['total_supplied'] == 5000
+    assert after['fetches'] - before['fetches'] == 1
+    assert after['reused'] - before['reused'] == 2
+    assert after['protocol_reads_saved'] - before['protocol_reads_saved'] == 6
+
+def test_separate_scopes_do_not_share(indexer):
+    async def one_request():
+        with defi_snapshot():
+            await run_web3(defi_indexer.fetch_defi_data, WALLET)
+            await run_web3(defi_indexer.fetch_defi_data, WALLET)
+    
+    async def scenario():
+        await asyncio.gather(one_request(), one_request())
+    
+    asyncio.run(scenario())
+    
+    assert indexer.reads == 2
+    assert current_snapshot() is None
+
+def test_concurrent_readers_wait_for_one_fetch_and_retry_after_failure():
+    snapshot = DefiSnapshot()
+    calls = []
+    
+    def fetch():
+        calls.append(1)
+        time.sleep(0.05)
+        if len(calls) == 1:
+            raise ValueError("rpc down")
+        return {'protocols': {}}
+    
+    results = []
+    
+    def reader():
+        try:
+            results.append(snapshot.get(WALLET, fetch))
+        except ValueError:
+            results.append(None)
+    
+    threads = [threading.Thread(target=reader) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    
+    assert len(calls) == 2  # the failed fetch, then one retry shared by the waiters
+    assert results.count(None) == 1
+    assert results.count({'protocols': {}}) == 4
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,120 @@
+import sys
+sys.path.insert(0, '..')
+
+import asyncio
+
+import pytest
+from web3 import Web3
+
+from fake_chain import FakeDevChain, CHAIN_ID
+from fee_oracle import FeeOracle, GWEI
+from test_nonce_manager import FakeClock, RECIPIENT, _integration, _manager
+
+class FakeEth:
+    def __init__(self, history=None):
+        self.history = history
+        self.calls = 0
+    
+    def fee_history(self, block_count, newest_block, reward_percentiles):
+        self.calls += 1
+        if self.history is None:
+            raise ConnectionError("node unreachable")
+        return self.history
+
+def _fake_w3(history=None):
+    return type('W3', (), {'eth': FakeEth(history)})()
+
+def test_tiers_from_fee_history():
+    # base fee 30 gwei; recent tips: p10 8, p50 40, p90 72 gwei
+    oracle = FeeOracle(Web3(FakeDevChain()), clock=FakeClock())
+    
+    fees = {tier: oracle.fees(tier) for tier in ('low', 'standard', 'high')}
+    
+    assert fees['low'] == {'maxFeePerGas': int(67.5 * GWEI), 'maxPriorityFeePerGas': 30 * GWEI}  # min tip
+    assert fees['standard'] == {'maxFeePerGas': 100 * GWEI, 'maxPriorityFeePerGas': 40 * GWEI}
+    assert fees['high'] == {'maxFeePerGas': 162 * GWEI, 'maxPriorityFeePerGas': 72 * GWEI}
+    with pytest.raises(ValueError):
+        oracle.fees('urgent')
+
+def test_empty_blocks_are_ignored_and_fees_capped():
+    history = {
+        'oldestBlock': 10,
+        'baseFeePerGas': [400 * GWEI] * 4,
+        'gasUsedRatio': [0.0, 0.9, 0.0],
+        'reward': [[0, 0, 0], [31 * GWEI, 50 * GWEI, 60 * GWEI], [0, 0, 0]]
+    }
+    oracle = FeeOracle(_fake_w3(history), max_fee=1000 * GWEI)
+    
+    assert oracle.fees('standard') == {'maxFeePerGas': 850 * GWEI, 'maxPriorityFeePerGas': 50 * GWEI}
+    assert oracle.fees('high') == {'maxFeePerGas': 1000 * GWEI, 'maxPriorityFeePerGas': 60 * GWEI}
+    assert oracle.block == 12
+
+def test_cached_fees_cost_no_rpc_per_transaction():
+    chain = FakeDevChain()
+    integration = _integration(chain)
+    
+    async def scenario():
+        return await asyncio.gather(*[
+            integration.submit_badge_mint(RECIPIENT, "uniqueness", f"0x{i:064x}") for i in range(20)
+        ])
+    
+    asyncio.run(scenario())
+    
+    assert len(chain.sent) == 20
+    assert chain.calls['eth_feeHistory'] == 1
+    assert not {'eth_gasPrice', 'eth_maxPriorityFeePerGas', 'eth_getBlockByNumber'} & set(chain.calls)
+    assert {(tx['price'], tx['priority_fee']) for tx in chain.sent} == {(100 * GWEI, 40 * GWEI)}
+    assert integration.fees.stats()['served'] == 20
+
+def test_sampled_once_per_block_and_inline_only_when_stale():
+    chain, clock = FakeDevChain(), FakeClock()
+    oracle = FeeOracle(Web3(chain), max_age=30, clock=clock)
+    
+    oracle.refresh()
+    oracle.refresh()  # same block: tiers kept
+    assert oracle.stats()['new_blocks'] == 1
+    
+    chain.base_fee = 60 * GWEI
+    chain.mine()
+    oracle.refresh()
+    assert oracle.fees()['maxFeePerGas'] == 160 * GWEI
+    
+    clock.now = 29
+    oracle.fees()
+    assert chain.calls['eth_feeHistory'] == 3
+    clock.now = 31  # background sampling stopped: the next transaction re-samples
+    oracle.fees()
+    assert chain.calls['eth_feeHistory'] == 4
+
+def test_unreachable_node_falls_back_without_retrying_per_transaction():
+    w3, clock = _fake_w3(), FakeClock()
+    oracle = FeeOracle(w3, refresh_interval=2, clock=clock)
+    
+    first = oracle.fees()
+    oracle.fees()
+    clock.now = 3
+    oracle.fees()
+    
+    assert first == {'maxFeePerGas': 100 * GWEI, 'maxPriorityFeePerGas': 30 * GWEI}
+    assert w3.eth.calls == 2
+    assert oracle.stats()['fallbacks'] == 3
+
+def test_stuck_transaction_is_repriced_to_the_high_tier():
+    clock = FakeClock()
+    chain, w3, _, manager = _manager(clock=clock)
+    oracle = FeeOracle(w3, clock=clock)
+    manager.reprice = lambda: oracle.fees('high')
+    tx_hash = manager.send({'to': RECIPIENT, 'value': 1, 'gas': 21000, 'chainId': CHAIN_ID, **oracle.fees()})
+    
+    # Base fee spikes well past a 12.5% bump
+    chain.base_fee = 200 * GWEI
+    chain.block += 1
+    oracle.refresh()
+    clock.now = 61
+    manager.replace_if_stuck(tx_hash)
+    
+    assert [tx['price'] for tx in chain.sent] == [100 * GWEI, 672 * GWEI]
+    assert chain.sent[1]['priority_fee'] == 72 * GWEI
+
+if __name__ == "__main__":
+    pytest.main([__file__])
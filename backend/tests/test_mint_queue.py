@@ -0,0 +1,219 @@
+import sys
+sys.path.insert(0, '..')
+
+import asyncio
+import json
+import os
+from pathlib import Path
+
+import pytest
+from eth_abi import decode
+from eth_account import Account
+from web3 import Web3
+
+import mint_queue
+from blockchain import PolygonIntegration
+from fake_chain import FakeDevChain
+from fee_oracle import FeeOracle
+from mint_queue import BADGE_ISSUE_FAILED_TOPIC, MintQueue
+from nonce_manager import NonceManager
+from receipt_tracker import ReceiptTracker, pending_mint_record
+from test_receipt_tracker import FakeDB, FakeWS, _integration
+
+BATCH_CONTRACT = "0x00000000000000000000000000000000000Ba7c4"
+REJECTING = "0x000000000000000000000000000000000000bad0"
+BATCH_SELECTOR = Web3.keccak(text="issueBadgeBatch(address[],string[],string[])")[:4]
+SINGLE_SELECTOR = Web3.keccak(text="issueBadge(address,string,string)")[:4]
+ITEM_GAS = 150000
+ARTIFACT = Path(__file__).resolve().parents[2] / "contracts/artifacts/contracts/SimpleZKBadge.sol/SimpleZKBadge.json"
+
+def _recipient(i):
+    return Web3.to_checksum_address(f"0x{0x1000 + i:040x}")
+
+def _batch_args(tx):
+    return decode(['address[]', 'string[]', 'string[]'], tx['data'][4:])
+
+def _execute(tx):
+    """SimpleZKBadge: mints to REJECTING revert, inside a batch they are reported"""
+    if tx['data'][:4] == SINGLE_SELECTOR:
+        recipient = decode(['address', 'string', 'string'], tx['data'][4:])[0]
+        return (0, 50000, []) if recipient == REJECTING.lower() else (1, ITEM_GAS, [])
+    
+    recipients = _batch_args(tx)[0]
+    logs = [
+        ([BADGE_ISSUE_FAILED_TOPIC, i.to_bytes(32, 'big'), bytes(12) + Web3.to_bytes(hexstr=r)], b'')
+        for i, r in enumerate(recipients) if r == REJECTING.lower()
+    ]
+    return 1, 30000 + ITEM_GAS * (len(recipients) - len(logs)), logs
+
+def _setup(window=0.01, max_batch=50):
+    chain, db, ws = FakeDevChain(), FakeDB(), FakeWS()
+    chain.execute = _execute
+    integration = _integration(chain)
+    queue = MintQueue(integration, contract=BATCH_CONTRACT, window=window, max_batch=max_batch)
+    tracker = ReceiptTracker(db, integration, ws, queue=queue)
+    return chain, db, ws, queue, tracker
+
+async def _submit(queue, db, tracker, recipients):
+    results = await asyncio.gather(*[
+        queue.submit(r, "uniqueness", f"proof-{i}") for i, r in enumerate(recipients)
+    ])
+    for i, (tx_hash, batch_index) in enumerate(results):
+        await db.badges.insert_one({'id': i, **pending_mint_record(tx_hash, batch_index)})
+        tracker.track(tx_hash)
+    return results
+
+def test_mints_in_one_window_share_a_batch_transaction():
+    chain, db, _, queue, tracker = _setup()
+    recipients = [_recipient(i) for i in range(10)]
+    
+    results = asyncio.run(_submit(queue, db, tracker, recipients))
+    
+    assert len(chain.sent) == 1
+    tx = chain.sent[0]
+    assert tx['data'][:4] == BATCH_SELECTOR
+    assert Web3.to_checksum_address(tx['to']) == BATCH_CONTRACT
+    assert [Web3.to_checksum_address(r) for r in _batch_args(tx)[0]] == recipients
+    assert tx['gas'] == mint_queue.MINT_BATCH_BASE_GAS + mint_queue.MINT_BATCH_ITEM_GAS * 10
+    assert results == [(Web3.to_hex(tx['hash']), i) for i in range(10)]
+    assert chain.calls['eth_getTransactionCount'] == 1
+
+def test_full_batches_are_sent_without_waiting_for_the_window():
+    chain, db, _, queue, tracker = _setup(window=60, max_batch=4)
+    
+    async def scenario():
+        return await asyncio.wait_for(
+            _submit(queue, db, tracker, [_recipient(i) for i in range(8)]), timeout=5
+        )
+    
+    results = asyncio.run(scenario())
+    
+    assert len(chain.sent) == 2
+    assert [index for _, index in results] == [0, 1, 2, 3, 0, 1, 2, 3]
+    assert queue.stats()['batches'] == 2
+
+def test_lone_mint_and_unconfigured_queue_send_single_mints():
+    chain, db, _, queue, tracker = _setup()
+    
+    async def scenario():
+        alone = await queue.submit(_recipient(0), "uniqueness", "proof-0")
+        queue.contract = ""
+        unbatched = await asyncio.gather(*[queue.submit(_recipient(i), "uniqueness", "p") for i in (1, 2)])
+        return [alone, *unbatched]
+    
+    results = asyncio.run(scenario())
+    
+    assert [index for _, index in results] == [None, None, None]
+    assert [tx['data'][:4] for tx in chain.sent] == [SINGLE_SELECTOR] * 3
+    assert [Web3.to_checksum_address(tx['to']) for tx in chain.sent] == [
+        BATCH_CONTRACT, PolygonIntegration.MINT_CONTRACT, PolygonIntegration.MINT_CONTRACT
+    ]
+    assert queue.stats()['single'] == 3
+
+def test_partial_failure_is_retried_individually():
+    chain, db, ws, queue, tracker = _setup()
+    recipients = [_recipient(0), REJECTING, _recipient(2)]
+    
+    async def scenario():
+        results = await _submit(queue, db, tracker, recipients)
+        chain.mine()
+        await tracker.poll_once()
+        return results
+    
+    [batch_hash] = {tx_hash for tx_hash, _ in asyncio.run(scenario())}
+    docs = {d['id']: d for d in db.badges.docs}
+    
+    assert docs[0]['status'] == docs[2]['status'] == 'confirmed'
+    retry = chain.sent[1]
+    assert retry['data'][:4] == SINGLE_SELECTOR
+    assert Web3.to_checksum_address(retry['to']) == BATCH_CONTRACT
+    assert decode(['address', 'string', 'string'], retry['data'][4:]) == (REJECTING.lower(), "uniqueness", "proof-1")
+    assert docs[1]['status'] == 'pending'
+    assert docs[1]['tx_hash'] == Web3.to_hex(retry['hash'])
+    assert docs[1]['batch_tx_hash'] == batch_hash
+    assert Web3.to_hex(retry['hash']) in tracker.pending
+    assert tracker.stats()['retried'] == 1
+    assert queue.stats()['gas_per_badge'] == {3: (30000 + 2 * ITEM_GAS) // 2}
+
+def test_reverted_batch_retries_every_badge():
+    chain, db, _, queue, tracker = _setup()
+    chain.execute = lambda tx: (0, 40000, []) if tx['data'][:4] == BATCH_SELECTOR else (1, ITEM_GAS, [])
+    
+    async def scenario():
+        await _submit(queue, db, tracker, [_recipient(i) for i in range(3)])
+        chain.mine()
+        await tracker.poll_once()  # batch reverted: three single retries
+        chain.mine()
+        await tracker.poll_once()
+    
+    asyncio.run(scenario())
+    
+    assert [tx['data'][:4] for tx in chain.sent] == [BATCH_SELECTOR] + [SINGLE_SELECTOR] * 3
+    assert all(d['status'] == 'confirmed' and d['gas_used'] == ITEM_GAS for d in db.badges.docs)
+    assert queue.stats()['gas_per_badge'] == {1: ITEM_GAS}
+
+def test_failures_in_unknown_batch_are_marked_failed():
+    chain, db, ws, queue, tracker = _setup()
+    
+    async def scenario():
+        await _submit(queue, db, tracker, [_recipient(0), REJECTING])
+        queue.batches.clear()  # broadcast by a previous process
+        chain.mine()
+        await tracker.poll_once()
+    
+    asyncio.run(scenario())
+    
+    assert [d['status'] for d in db.badges.docs] == ['confirmed', 'failed']
+    assert len(chain.sent) == 1
+    assert ('mint_failed', {'tx_hash': db.badges.docs[1]['tx_hash'], 'batch_index': 1, 'status': 'failed'}) in ws.events
+
+@pytest.mark.skipif(
+    not os.getenv("DEV_CHAIN_RPC_URL") or not ARTIFACT.exists(),
+    reason="set DEV_CHAIN_RPC_URL to an anvil/Hardhat node and run `npx hardhat compile` in contracts/"
+)
+def test_batch_mints_against_local_dev_chain():
+    # anvil / Hardhat default account #0, which deploys and so owns the contract
+    account = Account.from_key("0xac0974bec39a17e36ba4a6b4d238ff944bacb478cbed5efcae784d7bf4f2ff80")
+    w3 = Web3(Web3.HTTPProvider(os.environ["DEV_CHAIN_RPC_URL"]))
+    artifact = json.loads(ARTIFACT.read_text())
+    integration = PolygonIntegration()
+    integration.w3 = w3
+    integration.fees = FeeOracle(w3)
+    integration.account = account
+    integration.private_key = account.key
+    integration.nonces = NonceManager(w3, account.address, integration._sign)
+    
+    deploy = w3.eth.contract(abi=artifact['abi'], bytecode=artifact['bytecode']).constructor().build_transaction({
+        'from': account.address, 'gas': 5_000_000, **integration.fees.fees(), 'nonce': 0
+    })
+    receipt = w3.eth.wait_for_transaction_receipt(integration.nonces.send(deploy), timeout=30)
+    badge = w3.eth.contract(address=receipt['contractAddress'], abi=artifact['abi'])
+    
+    db = FakeDB()
+    queue = MintQueue(integration, contract=badge.address, window=0.05)
+    tracker = ReceiptTracker(db, integration, None, queue=queue)
+    recipients = [Account.create().address for _ in range(7)]
+    # The badge contract has no onERC721Received, so _safeMint to it reverts
+    recipients.append(badge.address)
+    
+    async def scenario():
+        await _submit(queue, db, tracker, recipients[:5])   # one issueBadgeBatch
+        await _submit(queue, db, tracker, recipients[5:6])  # a lone issueBadge
+        await _submit(queue, db, tracker, recipients[6:])   # a batch with one failure
+        for _ in range(50):
+            await tracker.poll_once()
+            if not tracker.pending:
+                return
+            await asyncio.sleep(0.2)
+    
+    asyncio.run(scenario())
+    
+    assert [d['status'] for d in db.badges.docs] == ['confirmed'] * 7 + ['failed']
+    assert db.badges.docs[7]['batch_tx_hash'] == db.badges.docs[6]['tx_hash']  # retried alone, reverted again
+    assert badge.functions.totalSupply().call() == 7
+    assert all(badge.functions.balanceOf(r).call() == 1 for r in recipients[:7])
+    gas_per_badge = queue.stats()['gas_per_badge']
+    assert gas_per_badge[5] < gas_per_badge[1]
+
+if __name__ == "__main__":
+    pytest.main([__file__])
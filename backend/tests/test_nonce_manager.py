@@ -0,0 +1,326 @@
+import sys
+sys.path.insert(0, '..')
+
+import asyncio
+import os
+import threading
+
+import pytest
+from eth_account import Account
+from web3 import Web3
+
+from blockchain import PolygonIntegration
+from fee_oracle import FeeOracle
+from fake_chain import FakeDevChain, CHAIN_ID
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+import nonce_manager
+from nonce_manager import LocalNonceStore, NonceManager, NonceStoreUnavailable, RedisNonceStore
+
+RECIPIENT = "0x000000000000000000000000000000000000dEaD"
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+class FakeRedis:
+    """Key/value store running the nonce scripts atomically, like Redis does"""
+    def __init__(self):
+        self.values = {}
+        self.lock = threading.Lock()
+        self.scripts = {
+            RedisNonceStore.ALLOCATE: self._allocate,
+            RedisNonceStore.ADVANCE: self._advance,
+            RedisNonceStore.RELEASE: self._release
+        }
+    
+    def register_script(self, source):
+        script = self.scripts[source]
+        def run(keys, args=()):
+            with self.lock:
+                return script(keys[0], *args)
+        return run
+    
+    def get(self, key):
+        return self.values.get(key)
+    
+    def set(self, key, value, nx=False):
+        with self.lock:
+            if nx and key in self.values:
+                return None
+            self.values[key] = int(value)
+            return True
+    
+    def _allocate(self, key):
+        if key not in self.values:
+            return -1
+        self.values[key] += 1
+        return self.values[key] - 1
+    
+    def _advance(self, key, next_nonce):
+        if self.values.get(key, -1) < next_nonce:
+            self.values[key] = next_nonce
+        return 1
+    
+    def _release(self, key, nonce):
+        if self.values.get(key, -1) == nonce + 1:
+            self.values[key] = nonce
+        else:
+            self.values.pop(key, None)
+        return 1
+
+def _manager(chain=None, clock=None, account=None, store=None):
+    chain = chain or FakeDevChain()
+    w3 = Web3(chain)
+    account = account or Account.create()
+    sign = lambda tx: w3.eth.account.sign_transaction(tx, account.key)
+    manager = NonceManager(w3, account.address, sign, stuck_after=60, clock=clock or FakeClock(), store=store)
+    return chain, w3, account, manager
+
+def _transfer(gas_price=30 * 10 ** 9):
+    return {'to': RECIPIENT, 'value': 1, 'gas': 21000, 'gasPrice': gas_price, 'chainId': CHAIN_ID}
+
+def test_concurrent_sends_get_distinct_nonces_from_one_sync():
+    chain, _, _, manager = _manager()
+    
+    threads = [threading.Thread(target=manager.send, args=(_transfer(),)) for _ in range(30)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    
+    assert sorted(tx['nonce'] for tx in chain.sent) == list(range(30))
+    assert chain.calls['eth_getTransactionCount'] == 1
+    assert chain.mine() == 30
+    assert manager.stats()['in_flight'] == 30  # until receipts are seen
+
+def test_resyncs_when_nonces_were_used_elsewhere():
+    chain, w3, account, manager = _manager()
+    manager.send(_transfer())
+    chain.mine()
+    
+    # Another process spends nonces 1 and 2 with the same key
+    for nonce in (1, 2):
+        signed = w3.eth.account.sign_transaction({**_transfer(), 'nonce': nonce}, account.key)
+        w3.eth.send_raw_transaction(signed.raw_transaction)
+    chain.mine()
+    
+    manager.send(_transfer())
+    
+    assert chain.sent[-1]['nonce'] == 3
+    assert manager.stats()['nonce_errors'] == 1
+
+def test_failed_broadcast_releases_its_nonce():
+    chain, _, _, manager = _manager()
+    manager.send(_transfer())
+    
+    chain.reject = lambda tx: "insufficient funds for gas * price + value"
+    with pytest.raises(Exception, match="insufficient funds"):
+        manager.send(_transfer())
+    chain.reject = None
+    manager.send(_transfer())
+    
+    assert [tx['nonce'] for tx in chain.sent] == [0, 1]
+
+def test_lost_broadcast_response_keeps_its_nonce():
+    chain, _, _, manager = _manager()
+    send_raw = chain.send_raw
+    
+    def reset_after_accepting(raw):
+        send_raw(raw)
+        chain.send_raw = send_raw
+        raise ConnectionResetError("connection reset by peer")
+    
+    chain.send_raw = reset_after_accepting
+    tx_hash = manager.send(_transfer())
+    manager.send(_transfer())
+    
+    assert tx_hash == chain.sent[0]['hash']
+    assert [tx['nonce'] for tx in chain.sent] == [0, 1]
+    assert manager.hashes_for(tx_hash) == [tx_hash]
+    assert manager.stats()['unconfirmed'] == 1
+
+def test_unreachable_node_keeps_the_nonce_pending_for_a_resend():
+    clock = FakeClock()
+    chain, _, _, manager = _manager(clock=clock)
+    send_raw = chain.send_raw
+    
+    def unreachable(raw):
+        raise TimeoutError("read timed out")
+    
+    chain.send_raw = unreachable
+    tx_hash = manager.send(_transfer())
+    chain.send_raw = send_raw
+    manager.send(_transfer())  # the next transaction never reuses nonce 0
+    clock.now = 61
+    replacement = manager.replace_if_stuck(tx_hash)
+    
+    assert [tx['nonce'] for tx in chain.sent] == [1, 0]
+    assert manager.hashes_for(tx_hash) == [tx_hash, replacement]
+
+def test_processes_sharing_a_redis_store_never_reuse_a_nonce():
+    redis = FakeRedis()
+    chain, _, account, first = _manager(store=RedisNonceStore(redis, 'nonce:test'))
+    _, _, _, second = _manager(chain, account=account, store=RedisNonceStore(redis, 'nonce:test'))
+    
+    threads = [
+        threading.Thread(target=manager.send, args=(_transfer(),))
+        for _ in range(15) for manager in (first, second)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    
+    assert sorted(tx['nonce'] for tx in chain.sent) == list(range(30))
+    assert first.stats()['nonce_errors'] + second.stats()['nonce_errors'] == 0
+    assert first.stats()['next_nonce'] == 30
+
+def test_unreachable_redis_refuses_to_send():
+    redis = FakeRedis()
+    
+    def down(keys, args=()):
+        raise RedisConnectionError("Connection refused")
+    
+    redis.register_script = lambda source: down
+    chain, _, _, manager = _manager(store=RedisNonceStore(redis, 'nonce:test'))
+    
+    with pytest.raises(NonceStoreUnavailable):
+        manager.send(_transfer())
+    assert chain.sent == []
+    assert manager.stats()['next_nonce'] is None
+
+def test_store_is_chosen_explicitly_without_connecting(monkeypatch):
+    monkeypatch.setattr(nonce_manager, 'REDIS_URL', "redis://10.255.255.1:6379/0")  # unroutable
+    
+    assert isinstance(nonce_manager.create_nonce_store("0xabc"), RedisNonceStore)
+    assert isinstance(nonce_manager.create_nonce_store("0xabc", store='local'), LocalNonceStore)
+    with pytest.raises(ValueError):
+        nonce_manager.create_nonce_store("0xabc", store='memory')
+
+def test_nonce_held_in_the_mempool_elsewhere_is_skipped():
+    chain, w3, account, manager = _manager()
+    manager.send(_transfer())
+    
+    # Another process holds nonce 1 in the mempool at a higher fee
+    signed = w3.eth.account.sign_transaction({**_transfer(gas_price=60 * 10 ** 9), 'nonce': 1}, account.key)
+    w3.eth.send_raw_transaction(signed.raw_transaction)
+    
+    manager.send(_transfer())
+    
+    assert [tx['nonce'] for tx in chain.sent] == [0, 1, 2]
+    assert manager.stats()['nonce_errors'] == 1
+
+def test_rebroadcast_of_a_known_transaction_is_idempotent():
+    chain, _, _, manager = _manager()
+    tx_hash = manager.send(_transfer())
+    
+    manager.store.reset(0)  # e.g. the response to the first broadcast was lost
+    
+    assert manager.send(_transfer()) == tx_hash
+    assert len(chain.sent) == 1
+
+def test_stuck_transaction_is_replaced_with_higher_fee():
+    clock = FakeClock()
+    chain, _, _, manager = _manager(clock=clock)
+    tx_hash = manager.send(_transfer(gas_price=10 ** 9))
+    
+    assert manager.replace_if_stuck(tx_hash) is None  # not stuck yet
+    clock.now = 61
+    replacement = manager.replace_if_stuck(tx_hash)
+    
+    assert replacement is not None and replacement != tx_hash
+    assert [tx['nonce'] for tx in chain.sent] == [0, 0]
+    assert chain.sent[1]['price'] >= chain.sent[0]['price'] * 1.1
+    assert manager.hashes_for(tx_hash) == [tx_hash, replacement]
+
+def test_underpriced_replacement_bumps_on_top_next_time():
+    clock = FakeClock()
+    chain, _, _, manager = _manager(clock=clock)
+    tx_hash = manager.send(_transfer(gas_price=10 ** 9))
+    
+    chain.reject = lambda tx: "replacement transaction underpriced"
+    clock.now = 61
+    assert manager.replace_if_stuck(tx_hash) is None
+    chain.reject = None
+    clock.now = 122
+    replacement = manager.replace_if_stuck(tx_hash)
+    
+    assert [tx['nonce'] for tx in chain.sent] == [0, 0]
+    assert chain.sent[1]['price'] >= chain.sent[0]['price'] * 1.2
+    assert manager.hashes_for(tx_hash) == [tx_hash, replacement]
+
+def _integration(chain):
+    integration = PolygonIntegration()
+    integration.w3 = Web3(chain)
+    integration.fees = FeeOracle(integration.w3)
+    integration.account = Account.create()
+    integration.private_key = integration.account.key
+    integration.nonces = NonceManager(integration.w3, integration.account.address, integration._sign)
+    return integration
+
+def test_concurrent_mints_are_pipelined():
+    chain = FakeDevChain()
+    integration = _integration(chain)
+    
+    async def scenario():
+        async def miner():
+            while True:
+                await asyncio.sleep(0.05)
+                chain.mine()
+        
+        task = asyncio.create_task(miner())
+        results = await asyncio.gather(*[
+            integration.mint_badge(RECIPIENT, "uniqueness", f"0x{i:064x}") for i in range(20)
+        ])
+        task.cancel()
+        return results
+    
+    results = asyncio.run(scenario())
+    
+    assert all(r and r['gas_used'] == 21000 for r in results)
+    assert sorted(tx['nonce'] for tx in chain.sent) == list(range(20))
+    assert chain.calls['eth_getTransactionCount'] == 1
+    assert integration.nonces.stats()['in_flight'] == 0
+
+def test_receipt_wait_follows_replacement():
+    chain = FakeDevChain()
+    integration = _integration(chain)
+    integration.nonces.stuck_after = 0.1
+    
+    async def scenario():
+        tx_hash = await integration.submit_badge_mint(RECIPIENT, "uniqueness", "0x01")
+        
+        async def miner():
+            while len(chain.sent) < 2:  # mine only once the replacement is out
+                await asyncio.sleep(0.02)
+            chain.mine()
+        
+        task = asyncio.create_task(miner())
+        receipt = await integration.wait_for_receipt(tx_hash, timeout=5, poll_interval=0.05)
+        await task
+        return tx_hash, receipt
+    
+    tx_hash, receipt = asyncio.run(scenario())
+    
+    assert receipt['transactionHash'] != tx_hash
+    assert receipt['transactionHash'] == chain.sent[1]['hash']
+
+@pytest.mark.skipif(not os.getenv("DEV_CHAIN_RPC_URL"), reason="set DEV_CHAIN_RPC_URL to an anvil/Hardhat node")
+def test_against_local_dev_chain():
+    # anvil / Hardhat default account #0
+    account = Account.from_key("0xac0974bec39a17e36ba4a6b4d238ff944bacb478cbed5efcae784d7bf4f2ff80")
+    w3 = Web3(Web3.HTTPProvider(os.environ["DEV_CHAIN_RPC_URL"]))
+    manager = NonceManager(w3, account.address, lambda tx: w3.eth.account.sign_transaction(tx, account.key))
+    tx = {'to': RECIPIENT, 'value': 1, 'gas': 21000, 'gasPrice': w3.eth.gas_price * 2, 'chainId': w3.eth.chain_id}
+    
+    hashes = [manager.send(tx) for _ in range(10)]
+    receipts = [w3.eth.wait_for_transaction_receipt(h, timeout=30) for h in hashes]
+    
+    assert all(r['status'] == 1 for r in receipts)
+
+if __name__ == "__main__":
+    pytest.main([__file__])
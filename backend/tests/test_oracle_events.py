@@ -0,0 +1,106 @@
+import sys
+sys.path.insert(0, '..')
+
+import asyncio
+import json
+
+from oracle_events import (
+    OracleEventSubscriber, DemandPublisher, BADGE_MINTED, PASSPORT_CREATED, PARTNER_DEMAND
+)
+from oracle_service import DynamicOracleService
+from refresh_scheduler import RefreshScheduler
+
+class FakeRedis:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.published = []
+    
+    async def publish(self, channel, message):
+        if self.fail:
+            raise ConnectionError("redis down")
+        self.published.append((channel, message))
+
+def _message(event_type, wallet_address):
+    return json.dumps({
+        'event_type': event_type,
+        'data': {'wallet_address': wallet_address},
+        'timestamp': '2026-01-01T00:00:00'
+    })
+
+def test_events_debounced_per_wallet():
+    dispatched = []
+    subscriber = OracleEventSubscriber(
+        lambda wallet, types: dispatched.append((wallet, sorted(types))), debounce=0.05
+    )
+    
+    async def scenario():
+        subscriber.handle(BADGE_MINTED, _message(BADGE_MINTED, '0xa'))
+        subscriber.handle(PASSPORT_CREATED, _message(PASSPORT_CREATED, '0xa'))
+        subscriber.handle(BADGE_MINTED, _message(BADGE_MINTED, '0xb'))
+        subscriber.handle(BADGE_MINTED, 'not json')
+        await asyncio.sleep(0.1)
+    
+    asyncio.run(scenario())
+    
+    assert sorted(dispatched) == [
+        ('0xa', [BADGE_MINTED, PASSPORT_CREATED]),
+        ('0xb', [BADGE_MINTED])
+    ]
+    assert subscriber.stats()['coalesced'] == 1
+    assert subscriber.stats()['invalid'] == 1
+
+def test_expedite_jumps_queue_and_reruns_in_flight_wallets():
+    clock = lambda: 5000.0
+    scheduler = RefreshScheduler(min_interval=10, max_interval=10000, clock=clock)
+    scheduler.add('0xold', due_at=100.0)
+    scheduler.add('0xbusy', due_at=200.0)
+    
+    # Unknown wallet goes ahead of long-overdue ones
+    scheduler.expedite('0xnew')
+    assert scheduler.pop_due(1) == ['0xnew']
+    
+    # Event while a refresh is in flight: refreshed again right after
+    assert scheduler.pop_due(10) == ['0xold', '0xbusy']
+    scheduler.expedite('0xold')
+    scheduler.mark_refreshed('0xold')
+    scheduler.mark_refreshed('0xbusy')
+    assert scheduler.pop_due(10) == ['0xold']
+
+def test_demand_reaches_the_shard_owner_without_expediting():
+    redis = FakeRedis()
+    service = DynamicOracleService(db=type('DB', (), {'passports': None, 'events': None})())
+    service.scheduler = RefreshScheduler(clock=lambda: 0.0)
+    service.scheduler.add('0xa', due_at=500.0)
+    
+    async def scenario():
+        assert await DemandPublisher(client=redis).publish('0xa')
+        subscriber = OracleEventSubscriber(service._on_chain_event, debounce=0.01)
+        for channel, message in redis.published:
+            subscriber.handle(channel, message)
+        await asyncio.sleep(0.05)
+    
+    asyncio.run(scenario())
+    
+    assert [channel for channel, _ in redis.published] == [PARTNER_DEMAND]
+    assert service.scheduler.heat('0xa') > 0
+    assert service.scheduler.pop_due(10, now=100.0) == []  # priority raised, not expedited
+
+def test_demand_publisher_backs_off_while_redis_is_down():
+    clock = type('Clock', (), {'now': 0.0, '__call__': lambda self: self.now})()
+    redis = FakeRedis(fail=True)
+    publisher = DemandPublisher(client=redis, clock=clock)
+    
+    async def scenario():
+        first = await publisher.publish('0xa')
+        second = await publisher.publish('0xa')
+        redis.fail = False
+        clock.now = 31
+        third = await publisher.publish('0xa')
+        return first, second, third
+    
+    assert asyncio.run(scenario()) == (False, False, True)
+    assert publisher.counters == {'published': 1, 'failed': 1}
+
+if __name__ == "__main__":
+    import pytest
+    pytest.main([__file__])
@@ -0,0 +1,208 @@
+import sys
+sys.path.insert(0, '..')
+
+import asyncio
+import time
+
+from oracle_pipeline import OraclePipeline
+
+def test_pipeline_runs_all_stages_with_bounded_concurrency():
+    async def scenario():
+        active = {'now': 0, 'peak': 0}
+        score_batches, written = [], []
+        
+        async def collect(job):
+            active['now'] += 1
+            active['peak'] = max(active['peak'], active['now'])
+            await asyncio.sleep(0.01)
+            active['now'] -= 1
+            job['data'] = job['id'] * 2
+        
+        def score(jobs):
+            score_batches.append(len(jobs))
+            for job in jobs:
+                job['score'] = job['data'] + 1
+        
+        async def write(job):
+            written.append(job['score'])
+        
+        pipeline = OraclePipeline(collect, score, write, workers=4, write_workers=2, queue_size=3)
+        await pipeline.start()
+        for i in range(40):
+            await pipeline.submit({'id': i})
+        await pipeline.join()
+        await pipeline.stop()
+        return pipeline, active, score_batches, written
+    
+    pipeline, active, score_batches, written = asyncio.run(scenario())
+    
+    assert sorted(written) == [i * 2 + 1 for i in range(40)]
+    assert active['peak'] == 4
+    assert sum(score_batches) == 40
+    assert pipeline.stats()['written'] == 40
+
+def test_slow_job_does_not_hold_back_others():
+    async def scenario():
+        done = []
+        
+        async def collect(job):
+            await asyncio.sleep(0.5 if job['id'] == 0 else 0.001)
+        
+        async def write(job):
+            done.append(job['id'])
+        
+        pipeline = OraclePipeline(collect, lambda jobs: None, write, workers=4, write_workers=1)
+        await pipeline.start()
+        for i in range(20):
+            await pipeline.submit({'id': i})
+        await asyncio.sleep(0.2)
+        finished_early = list(done)
+        await pipeline.join()
+        await pipeline.stop()
+        return finished_early, done
+    
+    finished_early, done = asyncio.run(scenario())
+    assert len(finished_early) == 19
+    assert done[-1] == 0
+
+def test_stage_errors_are_reported_per_job():
+    async def scenario():
+        failed = []
+        
+        async def collect(job):
+            if job['id'] == 1:
+                raise ValueError("source down")
+        
+        async def write(job):
+            pass
+        
+        pipeline = OraclePipeline(
+            collect, lambda jobs: None, write,
+            on_error=lambda job, e: failed.append((job['id'], str(e))),
+            workers=2, write_workers=1
+        )
+        await pipeline.start()
+        for i in range(3):
+            await pipeline.submit({'id': i})
+        await pipeline.join()
+        await pipeline.stop()
+        return pipeline, failed
+    
+    pipeline, failed = asyncio.run(scenario())
+    assert failed == [(1, "source down")]
+    assert pipeline.stats()['written'] == 2
+
+def test_failed_score_batch_falls_back_to_single_jobs():
+    async def scenario():
+        failed, written = [], []
+        
+        def score(jobs):
+            if any(job['id'] == 3 for job in jobs):
+                raise ValueError("bad features")
+            for job in jobs:
+                job['score'] = job['id']
+        
+        async def write(job):
+            written.append(job['score'])
+        
+        pipeline = OraclePipeline(
+            lambda job: asyncio.sleep(0), score, write,
+            on_error=lambda job, e: failed.append(job['id']),
+            workers=1, write_workers=1
+        )
+        # Queue everything before the score worker runs so it sees one micro-batch
+        pipeline.score_queue = asyncio.Queue()
+        pipeline.write_queue = asyncio.Queue()
+        for i in range(6):
+            pipeline.score_queue.put_nowait({'id': i})
+        pipeline._tasks = [asyncio.create_task(pipeline._score_worker()),
+                           asyncio.create_task(pipeline._write_worker())]
+        await pipeline.score_queue.join()
+        await pipeline.write_queue.join()
+        await pipeline.stop()
+        return pipeline, failed, written
+    
+    pipeline, failed, written = asyncio.run(scenario())
+    assert failed == [3]
+    assert sorted(written) == [0, 1, 2, 4, 5]
+    assert pipeline.counters['score_fallbacks'] == 1
+    assert pipeline.counters['scored'] == 5
+
+def test_raising_error_handler_does_not_kill_workers():
+    async def scenario():
+        written = []
+        
+        async def collect(job):
+            if job['id'] % 2:
+                raise ValueError("source down")
+        
+        async def write(job):
+            written.append(job['id'])
+        
+        def on_error(job, e):
+            raise RuntimeError("handler broke")
+        
+        pipeline = OraclePipeline(collect, lambda jobs: None, write, on_error=on_error,
+                                  workers=1, write_workers=1)
+        await pipeline.start()
+        for i in range(6):
+            await pipeline.submit({'id': i})
+        await asyncio.wait_for(pipeline.join(), 1)
+        await pipeline.stop()
+        return pipeline, written
+    
+    pipeline, written = asyncio.run(scenario())
+    assert written == [0, 2, 4]
+    assert pipeline.counters['failed'] == 3
+
+def test_scoring_runs_off_the_event_loop():
+    async def scenario():
+        ticks = []
+        
+        async def ticker():
+            while True:
+                ticks.append(time.monotonic())
+                await asyncio.sleep(0.01)
+        
+        def score(jobs):
+            time.sleep(0.2)  # a large numpy micro-batch
+        
+        pipeline = OraclePipeline(lambda job: asyncio.sleep(0), score, lambda job: asyncio.sleep(0),
+                                  workers=1, write_workers=1)
+        await pipeline.start()
+        probe = asyncio.create_task(ticker())
+        await pipeline.submit({'id': 0})
+        await asyncio.wait_for(pipeline.join(), 1)
+        probe.cancel()
+        await pipeline.stop()
+        return ticks
+    
+    ticks = asyncio.run(scenario())
+    assert len(ticks) > 5
+    assert max(b - a for a, b in zip(ticks, ticks[1:])) < 0.1
+
+def test_capacity_tracks_the_collect_queue():
+    async def scenario():
+        release = asyncio.Event()
+        
+        async def collect(job):
+            await release.wait()
+        
+        pipeline = OraclePipeline(collect, lambda jobs: None, lambda job: asyncio.sleep(0),
+                                  workers=1, write_workers=1, queue_size=4)
+        assert pipeline.capacity() == 4
+        await pipeline.start()
+        for i in range(3):
+            await pipeline.submit({'id': i})
+        await asyncio.sleep(0)
+        free = pipeline.capacity()  # one job taken by the worker, two waiting
+        release.set()
+        await asyncio.wait_for(pipeline.join(), 1)
+        await pipeline.stop()
+        return free
+    
+    assert asyncio.run(scenario()) == 2
+
+if __name__ == "__main__":
+    import pytest
+    pytest.main([__file__])
@@ -0,0 +1,150 @@
+import sys
+sys.path.insert(0, '..')
+
+import asyncio
+
+from oracle_service import DynamicOracleService
+from refresh_scheduler import RefreshScheduler
+
+DATA = {
+    'wallet_address': '0xabc',
+    'github_score': 60,
+    'twitter_score': 40,
+    'tx_count': 120,
+    'tx_volume_usd': 5000,
+    'account_age_days': 200,
+    'total_borrowed': 0,
+    'total_supplied': 1000,
+    'repayment_rate': 100,
+    'liquidation_count': 0
+}
+
+class FakeCollection:
+    def __init__(self):
+        self.operations = []
+    
+    async def bulk_write(self, operations, ordered=True):
+        self.operations.extend(operations)
+
+class FakeDB:
+    def __init__(self):
+        self.passports = FakeCollection()
+        self.events = FakeCollection()
+
+def _service(collected):
+    service = DynamicOracleService(FakeDB())
+    
+    async def collect(wallet_address, previous=None, aave=None):
+        collected.append(wallet_address)
+        return dict(DATA)
+    
+    service._collect_all_data = collect
+    return service
+
+def test_unchanged_inputs_skip_scoring_and_write():
+    async def scenario():
+        collected = []
+        service = _service(collected)
+        passport = {'passport_id': 'p1', 'owner': '0xabc', 'credit_score': 0}
+        
+        await service._update_passport(passport)
+        await service.passport_writer.flush()
+        first_update = service.db.passports.operations[-1]._doc['$set']
+        
+        passport['inputs_hash'] = first_update['inputs_hash']
+        await service._update_passport(passport)
+        await service.passport_writer.flush()
+        second_update = service.db.passports.operations[-1]._doc
+        
+        await service._update_passport(passport, force=True)
+        await service.passport_writer.flush()
+        return service, second_update
+    
+    service, second_update = asyncio.run(scenario())
+    
+    assert list(second_update['$set']) == ['checked_at']
+    assert '$push' not in second_update
+    assert service.cycle_counters == {'written': 2, 'skipped': 1, 'dropped': 0}
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = list(docs)
+    
+    def __aiter__(self):
+        return self
+    
+    async def __anext__(self):
+        if self.docs:
+            return self.docs.pop(0)
+        raise StopAsyncIteration
+
+def _refresh_service(wallets):
+    service = _service([])
+    service.refresh_rate = 10
+    service.scheduler = RefreshScheduler(clock=lambda: 0.0)
+    for wallet_address in wallets:
+        service.scheduler.add(wallet_address)
+    service.db.passports.find = lambda query: FakeCursor([{'owner': w} for w in query['owner']['$in']])
+    
+    async def prefetch(wallets):
+        return {'0x1': {'total_collateral_usd': 5000, 'health_factor': 2.0}}
+    
+    service._prefetch_aave = prefetch
+    return service
+
+async def _run_one_tick(service):
+    service.running = True
+    task = asyncio.create_task(service._refresh_loop())
+    await asyncio.sleep(0.05)
+    service.running = False
+    task.cancel()
+
+def test_refresh_loop_reschedules_wallets_it_never_submitted():
+    service = _refresh_service(['0x1', '0x2', '0x3'])
+    submitted = []
+    
+    async def submit(job):
+        if job['passport']['owner'] == '0x2':
+            raise RuntimeError("pipeline stopped")
+        submitted.append(job['passport']['owner'])
+    
+    service.pipeline.submit = submit
+    asyncio.run(_run_one_tick(service))
+    
+    assert submitted == ['0x1']
+    # 0x1 is in the pipeline; the others are queued for a retry instead of lost
+    assert service.scheduler.pop_due(10, now=3600) == ['0x2', '0x3']
+
+def test_refresh_loop_carries_prefetched_aave_into_jobs():
+    service = _refresh_service(['0x1', '0x2'])
+    jobs = []
+    
+    async def submit(job):
+        jobs.append(job)
+    
+    service.pipeline.submit = submit
+    asyncio.run(_run_one_tick(service))
+    
+    assert {job['passport']['owner']: job['aave'] for job in jobs} == {
+        '0x1': {'total_collateral_usd': 5000, 'health_factor': 2.0},
+        '0x2': None
+    }
+
+def test_refresh_loop_pops_what_the_pipeline_can_take():
+    service = _refresh_service(['0x1', '0x2', '0x3', '0x4', '0x5'])
+    service.refresh_rate = 0  # uncapped: the pipeline sets the pace
+    jobs = []
+    
+    async def submit(job):
+        jobs.append(job)
+    
+    service.pipeline.submit = submit
+    service.pipeline.capacity = lambda: 2 - len(jobs)  # two free slots, never drained
+    asyncio.run(_run_one_tick(service))
+    
+    assert [job['passport']['owner'] for job in jobs] == ['0x1', '0x2']
+    assert service.scheduler.pop_due(10, now=0) == ['0x3', '0x4', '0x5']
+
+if __name__ == "__main__":
+    import pytest
+    pytest.main([__file__])
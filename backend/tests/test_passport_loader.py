@@ -0,0 +1,131 @@
+import sys
+sys.path.insert(0, '..')
+
+import asyncio
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from ai_models import AIRiskOracleV2
+from passport_loader import PassportColumns, iter_passport_columns
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+    
+    def batch_size(self, size):
+        return self
+    
+    def __aiter__(self):
+        self._iter = iter(self.docs)
+        return self
+    
+    async def __anext__(self):
+        try:
+            return next(self._iter)
+        except StopIteration:
+            raise StopAsyncIteration
+
+class FakeCollection:
+    def __init__(self, docs):
+        self.docs = docs
+    
+    def find(self, query=None, projection=None):
+        return FakeCursor(self.docs)
+    
+    async def count_documents(self, query):
+        return len(self.docs)
+
+class FakeDB:
+    def __init__(self, docs):
+        self.passports = FakeCollection(docs)
+
+PASSPORTS = [
+    {
+        'passport_id': 'p1',
+        'owner': '0xaaa',
+        'credit_score': 720,
+        'pohScore': 80,
+        'badgeCount': 4,
+        'onchainActivity': 60,
+        'issuedAt': datetime.utcnow() - timedelta(days=100),
+        'score_history': [600, 650, 720],
+        'data_sources': {
+            'github': {'score': 70},
+            'wallet': {'tx_count': 120, 'volume_usd': 5000},
+            'defi': {'borrowed': 1000, 'supplied': 3000, 'repayment_rate': 95, 'liquidations': 1}
+        }
+    },
+    {
+        'passport_id': 'p2',
+        'wallet_address': '0xbbb',
+        'credit_score': 450,
+        'poh_score': 30,
+        'badge_count': 1,
+        'issued_at': (datetime.utcnow() - timedelta(days=10)).isoformat(),
+        'data_sources': {'twitter_score': 40, 'tx_count': 10, 'total_supplied': 200}
+    }
+]
+
+EXPECTED_USERS = [
+    {
+        'credit_score': 720, 'poh_score': 80, 'badge_count': 4, 'onchain_activity': 60,
+        'account_age_days': 100, 'score_history': [600, 650, 720], 'github_score': 70,
+        'tx_count': 120, 'tx_volume_usd': 5000, 'total_borrowed': 1000,
+        'total_supplied': 3000, 'repayment_rate': 95, 'liquidation_count': 1
+    },
+    {
+        'credit_score': 450, 'poh_score': 30, 'badge_count': 1, 'account_age_days': 10,
+        'score_history': [], 'twitter_score': 40, 'tx_count': 10, 'total_supplied': 200
+    }
+]
+
+async def _load(docs, chunk_size=100):
+    return [block async for block in iter_passport_columns(FakeDB(docs), chunk_size=chunk_size)]
+
+def test_load_matches_extract_features():
+    [block] = asyncio.run(_load(PASSPORTS))
+    
+    assert block.count == 2
+    assert block.wallets == ['0xaaa', '0xbbb']
+    expected = AIRiskOracleV2().extract_feature_matrix(EXPECTED_USERS)
+    assert np.array_equal(block.feature_matrix(), expected)
+
+def test_iter_chunks():
+    blocks = asyncio.run(_load(PASSPORTS * 5, chunk_size=4))
+    assert [block.count for block in blocks] == [4, 4, 2]
+    assert blocks[0].feature_matrix().shape == (4, 19)
+
+def test_from_documents_matches_stream():
+    [streamed] = asyncio.run(_load(PASSPORTS))
+    block = PassportColumns.from_documents(PASSPORTS)
+    
+    assert block.wallets == streamed.wallets
+    assert np.allclose(block.feature_matrix(), streamed.feature_matrix())
+
+def test_bad_stored_values_are_coerced_or_skipped():
+    docs = [
+        {'owner': '0x1', 'credit_score': '720', 'pohScore': 'n/a', 'score_history': ['x', 600, '720']},
+        {'owner': '0x2', 'credit_score': 500, 'score_stats': {'count': 3}},  # corrupt stats: skipped
+        {'owner': '0x3', 'credit_score': float('nan'), 'data_sources': {'wallet': {'tx_count': '12'}}}
+    ]
+    
+    [block] = asyncio.run(_load(docs))
+    
+    assert block.wallets == ['0x1', '0x3']
+    columns = block.trimmed_columns()
+    assert list(columns['credit_score']) == [720.0, 0.0]
+    assert list(columns['poh_score']) == [0.0, 0.0]
+    assert list(columns['tx_count']) == [0.0, 12.0]
+    expected = AIRiskOracleV2().extract_feature_matrix([
+        {'credit_score': 720, 'score_history': [600, 720]},
+        {'tx_count': 12}
+    ])
+    assert np.allclose(block.feature_matrix()[:, [0, 7, 17, 18]], expected[:, [0, 7, 17, 18]])
+
+if __name__ == "__main__":
+    test_load_matches_extract_features()
+    test_iter_chunks()
+    test_from_documents_matches_stream()
+    test_bad_stored_values_are_coerced_or_skipped()
+    print("✅ All tests passed!")
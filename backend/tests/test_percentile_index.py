@@ -0,0 +1,158 @@
+import sys
+sys.path.insert(0, '..')
+
+import asyncio
+
+from percentile_index import ScoreIndex, PopulationIndex, credit_rank_value
+
+class FakeCursor:
+    def __init__(self, docs, during_scan=None):
+        self.docs = docs
+        self.during_scan = during_scan
+    
+    def batch_size(self, size):
+        return self
+    
+    def __aiter__(self):
+        self._iter = iter(self.docs)
+        return self
+    
+    async def __anext__(self):
+        try:
+            doc = next(self._iter)
+        except StopIteration:
+            raise StopAsyncIteration
+        if self.during_scan:
+            self.during_scan()
+            self.during_scan = None
+        return doc
+
+class FakeDB:
+    def __init__(self, docs, during_scan=None):
+        self.passports = type('Passports', (), {
+            'find': lambda _, query, projection: FakeCursor(docs, during_scan)
+        })()
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+def test_rank_higher_is_better():
+    index = ScoreIndex(higher_is_better=True)
+    index.load({f"0x{i}": float(i) for i in range(1, 101)})
+    
+    top = index.rank(100.0)
+    assert top['rank'] == 1
+    assert top['percentile'] == 99.0
+    assert top['top_percent'] == 1.0
+    assert index.rank(1.0)['rank'] == 100
+
+def test_rank_lower_is_better():
+    index = ScoreIndex(higher_is_better=False)
+    index.load({"a": 10.0, "b": 20.0, "c": 30.0, "d": 40.0})
+    
+    assert index.rank(10.0)['rank'] == 1
+    assert index.rank(40.0)['percentile'] == 0.0
+
+def test_incremental_update_moves_score():
+    index = ScoreIndex()
+    index.load({"a": 1.0, "b": 2.0, "c": 3.0})
+    
+    index.update("a", 5.0)
+    assert len(index) == 3
+    assert index.rank(index.get("a"))['rank'] == 1
+    
+    index.remove("b")
+    assert len(index) == 2
+    assert index.rank(index.get("c"))['rank'] == 2
+
+def test_population_lookup_missing_wallet():
+    population = PopulationIndex()
+    population.update("0xabc", credit_score=700)
+    
+    ranking = population.lookup("0xabc")
+    assert ranking['credit_score']['rank'] == 1
+    assert ranking['risk_score'] is None
+    assert population.lookup("0xdef") == {'credit_score': None, 'risk_score': None}
+
+def test_duplicate_scores_move_one_entry():
+    index = ScoreIndex()
+    index.load({"a": 5.0, "b": 5.0, "c": 1.0})
+    
+    index.update("a", 9.0)
+    index.remove("b")
+    assert len(index) == 2
+    assert index.rank(5.0)['population'] == 2
+    assert index.rank(9.0)['rank'] == 1
+    assert index.rank(1.0)['rank'] == 2
+
+def test_updates_during_rebuild_survive_the_swap():
+    population = PopulationIndex()
+    docs = [
+        {'owner': '0xa', 'credit_score': 500, 'risk_score': 40},
+        {'wallet_address': '0xb', 'credit_score': 600, 'risk_score': 30}
+    ]
+    # 0xa is rescored after the scan already read its old document
+    db = FakeDB(docs, during_scan=lambda: population.update('0xa', credit_score=900, risk_score=5))
+    
+    asyncio.run(population.build(db))
+    
+    assert population.credit_score.get('0xa') == 900
+    assert population.risk_score.get('0xa') == 5
+    assert population.lookup('0xa')['credit_score']['rank'] == 1
+    assert len(population.credit_score) == 2
+    assert population._pending is None
+    
+    # Later updates apply directly
+    population.update('0xb', credit_score=950)
+    assert population.lookup('0xb')['credit_score']['rank'] == 1
+
+def test_oracle_scores_rank_on_the_credit_scale():
+    population = PopulationIndex()
+    docs = [
+        {'owner': '0xa', 'credit_score': 800},                    # credit scoring service, 0-1000
+        {'owner': '0xb', 'credit_score': 10.0, 'risk_score': 10.0},  # oracle: low risk
+        {'owner': '0xc', 'credit_score': 90.0, 'risk_score': 90.0}   # oracle: high risk
+    ]
+    
+    asyncio.run(population.build(FakeDB(docs)))
+    
+    assert population.credit_score.get('0xb') == 900
+    assert [population.lookup(w)['credit_score']['rank'] for w in ('0xb', '0xa', '0xc')] == [1, 2, 3]
+    assert credit_rank_value(700, 20) == 700  # chain-synced credit score after an oracle write
+
+def test_stale_index_rebuilds_in_the_background():
+    clock = FakeClock()
+    population = PopulationIndex(max_age=60, clock=clock)
+    docs = [{'owner': '0xa', 'risk_score': 40}]
+    db = FakeDB(docs)
+    
+    async def scenario():
+        await population.ensure_built(db)
+        docs.append({'owner': '0xb', 'risk_score': 20})  # written by another process
+        await population.ensure_built(db)
+        assert len(population.risk_score) == 1  # still fresh
+        
+        clock.now = 61
+        await population.ensure_built(db)
+        assert len(population.risk_score) == 1  # stale copy served meanwhile
+        await population._rebuild
+    
+    asyncio.run(scenario())
+    
+    assert population.lookup('0xb')['risk_score']['rank'] == 1
+    assert population.built_at == 61
+
+if __name__ == "__main__":
+    test_rank_higher_is_better()
+    test_rank_lower_is_better()
+    test_incremental_update_moves_score()
+    test_population_lookup_missing_wallet()
+    test_duplicate_scores_move_one_entry()
+    test_updates_during_rebuild_survive_the_swap()
+    test_oracle_scores_rank_on_the_credit_scale()
+    test_stale_index_rebuilds_in_the_background()
+    print("✅ All tests passed!")
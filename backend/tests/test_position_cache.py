@@ -0,0 +1,139 @@
+import sys
+sys.path.insert(0, '..')
+
+import asyncio
+import threading
+import time
+
+from web3 import Web3
+
+from defi_indexer import DeFiIndexer
+from position_cache import PositionCache, AaveInvalidationWatcher, BackgroundRefresher
+
+WALLET = Web3.to_checksum_address("0x" + "ab" * 20)
+REPAY = bytes(Web3.keccak(text="Repay(address,address,address,uint256,bool)"))
+
+class FakeCache:
+    enabled = True
+    
+    def __init__(self):
+        self.store = {}
+    
+    def get(self, key):
+        return self.store.get(key)
+    
+    def set(self, key, value, ttl=300):
+        self.store[key] = value
+        return True
+
+def test_entries_go_stale_and_are_invalidated_by_later_events():
+    positions = PositionCache(FakeCache(), fresh_ttl=60)
+    positions.store("aave", WALLET, {'debt': 1}, block=100)
+    
+    assert positions.lookup("aave", WALLET.lower()) == ({'debt': 1}, False)
+    
+    positions.cache.store[f"aave:{WALLET.lower()}"]['fetched_at'] -= 61
+    assert positions.lookup("aave", WALLET) == ({'debt': 1}, True)
+    
+    positions.invalidate(WALLET, block=100)  # same block: read already includes it
+    assert positions.lookup("aave", WALLET)[0] == {'debt': 1}
+    
+    positions.invalidate(WALLET, block=101)
+    assert positions.lookup("aave", WALLET) == (None, True)
+    
+    positions.store("aave", WALLET, {'debt': 0}, block=100)  # read predates the event
+    assert positions.counters['rejected'] == 1
+    positions.store("aave", WALLET, {'debt': 0}, block=101)
+    assert positions.lookup("aave", WALLET) == ({'debt': 0}, False)
+
+class FakeCall:
+    def __init__(self, indexer):
+        self.indexer = indexer
+    
+    def call(self, block_identifier=None):
+        self.indexer.calls.append(block_identifier)
+        return [100 * 10**8, 10 * 10**8, 0, 8000, 7000, 2 * 10**18]
+
+class FakeFunctions:
+    def __init__(self, indexer):
+        self.indexer = indexer
+    
+    def getUserAccountData(self, address):
+        return FakeCall(self.indexer)
+
+def _indexer():
+    indexer = DeFiIndexer()
+    indexer.positions = PositionCache(FakeCache(), fresh_ttl=60)
+    indexer.calls = []
+    indexer.aave_pool = type('Pool', (), {'functions': FakeFunctions(indexer)})()
+    indexer._block = (500, time.monotonic() + 3600)
+    return indexer
+
+def test_get_aave_data_caches_success_and_serves_stale_while_revalidating():
+    indexer = _indexer()
+    
+    first = indexer.get_aave_data(WALLET)
+    second = indexer.get_aave_data(WALLET)
+    assert first == second
+    assert indexer.calls == [500]  # success path is cached, pinned to the block
+    
+    indexer.positions.cache.store[f"aave:{WALLET.lower()}"]['fetched_at'] -= 61
+    stale = indexer.get_aave_data(WALLET)
+    assert stale == first
+    
+    deadline = time.time() + 2
+    while len(indexer.calls) < 2 and time.time() < deadline:
+        time.sleep(0.01)
+    assert len(indexer.calls) == 2
+    assert indexer.positions.lookup("aave", WALLET)[1] is False
+
+def test_refreshes_run_on_the_web3_pool_once_per_key():
+    refresher = BackgroundRefresher()
+    release = threading.Event()
+    threads = []
+    
+    def refresh(wallet):
+        threads.append(threading.current_thread().name)
+        release.wait(2)
+    
+    assert refresher.submit(["aave:0x1"], refresh, "0x1")
+    assert not refresher.submit(["aave:0x1"], refresh, "0x1")  # already in flight
+    assert refresher.submit(["aave:0x2"], refresh, "0x2")
+    release.set()
+    
+    deadline = time.time() + 2
+    while refresher._in_flight and time.time() < deadline:
+        time.sleep(0.01)
+    assert len(threads) == 2
+    assert all(name.startswith("web3") for name in threads)
+    assert refresher.submit(["aave:0x1"], refresh, "0x1")  # done: may refresh again
+
+def test_watcher_invalidates_wallets_from_aave_logs():
+    positions = PositionCache(FakeCache())
+    topic = lambda address: bytes(12) + bytes.fromhex(address[2:])
+    logs = [{
+        'topics': [REPAY, bytes(32), topic(WALLET), bytes(32)],
+        'blockNumber': 205
+    }]
+    
+    class FakeEth:
+        block_number = 200
+        
+        def get_logs(self, params):
+            assert params['fromBlock'] == 201 and params['toBlock'] == 210
+            return logs
+    
+    w3 = type('W3', (), {'eth': FakeEth()})()
+    watcher = AaveInvalidationWatcher(w3, "0x794a61358D6845594F94dc1DB02A252b5b4814aD", positions)
+    
+    async def scenario():
+        await watcher.poll()
+        w3.eth.block_number = 210
+        return await watcher.poll()
+    
+    assert asyncio.run(scenario()) == 1
+    assert positions.cache.get(f"defi:dirty:{WALLET.lower()}") == 205
+
+if __name__ == "__main__":
+    import pytest
+    pytest.main([__file__])
@@ -0,0 +1,182 @@
+import sys
+sys.path.insert(0, '..')
+
+import asyncio
+
+from eth_account import Account
+from web3 import Web3
+
+from blockchain import PolygonIntegration
+from fee_oracle import FeeOracle
+from fake_chain import FakeDevChain
+from nonce_manager import NonceManager
+from receipt_tracker import ReceiptTracker, pending_mint_record
+
+RECIPIENT = "0x000000000000000000000000000000000000dEaD"
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+    
+    def __aiter__(self):
+        self._iter = iter(self.docs)
+        return self
+    
+    async def __anext__(self):
+        try:
+            return next(self._iter)
+        except StopIteration:
+            raise StopAsyncIteration
+
+class FakeBadges:
+    def __init__(self):
+        self.docs = []
+    
+    async def insert_one(self, doc):
+        self.docs.append(doc)
+    
+    def find(self, query, projection=None):
+        return FakeCursor([d for d in self.docs if all(d.get(k) == v for k, v in query.items())])
+    
+    async def update_many(self, query, update):
+        for doc in self.docs:
+            if all(doc.get(k) == v for k, v in query.items()):
+                doc.update(update.get('$set', {}))
+                for field, value in update.get('$addToSet', {}).items():
+                    if value not in doc.setdefault(field, []):
+                        doc[field].append(value)
+
+class FakeDB:
+    def __init__(self):
+        self.badges = FakeBadges()
+
+class FakeWS:
+    def __init__(self):
+        self.events = []
+    
+    async def broadcast_badge_minted(self, data):
+        self.events.append(('badge_minted', data))
+    
+    async def broadcast(self, event_type, data):
+        self.events.append((event_type, data))
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+def _integration(chain):
+    integration = PolygonIntegration()
+    integration.w3 = Web3(chain)
+    integration.fees = FeeOracle(integration.w3)
+    integration.account = Account.create()
+    integration.private_key = integration.account.key
+    integration.nonces = NonceManager(integration.w3, integration.account.address, integration._sign)
+    return integration
+
+async def _submit(integration, db, tracker, count):
+    hashes = await asyncio.gather(*[
+        integration.submit_badge_mint(RECIPIENT, "uniqueness", f"0x{i:064x}") for i in range(count)
+    ])
+    for tx_hash in hashes:
+        tx_hash = Web3.to_hex(tx_hash)
+        await db.badges.insert_one({'id': tx_hash[-8:], **pending_mint_record(tx_hash)})
+        tracker.track(tx_hash)
+    return [Web3.to_hex(h) for h in hashes]
+
+def test_pending_mints_resolve_in_one_poll():
+    chain, db, ws = FakeDevChain(), FakeDB(), FakeWS()
+    integration = _integration(chain)
+    tracker = ReceiptTracker(db, integration, ws)
+    
+    async def scenario():
+        await _submit(integration, db, tracker, 30)
+        assert await tracker.poll_once() == 0  # nothing mined yet
+        chain.mine()
+        return await tracker.poll_once()
+    
+    assert asyncio.run(scenario()) == 30
+    assert all(d['status'] == 'confirmed' and d['gas_used'] == 21000 and d['gas_fee'] for d in db.badges.docs)
+    assert len([e for e in ws.events if e[0] == 'badge_minted']) == 30
+    assert tracker.stats()['pending'] == 0
+    assert integration.nonces.stats()['in_flight'] == 0
+
+def test_tracker_resumes_pending_records_and_drops_lost_ones():
+    chain, db, ws, clock = FakeDevChain(), FakeDB(), FakeWS(), FakeClock()
+    integration = _integration(chain)
+    lost = "0x" + "ab" * 32
+    
+    async def scenario():
+        first = ReceiptTracker(db, integration, ws, clock=clock, drop_after=600)
+        hashes = await _submit(integration, db, first, 2)
+        await db.badges.insert_one({'id': 'lost', **pending_mint_record(lost)})
+        
+        # A new process picks up every pending record
+        tracker = ReceiptTracker(db, integration, ws, clock=clock, drop_after=600)
+        await tracker.start()
+        await tracker.stop()
+        assert set(tracker.pending) == set(hashes) | {lost}
+        
+        chain.mine()
+        clock.now = 601
+        return await tracker.poll_once()
+    
+    assert asyncio.run(scenario()) == 3
+    statuses = {d['id']: d['status'] for d in db.badges.docs}
+    assert statuses.pop('lost') == 'dropped'
+    assert set(statuses.values()) == {'confirmed'}
+    assert ('mint_failed', {'tx_hash': lost, 'status': 'dropped'}) in ws.events
+
+def test_mined_replacement_is_recorded():
+    chain, db, ws = FakeDevChain(), FakeDB(), FakeWS()
+    integration = _integration(chain)
+    integration.nonces.stuck_after = 0
+    tracker = ReceiptTracker(db, integration, ws)
+    
+    async def scenario():
+        [tx_hash] = await _submit(integration, db, tracker, 1)
+        await tracker.poll_once()  # not mined: stuck, so replaced
+        chain.mine()
+        await tracker.poll_once()
+        return tx_hash
+    
+    tx_hash = asyncio.run(scenario())
+    doc = db.badges.docs[0]
+    
+    assert doc['tx_hash'] == tx_hash
+    assert doc['status'] == 'confirmed'
+    assert doc['mined_tx_hash'] == Web3.to_hex(chain.sent[1]['hash'])
+
+def test_replacement_mined_after_a_restart_is_found():
+    chain, db, ws = FakeDevChain(), FakeDB(), FakeWS()
+    integration = _integration(chain)
+    integration.nonces.stuck_after = 0
+    
+    async def scenario():
+        first = ReceiptTracker(db, integration, ws)
+        [tx_hash] = await _submit(integration, db, first, 1)
+        await first.poll_once()  # not mined: stuck, so replaced
+        
+        # The new process's nonce manager has never seen the replacement
+        restarted = _integration(chain)
+        restarted.account = integration.account
+        restarted.nonces = NonceManager(restarted.w3, integration.account.address, restarted._sign)
+        tracker = ReceiptTracker(db, restarted, ws)
+        await tracker.start()
+        await tracker.stop()
+        chain.mine()
+        assert await tracker.poll_once() == 1
+        return tx_hash
+    
+    tx_hash = asyncio.run(scenario())
+    doc = db.badges.docs[0]
+    
+    assert doc['tx_hashes'] == [tx_hash, Web3.to_hex(chain.sent[1]['hash'])]
+    assert doc['status'] == 'confirmed'
+    assert doc['mined_tx_hash'] == Web3.to_hex(chain.sent[1]['hash'])
+
+if __name__ == "__main__":
+    import pytest
+    pytest.main([__file__])
@@ -0,0 +1,82 @@
+import sys
+sys.path.insert(0, '..')
+
+from refresh_scheduler import RefreshScheduler
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self):
+        return self.now
+
+def _scheduler(clock):
+    return RefreshScheduler(min_interval=10, max_interval=10000, retry_interval=60, half_life=3600, clock=clock)
+
+def test_new_wallets_due_immediately_and_in_flight_until_marked():
+    clock = Clock()
+    scheduler = _scheduler(clock)
+    scheduler.add("0xa")
+    scheduler.add("0xb")
+    
+    assert scheduler.pop_due(10) == ["0xa", "0xb"]
+    assert scheduler.pop_due(10) == []
+    assert scheduler.stats()['in_flight'] == 2
+
+def test_dormant_wallets_back_off_and_hot_ones_refresh_fast():
+    clock = Clock()
+    scheduler = _scheduler(clock)
+    scheduler.add("0xcold")
+    scheduler.add("0xhot", volatility=0.08)
+    scheduler.pop_due(10)
+    
+    scheduler.mark_refreshed("0xcold", volatility=0.0)
+    scheduler.mark_refreshed("0xhot", volatility=0.08)
+    
+    assert scheduler.interval("0xcold") == 10000
+    assert scheduler.interval("0xhot") == 10
+    clock.now += 10
+    assert scheduler.pop_due(10) == ["0xhot"]
+
+def test_events_and_demand_pull_refresh_forward():
+    clock = Clock()
+    scheduler = _scheduler(clock)
+    scheduler.add("0xa")
+    scheduler.pop_due(10)
+    scheduler.mark_refreshed("0xa", volatility=0.0)
+    
+    for _ in range(3):
+        scheduler.record_event("0xa")
+    scheduler.record_demand("0xa")
+    
+    assert scheduler.seconds_until_due() < 60
+    
+    clock.now += 60
+    assert scheduler.pop_due(10) == ["0xa"]
+
+def test_signals_decay():
+    clock = Clock()
+    scheduler = _scheduler(clock)
+    scheduler.add("0xa")
+    scheduler.record_demand("0xa", weight=5)
+    hot = scheduler.heat("0xa")
+    
+    clock.now += 5 * 3600
+    assert scheduler.heat("0xa") < hot / 4
+
+def test_bump_and_failure_retry():
+    clock = Clock()
+    scheduler = _scheduler(clock)
+    scheduler.add("0xa")
+    scheduler.pop_due(10)
+    scheduler.mark_failed("0xa")
+    
+    assert scheduler.seconds_until_due() == 60
+    scheduler.bump("0xa")
+    assert scheduler.pop_due(10) == ["0xa"]
+    scheduler.bump("0xnew", delay=5)
+    assert "0xnew" in scheduler
+
+if __name__ == "__main__":
+    import pytest
+    pytest.main([__file__])
@@ -0,0 +1,126 @@
+import sys
+sys.path.insert(0, '..')
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from chain_client import ChainClient, _new_session
+from rpc_router import RpcRouter
+
+class DelayedRPC:
+    """Local JSON-RPC server answering after `delay` seconds (or failing with 503)"""
+    
+    def __init__(self, name, delay=0.0):
+        self.name = name
+        self.delay = delay
+        self.failing = False
+        self.methods = []
+        stub = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+            
+            def do_POST(self):
+                call = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                stub.methods.append(call["method"])
+                delay = stub.delay(call) if callable(stub.delay) else stub.delay
+                time.sleep(delay)
+                status = 503 if stub.failing else 200
+                payload = json.dumps({"jsonrpc": "2.0", "id": call["id"], "result": stub.name}).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+            
+            def log_message(self, *args):
+                pass
+        
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+    
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+@pytest.fixture
+def stubs():
+    servers = []
+    
+    def make(name, delay=0.0):
+        server = DelayedRPC(name, delay)
+        servers.append(server)
+        return server
+    
+    yield make
+    for server in servers:
+        server.close()
+
+def _router(*servers):
+    session = _new_session(8)
+    return RpcRouter([ChainClient(s.url, session=session, batch_window=0) for s in servers])
+
+def test_reads_move_to_the_fastest_endpoint(stubs):
+    slow, fast = stubs("slow", 0.08), stubs("fast", 0.005)
+    router = _router(slow, fast)
+    
+    answers = [router.request("eth_blockNumber", [])["result"] for _ in range(20)]
+    
+    assert answers[-10:] == ["fast"] * 10
+    endpoints = {e['url']: e for e in router.stats()['endpoints']}
+    assert endpoints[fast.url]['ewma_ms'] < endpoints[slow.url]['ewma_ms']
+
+def test_slow_read_is_hedged_to_the_next_endpoint(stubs):
+    primary, backup = stubs("primary", 0.005), stubs("backup", 0.04)
+    router = _router(primary, backup)
+    for _ in range(25):
+        router.request("eth_blockNumber", [])
+    
+    primary.delay = 1.0  # a tail-latency spike
+    started = time.perf_counter()
+    response = router.request("eth_blockNumber", [])
+    elapsed = time.perf_counter() - started
+    
+    assert response["result"] == "backup"
+    assert elapsed < 0.5
+    assert router.stats()['hedged'] == 1
+    assert router.endpoints[1].counters['hedges_won'] == 1
+
+def test_failing_endpoint_is_skipped(stubs):
+    broken, healthy = stubs("broken"), stubs("healthy", 0.02)
+    broken.failing = True
+    router = _router(broken, healthy)
+    
+    answers = [router.request("eth_blockNumber", [])["result"] for _ in range(6)]
+    
+    assert answers == ["healthy"] * 6
+    assert router.endpoints[0].breaker.state == 'open'
+    assert len(broken.methods) == 3  # breaker opened after RPC_ENDPOINT_FAILURES
+    assert router.stats()['failovers'] == 3
+
+def test_writes_stay_pinned_and_are_never_hedged(stubs):
+    pinned, fast = stubs("pinned", 0.2), stubs("fast", 0.001)
+    router = _router(pinned, fast)
+    
+    for _ in range(3):
+        assert router.request("eth_sendRawTransaction", ["0xf8"])["result"] == "pinned"
+    
+    assert pinned.methods == ["eth_sendRawTransaction"] * 3
+    assert fast.methods == []
+    
+    pinned.failing = True
+    pinned.delay = 0.0
+    for _ in range(3):
+        with pytest.raises(Exception):
+            router.request("eth_sendRawTransaction", ["0xf8"])
+    assert router.request("eth_sendRawTransaction", ["0xf8"])["result"] == "fast"
+    assert router.stats()['pinned_endpoint'] == fast.url
+
+if __name__ == "__main__":
+    pytest.main([__file__])
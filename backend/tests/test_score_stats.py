@@ -0,0 +1,46 @@
+import sys
+sys.path.insert(0, '..')
+
+import math
+import random
+
+from ai_models import AIRiskOracleV2
+from score_stats import SCORE_WINDOW, push_score, stats_from_history, volatility, trend
+
+def test_sliding_window_matches_full_recompute():
+    rng = random.Random(3)
+    oracle = AIRiskOracleV2()
+    history, stats = [], None
+    
+    for _ in range(100):
+        score = rng.uniform(0, 1000)
+        stats = push_score(stats, history, score)
+        history = (history + [score])[-SCORE_WINDOW:]
+        
+        assert stats['count'] == len(history)
+        assert stats['first'] == history[0]
+        assert stats['last'] == history[-1]
+        assert math.isclose(volatility(stats), oracle._calculate_volatility(history), abs_tol=1e-12)
+        assert math.isclose(trend(stats), oracle._calculate_trend(history), abs_tol=1e-12)
+
+def test_stale_stats_are_resynced():
+    history = [100, 200, 300]
+    stats = push_score({'count': 99, 'mean': 0.0, 'm2': 0.0, 'first': 0, 'last': 0}, history, 400)
+    
+    assert stats == stats_from_history([100, 200, 300, 400])
+
+def test_assess_risk_prefers_running_stats():
+    oracle = AIRiskOracleV2()
+    history = [500, 520, 480, 700]
+    
+    from_history = oracle.extract_features({'score_history': history})
+    from_stats = oracle.extract_features({'score_stats': stats_from_history(history)})
+    
+    assert math.isclose(from_history[17], from_stats[17], abs_tol=1e-12)
+    assert from_history[18] == from_stats[18]
+
+if __name__ == "__main__":
+    test_sliding_window_matches_full_recompute()
+    test_stale_stats_are_resynced()
+    test_assess_risk_prefers_running_stats()
+    print("✅ All tests passed!")
@@ -0,0 +1,186 @@
+import sys
+sys.path.insert(0, '..')
+
+import asyncio
+from datetime import datetime, timedelta
+
+from pymongo.errors import DuplicateKeyError
+
+from shard_leases import ShardLeaseManager, shard_of
+
+class Result:
+    def __init__(self, matched_count):
+        self.matched_count = matched_count
+
+class ServerClock:
+    """MongoDB's clock ($$NOW), shared by every worker"""
+    def __init__(self):
+        self.now = datetime(2026, 1, 1)
+    
+    def advance(self, seconds):
+        self.now += timedelta(seconds=seconds)
+
+def _value(expression, doc, server):
+    if expression == '$$NOW':
+        return server.now
+    if isinstance(expression, str) and expression.startswith('$'):
+        return doc.get(expression[1:])
+    if isinstance(expression, dict) and '$add' in expression:
+        when, ms = (_value(e, doc, server) for e in expression['$add'])
+        return when + timedelta(milliseconds=ms)
+    return expression
+
+def _matches(doc, query, server):
+    for key, condition in query.items():
+        if key == '$or':
+            if not any(_matches(doc, q, server) for q in condition):
+                return False
+        elif key == '$expr':
+            (op, (left, right)), = condition.items()
+            left, right = _value(left, doc, server), _value(right, doc, server)
+            if not isinstance(left, datetime) or not (left > right if op == '$gt' else left <= right):
+                return False
+        elif isinstance(condition, dict):
+            if doc.get(key) == condition['$ne']:
+                return False
+        elif doc.get(key) != condition:
+            return False
+    return True
+
+def _apply(doc, update, server):
+    if isinstance(update, list):
+        for stage in update:
+            doc.update({field: _value(e, doc, server) for field, e in stage['$set'].items()})
+    else:
+        doc.update(update['$set'])
+
+class FakeCollection:
+    def __init__(self, server):
+        self.server = server
+        self.docs = {}
+    
+    async def update_one(self, query, update, upsert=False):
+        for doc in self.docs.values():
+            if _matches(doc, query, self.server):
+                _apply(doc, update, self.server)
+                return Result(1)
+        if upsert:
+            self.docs[query['_id']] = {'_id': query['_id']}
+            _apply(self.docs[query['_id']], update, self.server)
+        return Result(0)
+    
+    async def find_one_and_update(self, query, update, upsert=False, return_document=None):
+        doc = self.docs.get(query['_id'])
+        if doc is not None:
+            if not _matches(doc, query, self.server):
+                raise DuplicateKeyError("duplicate _id")
+        else:
+            doc = self.docs[query['_id']] = {'_id': query['_id']}
+        _apply(doc, update, self.server)
+        return doc
+    
+    async def count_documents(self, query):
+        return sum(1 for doc in self.docs.values() if _matches(doc, query, self.server))
+    
+    async def delete_one(self, query):
+        self.docs.pop(query['_id'], None)
+    
+    def find(self, query, projection=None):
+        docs = [doc for doc in self.docs.values() if _matches(doc, query, self.server)]
+        
+        async def iterate():
+            for doc in docs:
+                yield doc
+        return iterate()
+
+class FakeDB:
+    def __init__(self):
+        self.server = ServerClock()
+        self.oracle_leases = FakeCollection(self.server)
+        self.oracle_workers = FakeCollection(self.server)
+
+class Clock:
+    """A worker's local monotonic clock"""
+    def __init__(self, now=1000.0):
+        self.now = now
+    
+    def __call__(self):
+        return self.now
+
+def _manager(db, clock, worker_id):
+    return ShardLeaseManager(db, worker_id, num_shards=16, lease_ttl=30, clock=clock)
+
+def test_shard_of_is_stable_and_case_insensitive():
+    assert shard_of('0xAbC', 64) == shard_of('0xabc', 64)
+    assert 0 <= shard_of('0xabc', 64) < 64
+
+def test_workers_split_shards_and_take_over_dead_worker():
+    async def scenario():
+        db, clock = FakeDB(), Clock()
+        a, b = _manager(db, clock, 'a'), _manager(db, clock, 'b')
+        
+        await a.renew()
+        assert len(a.shards) == 16
+        
+        # b joins: a hands back its surplus, b claims it
+        await b.renew()
+        await a.renew()
+        await b.renew()
+        split = (set(a.shards), set(b.shards))
+        
+        # b dies; once its leases expire a takes every shard again
+        clock.now += 31
+        db.server.advance(31)
+        await a.renew()
+        return split, set(a.shards), b
+    
+    (a_shards, b_shards), takeover, b = asyncio.run(scenario())
+    
+    assert len(a_shards) == 8 and len(b_shards) == 8
+    assert not a_shards & b_shards
+    assert takeover == set(range(16))
+    assert not b.shards  # expired locally too: b would stop processing
+
+def test_every_wallet_owned_by_exactly_one_worker():
+    async def scenario():
+        db, clock = FakeDB(), Clock()
+        workers = [_manager(db, clock, name) for name in 'abc']
+        for _ in range(3):
+            for worker in workers:
+                await worker.renew()
+        return workers
+    
+    workers = asyncio.run(scenario())
+    
+    for i in range(200):
+        wallet = f"0x{i:040x}"
+        assert sum(worker.owns(wallet) for worker in workers) == 1
+
+def test_worker_clock_skew_does_not_expire_live_leases():
+    async def scenario():
+        db = FakeDB()
+        # Local clocks disagree by hours; only the server clock decides expiry
+        a, b = _manager(db, Clock(1000.0), 'a'), _manager(db, Clock(90000.0), 'b')
+        
+        await a.renew()
+        await b.renew()
+        before = set(a.shards)
+        
+        db.server.advance(10)
+        a.clock.now += 10
+        b.clock.now += 10
+        await b.renew()
+        await a.renew()
+        await b.renew()
+        return before, a, b
+    
+    before, a, b = asyncio.run(scenario())
+    
+    assert len(before) == 16
+    assert len(a.shards) == 8 and len(b.shards) == 8
+    assert not a.shards & b.shards
+    assert a.counters['lost'] == 8 and a.counters['released'] == 8  # handed back, never taken
+
+if __name__ == "__main__":
+    import pytest
+    pytest.main([__file__])
@@ -0,0 +1,138 @@
+import sys
+sys.path.insert(0, '..')
+
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from single_flight import SingleFlight, RedisSingleFlight
+
+class FakeLock:
+    def __init__(self, redis, name):
+        self.redis = redis
+        self.name = name
+    
+    async def acquire(self, blocking=True):
+        if self.name in self.redis.store:
+            return False
+        self.redis.store[self.name] = "locked"
+        return True
+    
+    async def release(self):
+        self.redis.store.pop(self.name, None)
+
+class FakeRedis:
+    def __init__(self):
+        self.store = {}
+    
+    def lock(self, name, timeout=None):
+        return FakeLock(self, name)
+    
+    async def set(self, key, value, px=None):
+        self.store[key] = value
+    
+    async def get(self, key):
+        return self.store.get(key)
+    
+    async def exists(self, key):
+        return key in self.store
+
+def test_concurrent_calls_share_one_run():
+    async def scenario():
+        flight = SingleFlight()
+        runs = []
+        
+        async def refresh():
+            runs.append(1)
+            await asyncio.sleep(0.05)
+            return {'credit_score': 700}
+        
+        results = await asyncio.gather(*[flight.do("0xabc", refresh) for _ in range(10)])
+        other = await flight.do("0xdef", refresh)
+        return flight, runs, results, other
+    
+    flight, runs, results, other = asyncio.run(scenario())
+    assert len(runs) == 2
+    assert all(result == {'credit_score': 700} for result in results)
+    assert flight.stats() == {'in_flight': 0, 'runs': 2, 'coalesced': 9}
+
+def test_errors_propagate_to_every_caller():
+    async def scenario():
+        flight = SingleFlight()
+        
+        async def refresh():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("rpc down")
+        
+        return await asyncio.gather(*[flight.do("0xabc", refresh) for _ in range(3)], return_exceptions=True)
+    
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+def test_redis_variant_coalesces_across_workers():
+    async def scenario():
+        redis = FakeRedis()
+        worker_a = RedisSingleFlight(client=redis, poll_interval=0.01)
+        worker_b = RedisSingleFlight(client=redis, poll_interval=0.01)
+        runs = []
+        
+        async def refresh():
+            runs.append(1)
+            await asyncio.sleep(0.05)
+            return {'credit_score': 650}
+        
+        results = await asyncio.gather(worker_a.do("0xabc", refresh), worker_b.do("0xabc", refresh))
+        return runs, results, worker_b, redis
+    
+    runs, results, worker_b, redis = asyncio.run(scenario())
+    assert len(runs) == 1
+    assert results == [{'credit_score': 650}, {'credit_score': 650}]
+    assert worker_b.counters['remote_coalesced'] == 1
+    assert "singleflight:lock:0xabc" not in redis.store
+
+def test_cancelled_run_is_taken_over_by_a_waiting_caller():
+    async def scenario():
+        flight = SingleFlight()
+        runs = []
+        
+        async def refresh():
+            runs.append(1)
+            await asyncio.sleep(0.05)
+            return {'credit_score': 700}
+        
+        leader = asyncio.create_task(flight.do("0xabc", refresh))
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(flight.do("0xabc", refresh))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        
+        result = await asyncio.wait_for(follower, 1)
+        return flight, runs, leader, result
+    
+    flight, runs, leader, result = asyncio.run(scenario())
+    assert leader.cancelled()
+    assert result == {'credit_score': 700}
+    assert len(runs) == 2
+    assert flight.stats()['in_flight'] == 0
+
+def test_redis_followers_get_the_same_result_types():
+    updated = datetime(2026, 10, 1, 12, 30, 15, 250000)
+    
+    async def scenario():
+        redis = FakeRedis()
+        worker_a = RedisSingleFlight(client=redis, poll_interval=0.01)
+        worker_b = RedisSingleFlight(client=redis, poll_interval=0.01)
+        
+        async def refresh():
+            await asyncio.sleep(0.05)
+            return {'success': True, 'credit_score': 650, 'last_updated': updated}
+        
+        return await asyncio.gather(worker_a.do("0xabc", refresh), worker_b.do("0xabc", refresh))
+    
+    local, remote = asyncio.run(scenario())
+    assert remote == local
+    assert isinstance(remote['last_updated'], datetime)
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,129 @@
+import sys
+sys.path.insert(0, '..')
+
+import asyncio
+
+from source_guard import CircuitBreaker, LatencyHistogram, SourceGuard
+from oracle_service import DynamicOracleService
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+def test_breaker_opens_and_probes_after_cooldown():
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=30, clock=clock)
+    
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open' and not breaker.allow()
+    
+    clock.now = 30
+    assert breaker.allow()          # single half-open probe
+    assert not breaker.allow()
+    breaker.record_failure()        # failed probe re-opens
+    assert breaker.state == 'open'
+    
+    clock.now = 60
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == 'closed'
+
+def test_histogram_percentiles():
+    histogram = LatencyHistogram()
+    for seconds in [0.005] * 90 + [0.3] * 10:
+        histogram.observe(seconds)
+    
+    snapshot = histogram.snapshot()
+    assert snapshot['count'] == 100
+    assert snapshot['p50_ms'] == 10
+    assert snapshot['p99_ms'] == 500
+
+def test_guard_times_out_and_short_circuits():
+    calls = []
+    
+    async def slow(wallet_address):
+        calls.append(wallet_address)
+        await asyncio.sleep(1)
+        return {'score': 1}
+    
+    guard = SourceGuard('slow', slow, timeout=0.01,
+                        breaker=CircuitBreaker(failure_threshold=1, cooldown=60))
+    
+    async def scenario():
+        return [await guard.call('0xabc'), await guard.call('0xabc')]
+    
+    assert asyncio.run(scenario()) == [None, None]
+    assert len(calls) == 1
+    assert guard.stats()['timeout'] == 1
+    assert guard.stats()['short_circuited'] == 1
+    assert guard.stats()['state'] == 'open'
+
+def test_collect_falls_back_to_last_known_values():
+    service = DynamicOracleService(db=type('DB', (), {'passports': None, 'events': None})())
+    
+    async def hang(wallet_address):
+        await asyncio.sleep(10)
+    
+    async def github(wallet_address):
+        return {'score': 70}
+    
+    service.collect_budget = 0.05
+    for guard in service.sources.values():
+        guard.fetch = hang
+    service.sources['github'].fetch = github
+    
+    previous = {'twitter_score': 33, 'tx_count': 12}
+    data = asyncio.run(service._collect_all_data('0xabc', previous))
+    
+    assert data['github_score'] == 70
+    assert data['twitter_score'] == 33
+    assert data['tx_count'] == 12
+    assert data['repayment_rate'] == 100
+    assert service.source_stats()['sources']['defi']['timeout'] == 1
+
+def test_cancelled_probe_does_not_wedge_the_breaker():
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=30, clock=clock)
+    breaker.record_failure()
+    clock.now = 30
+    
+    async def hang(wallet_address):
+        await asyncio.sleep(10)
+    
+    async def ok(wallet_address):
+        return {'score': 1}
+    
+    guard = SourceGuard('flaky', hang, breaker=breaker)
+    
+    async def scenario():
+        probe = asyncio.create_task(guard.call('0xabc'))
+        await asyncio.sleep(0.01)
+        probe.cancel()
+        await asyncio.gather(probe, return_exceptions=True)
+        guard.fetch = ok
+        return await guard.call('0xabc')
+    
+    assert asyncio.run(scenario()) == {'score': 1}
+    assert breaker.state == 'closed'
+
+def test_defi_fallback_counts_as_a_source_failure(monkeypatch):
+    import onchain_service
+    
+    async def mock_aave(fn, wallet_address):
+        return {'protocols': {'aave': {'health_factor': 0, 'is_mock': True}}, 'summary': {}}
+    
+    monkeypatch.setattr(onchain_service, 'run_web3', mock_aave)
+    guard = SourceGuard('defi', onchain_service.fetch_defi_data)
+    
+    assert asyncio.run(guard.call('0xabc')) is None
+    assert guard.stats()['error'] == 1
+    assert guard.breaker.failures == 1
+
+if __name__ == "__main__":
+    import pytest
+    pytest.main([__file__])
@@ -0,0 +1,91 @@
+import sys
+sys.path.insert(0, '..')
+
+import math
+from collections import Counter
+
+import pytest
+from web3 import Web3
+
+from benchmark_uniswap_positions import SimulatedUniswapChain, TOKENS, batched_enumerate
+from defi_indexer import DeFiIndexer
+from uniswap_v3 import TokenPriceCache, position_amounts
+
+OWNER = "0x000000000000000000000000000000000000beef"
+
+class CountingChain(SimulatedUniswapChain):
+    def make_request(self, method, params):
+        self.calls[method] += 1
+        return super().make_request(method, params)
+
+def _chain(positions):
+    chain = CountingChain(OWNER, positions)
+    chain.calls = Counter()
+    return chain
+
+def test_position_amounts_by_range():
+    sqrt_price_x96 = int(math.sqrt(1.0001 ** 100) * 2 ** 96)
+    below = position_amounts(10 ** 6, sqrt_price_x96, 200, 400)
+    above = position_amounts(10 ** 6, sqrt_price_x96, -400, -200)
+    inside = position_amounts(10 ** 6, sqrt_price_x96, 0, 200)
+    
+    assert below[0] > 0 and below[1] == 0
+    assert above[0] == 0 and above[1] > 0
+    assert inside[0] > 0 and inside[1] > 0
+
+@pytest.mark.parametrize("positions", [30, 300])
+def test_enumeration_uses_constant_round_trips(positions):
+    chain = _chain(positions)
+    result = batched_enumerate(Web3(chain), OWNER)
+    
+    assert result['positions_count'] == positions
+    assert len(result['positions']) == positions
+    assert result['active_positions'] == sum(1 for p in chain.positions.values() if p[7] > 0)
+    # balanceOf + token ids + positions + getPool + slot0/decimals/prices
+    assert chain.calls['eth_call'] == 5
+    assert sum(chain.calls.values()) == 6  # plus eth_blockNumber
+
+def test_positions_valued_in_usd_with_pool_derived_prices():
+    chain = _chain(12)
+    result = batched_enumerate(Web3(chain), OWNER)
+    
+    prices = {Web3.to_checksum_address(a): p for a, _, p in TOKENS.values()}
+    prices[Web3.to_checksum_address(TOKENS['XYZ'][0])] = 3000.0 / 1500.0  # via the WETH pool
+    
+    total = 0.0
+    for p in result['positions']:
+        expected = p['amount0'] * prices[p['token0']] + p['amount1'] * prices[p['token1']]
+        assert p['value_usd'] == pytest.approx(expected, rel=1e-6)
+        total += p['value_usd']
+        if p['liquidity'] == '0':
+            assert p['value_usd'] == 0
+    
+    assert result['unpriced_tokens'] == []
+    assert result['total_liquidity_usd'] == pytest.approx(total, abs=0.01)
+    assert total > 0
+
+def test_price_and_pool_caches_shared_across_wallets_in_a_block():
+    chain = _chain(20)
+    indexer = DeFiIndexer(w3=Web3(chain))
+    indexer.positions.cache.enabled = False
+    
+    indexer._refresh_uniswap(OWNER)
+    first_calls = chain.calls['eth_call']
+    indexer._refresh_uniswap(OWNER)
+    
+    # Second wallet read skips getPool; slot0 still read, prices come from the block cache
+    assert chain.calls['eth_call'] - first_calls == 4
+    assert indexer.token_prices.stats()['hits'] == len(TOKENS)
+
+def test_price_cache_resets_on_new_block():
+    cache = TokenPriceCache()
+    cache.get_many(['a'], block=10)
+    cache.set_many({'a': 1.5}, block=10)
+    
+    assert cache.get_many(['a'], block=10) == ({'a': 1.5}, [])
+    assert cache.get_many(['a'], block=11) == ({}, ['a'])
+    cache.set_many({'a': 9.9}, block=10)  # late write for an old block is ignored
+    assert cache.get_many(['a'], block=11) == ({}, ['a'])
+
+if __name__ == "__main__":
+    pytest.main([__file__])
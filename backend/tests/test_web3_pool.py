@@ -0,0 +1,124 @@
+import sys
+sys.path.insert(0, '..')
+
+import asyncio
+import time
+
+import httpx
+from fastapi import FastAPI
+from web3.exceptions import TransactionNotFound
+
+import ai_oracle_routes
+import defi_indexer
+import defi_routes
+from api_key_auth import verify_api_key
+from blockchain import PolygonIntegration
+
+def _slow_rpc(*args, **kwargs):
+    time.sleep(0.5)
+    return {'summary': {}}
+
+def _ping_during(app, send_slow_requests):
+    """Time until /ping answers, sent while slow requests are in flight, and their responses"""
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+    
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            started = time.perf_counter()
+            slow = [asyncio.create_task(request) for request in send_slow_requests(client)]
+            await asyncio.sleep(0.05)
+            
+            # A handler blocking the loop also delays this task's own wake-up
+            response = await client.get("/ping")
+            ping_latency = time.perf_counter() - started
+            
+            results = await asyncio.gather(*slow)
+            return response, ping_latency, results
+    
+    return asyncio.run(scenario())
+
+def test_unrelated_endpoint_stays_responsive_during_slow_rpc(monkeypatch):
+    monkeypatch.setattr(defi_routes, 'fetch_defi_data', _slow_rpc)
+    
+    app = FastAPI()
+    app.include_router(defi_routes.router)
+    
+    response, ping_latency, results = _ping_during(
+        app, lambda client: [client.get(f"/defi/0x{i:040x}") for i in range(4)]
+    )
+    
+    assert response.json() == {"ok": True}
+    assert ping_latency < 0.15
+    assert all(r.json()['success'] for r in results)
+
+class FakePassports:
+    async def find_one(self, query):
+        return {'owner': query['owner'], 'credit_score': 700, 'pohScore': 80}
+
+class FakeApiKeys:
+    async def update_one(self, query, update):
+        pass
+
+class FakePublisher:
+    async def publish(self, wallet_address):
+        return True
+
+def test_assess_stays_off_the_event_loop_during_slow_rpc(monkeypatch):
+    monkeypatch.setattr(defi_indexer, 'fetch_defi_data', _slow_rpc)
+    monkeypatch.setattr(ai_oracle_routes, 'demand_publisher', FakePublisher())
+    ai_oracle_routes.set_db(type('DB', (), {'passports': FakePassports(), 'api_keys': FakeApiKeys()})())
+    
+    app = FastAPI()
+    app.include_router(ai_oracle_routes.router)
+    app.dependency_overrides[verify_api_key] = lambda: {'api_key': 'test', 'tier': 'pro'}
+    
+    response, ping_latency, results = _ping_during(app, lambda client: [
+        client.post("/api/ai-oracle/assess", json={'wallet_address': f"0x{i:040x}"}) for i in range(4)
+    ])
+    
+    assert response.json() == {"ok": True}
+    assert ping_latency < 0.15
+    assert all(r.json()['success'] for r in results)
+
+class FakeEth:
+    def __init__(self, pending_polls):
+        self.pending_polls = pending_polls
+    
+    def get_transaction_receipt(self, tx_hash):
+        time.sleep(0.2)  # RPC latency
+        if self.pending_polls:
+            self.pending_polls -= 1
+            raise TransactionNotFound("pending")
+        return {'status': 1}
+
+def test_receipt_wait_does_not_block_event_loop():
+    integration = PolygonIntegration()
+    integration.w3 = type('W3', (), {'eth': FakeEth(pending_polls=3)})()
+    
+    async def scenario():
+        gaps = []
+        
+        async def ticker():
+            last = time.perf_counter()
+            while True:
+                await asyncio.sleep(0.01)
+                now = time.perf_counter()
+                gaps.append(now - last)
+                last = now
+        
+        task = asyncio.create_task(ticker())
+        receipt = await integration.wait_for_receipt(b'\x01' * 32, timeout=5, poll_interval=0.05)
+        task.cancel()
+        return receipt, max(gaps)
+    
+    receipt, max_gap = asyncio.run(scenario())
+    
+    assert receipt == {'status': 1}
+    assert max_gap < 0.1  # a blocked loop would stall for a whole 0.2s RPC
+
+if __name__ == "__main__":
+    import pytest
+    pytest.main([__file__])
@@ -0,0 +1,71 @@
+"""
+Uniswap V3 Position Math
+Token amounts for a liquidity range, pool prices, and a per-block token
+price cache shared by every valuation in a block
+"""
+
+import math
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+Q96 = 2 ** 96
+
+
+def position_amounts(
+    liquidity: int,
+    sqrt_price_x96: int,
+    tick_lower: int,
+    tick_upper: int
+) -> Tuple[float, float]:
+    """Raw token0/token1 amounts held by a liquidity range at the pool price"""
+    sqrt_price = sqrt_price_x96 / Q96
+    sqrt_lower = math.sqrt(1.0001 ** tick_lower)
+    sqrt_upper = math.sqrt(1.0001 ** tick_upper)
+
+    if sqrt_price <= sqrt_lower:
+        return liquidity * (sqrt_upper - sqrt_lower) / (sqrt_lower * sqrt_upper), 0.0
+    if sqrt_price >= sqrt_upper:
+        return 0.0, liquidity * (sqrt_upper - sqrt_lower)
+    return (
+        liquidity * (sqrt_upper - sqrt_price) / (sqrt_price * sqrt_upper),
+        liquidity * (sqrt_price - sqrt_lower)
+    )
+
+
+def pool_price(sqrt_price_x96: int, decimals0: int, decimals1: int) -> float:
+    """Human price of token0 in units of token1"""
+    return (sqrt_price_x96 / Q96) ** 2 * 10 ** (decimals0 - decimals1)
+
+
+class TokenPriceCache:
+    """USD prices valid for a single block; the first read of a newer block resets it"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.block: Optional[int] = None
+        self._prices: Dict[str, Optional[float]] = {}
+        self.counters = {'hits': 0, 'misses': 0}
+
+    def get_many(self, tokens: Iterable[str], block: int) -> Tuple[Dict[str, Optional[float]], List[str]]:
+        """(known prices, tokens still to fetch) for block"""
+        with self._lock:
+            if self.block is None or block > self.block:
+                self.block = block
+                self._prices = {}
+            known, missing = {}, []
+            for token in tokens:
+                if block == self.block and token in self._prices:
+                    known[token] = self._prices[token]
+                    self.counters['hits'] += 1
+                else:
+                    missing.append(token)
+                    self.counters['misses'] += 1
+            return known, missing
+
+    def set_many(self, prices: Dict[str, Optional[float]], block: int):
+        with self._lock:
+            if block == self.block:
+                self._prices.update(prices)
+
+    def stats(self) -> Dict:
+        return {'block': self.block, 'tokens': len(self._prices), **self.counters}
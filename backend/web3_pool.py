@@ -0,0 +1,54 @@
+"""
+Web3 Thread Pool
+Runs blocking web3 (HTTPProvider) calls on a dedicated, bounded thread pool
+so async endpoints never stall the event loop on RPC latency
+"""
+
+import asyncio
+import contextvars
+import functools
+import logging
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+WEB3_THREADS = int(os.getenv("WEB3_THREADS", "16"))
+
+_executor = ThreadPoolExecutor(max_workers=WEB3_THREADS, thread_name_prefix="web3")
+_counters = {'calls': 0, 'in_flight': 0, 'errors': 0}
+
+
+async def run_web3(fn: Callable, *args, **kwargs) -> Any:
+    """Await fn(*args, **kwargs) executed on the web3 pool
+
+    At most WEB3_THREADS calls run at once; the rest queue without
+    occupying the event loop. fn runs in a copy of the caller's context, so
+    scopes such as the DeFi snapshot follow it onto the thread.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    _counters['calls'] += 1
+    _counters['in_flight'] += 1
+    try:
+        return await loop.run_in_executor(_executor, functools.partial(context.run, fn, *args, **kwargs))
+    except Exception:
+        _counters['errors'] += 1
+        raise
+    finally:
+        _counters['in_flight'] -= 1
+
+
+def submit_web3(fn: Callable, *args) -> Future:
+    """Schedule fn(*args) on the web3 pool without waiting for it
+
+    For fire-and-forget work started from synchronous code (e.g. background
+    cache refreshes); it shares the WEB3_THREADS bound with run_web3.
+    """
+    _counters['calls'] += 1
+    return _executor.submit(fn, *args)
+
+
+def pool_stats() -> Dict:
+    return {'max_workers': WEB3_THREADS, **_counters}
@@ -22,6 +22,7 @@ contract SimpleZKBadge is ERC721, Ownable {
     mapping(address => uint256[]) public userBadges;
     
     event BadgeIssued(uint256 indexed tokenId, address indexed recipient, string badgeType);
+    event BadgeIssueFailed(uint256 indexed index, address indexed recipient, bytes reason);
     event MinterAuthorized(address indexed minter);
     event MinterRevoked(address indexed minter);
     
@@ -37,6 +38,49 @@ contract SimpleZKBadge is ERC721, Ownable {
         string memory badgeType,
         string memory zkProofHash
     ) external onlyAuthorized returns (uint256) {
+        return _issueBadge(recipient, badgeType, zkProofHash);
+    }
+    
+    /**
+     * Issue many badges in one transaction. A badge that cannot be issued
+     * (e.g. the recipient contract rejects the token) does not revert the
+     * batch: it is reported with BadgeIssueFailed and gets token id 0.
+     */
+    function issueBadgeBatch(
+        address[] calldata recipients,
+        string[] calldata badgeTypes,
+        string[] calldata zkProofHashes
+    ) external onlyAuthorized returns (uint256[] memory tokenIds) {
+        require(
+            recipients.length == badgeTypes.length && recipients.length == zkProofHashes.length,
+            "Length mismatch"
+        );
+        tokenIds = new uint256[](recipients.length);
+        
+        for (uint256 i = 0; i < recipients.length; i++) {
+            try this.issueBadgeFromBatch(recipients[i], badgeTypes[i], zkProofHashes[i]) returns (uint256 tokenId) {
+                tokenIds[i] = tokenId;
+            } catch (bytes memory reason) {
+                emit BadgeIssueFailed(i, recipients[i], reason);
+            }
+        }
+    }
+    
+    // External only so issueBadgeBatch can isolate each badge's revert
+    function issueBadgeFromBatch(
+        address recipient,
+        string calldata badgeType,
+        string calldata zkProofHash
+    ) external returns (uint256) {
+        require(msg.sender == address(this), "Batch only");
+        return _issueBadge(recipient, badgeType, zkProofHash);
+    }
+    
+    function _issueBadge(
+        address recipient,
+        string memory badgeType,
+        string memory zkProofHash
+    ) internal returns (uint256) {
         _tokenIds++;
         uint256 newTokenId = _tokenIds;
         
@@ -0,0 +1,43 @@
+const { ethers } = require("hardhat");
+
+// Gas per badge for single issueBadge calls vs issueBadgeBatch.
+// Run on the in-process network: npx hardhat run scripts/gas-report-batch.js
+const BATCH_SIZES = [1, 10, 50];
+
+async function main() {
+  const signers = await ethers.getSigners();
+  const SimpleZKBadge = await ethers.getContractFactory("SimpleZKBadge");
+  const badge = await SimpleZKBadge.deploy();
+  await badge.waitForDeployment();
+
+  // Fresh recipients each time so every mint pays for new storage, as in production
+  let next = 0;
+  const recipients = (n) =>
+    Array.from({ length: n }, () => ethers.getAddress(ethers.toBeHex(0x1000 + next++, 20)));
+  const proofs = (n) => Array.from({ length: n }, (_, i) => ethers.id(`proof-${next}-${i}`));
+
+  const single = await (await badge.issueBadge(recipients(1)[0], "identity", proofs(1)[0])).wait();
+  const singleGas = Number(single.gasUsed);
+
+  // Markdown rows, ready for the table in BATCH_MINTING.md
+  console.log("| Batch size | Gas used | Gas per badge | vs single issueBadge |");
+  console.log("|---|---|---|---|");
+  console.log(`| single | ${singleGas} | ${singleGas} | 100.0% |`);
+
+  for (const size of BATCH_SIZES) {
+    const tx = await badge.issueBadgeBatch(
+      recipients(size),
+      Array(size).fill("identity"),
+      proofs(size)
+    );
+    const gasUsed = Number((await tx.wait()).gasUsed);
+    const perBadge = Math.round(gasUsed / size);
+    const ratio = ((perBadge / singleGas) * 100).toFixed(1);
+    console.log(`| ${size} | ${gasUsed} | ${perBadge} | ${ratio}% |`);
+  }
+}
+
+main().catch((error) => {
+  console.error(error);
+  process.exit(1);
+});
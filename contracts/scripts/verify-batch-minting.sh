@@ -0,0 +1,31 @@
+#!/bin/bash
+# Verifies the batch mint path before BATCH_BADGE_CONTRACT is configured:
+# compiles SimpleZKBadge, runs the hardhat suite, prints the 1/10/50 gas
+# table, then runs the backend's end-to-end test against a local node.
+# Run from contracts/: ./scripts/verify-batch-minting.sh
+set -e
+
+echo "🔨 Compiling contracts"
+npx hardhat compile
+
+echo "🧪 Hardhat tests"
+npx hardhat test
+
+echo "⛽ Gas per badge (paste into BATCH_MINTING.md)"
+npx hardhat run scripts/gas-report-batch.js
+
+echo "🔗 Backend end-to-end test against a local Hardhat node"
+npx hardhat node > /tmp/hardhat-node.log 2>&1 &
+NODE_PID=$!
+trap "kill $NODE_PID" EXIT
+for _ in $(seq 1 30); do
+    curl -s -X POST -H "Content-Type: application/json" \
+        --data '{"jsonrpc":"2.0","id":1,"method":"eth_chainId","params":[]}' \
+        http://127.0.0.1:8545 > /dev/null && break
+    sleep 1
+done
+
+cd ../backend/tests
+DEV_CHAIN_RPC_URL=http://127.0.0.1:8545 NONCE_STORE=local python -m pytest -q -rs \
+    test_mint_queue.py::test_batch_mints_against_local_dev_chain \
+    test_nonce_manager.py::test_against_local_dev_chain
@@ -1,5 +1,6 @@
 const { expect } = require("chai");
 const { ethers } = require("hardhat");
+const { anyValue } = require("@nomicfoundation/hardhat-chai-matchers/withArgs");
 
 describe("SimpleZKBadge - Soulbound NFT", function () {
   let zkBadge, owner, user1, user2;
@@ -48,4 +49,45 @@ describe("SimpleZKBadge - Soulbound NFT", function () {
     await zkBadge.revokeMinter(user1.address);
     expect(await zkBadge.authorizedMinters(user1.address)).to.be.false;
   });
-});
\ No newline at end of file
+
+  it("Should issue a batch of badges in one transaction", async function () {
+    await zkBadge.issueBadgeBatch(
+      [user1.address, user2.address, user1.address],
+      ["identity", "identity", "reputation"],
+      ["proof1", "proof2", "proof3"]
+    );
+    expect(await zkBadge.totalSupply()).to.equal(3);
+    expect(await zkBadge.getUserBadges(user1.address)).to.deep.equal([1n, 3n]);
+  });
+
+  it("Should report a failed badge without reverting the batch", async function () {
+    // The badge contract cannot receive ERC721 tokens, so _safeMint to it reverts
+    const rejecting = await zkBadge.getAddress();
+
+    await expect(
+      zkBadge.issueBadgeBatch(
+        [user1.address, rejecting, user2.address],
+        ["identity", "identity", "identity"],
+        ["proof1", "proof2", "proof3"]
+      )
+    ).to.emit(zkBadge, "BadgeIssueFailed").withArgs(1, rejecting, anyValue);
+
+    expect(await zkBadge.totalSupply()).to.equal(2);
+    expect(await zkBadge.ownerOf(2)).to.equal(user2.address);
+  });
+
+  it("Should reject mismatched batch arrays", async function () {
+    await expect(
+      zkBadge.issueBadgeBatch([user1.address], ["identity", "identity"], ["proof1"])
+    ).to.be.revertedWith("Length mismatch");
+  });
+
+  it("Should only allow authorized minters to batch", async function () {
+    await expect(
+      zkBadge.connect(user1).issueBadgeBatch([user2.address], ["identity"], ["proof1"])
+    ).to.be.revertedWith("Not authorized");
+    await expect(
+      zkBadge.connect(user1).issueBadgeFromBatch(user2.address, "identity", "proof1")
+    ).to.be.revertedWith("Batch only");
+  });
+});